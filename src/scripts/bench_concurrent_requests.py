@@ -0,0 +1,191 @@
+"""스레드 서버에서 구독 API 를 동시에 호출하는 벤치마크.
+
+    make benchmark script=bench_concurrent_requests args="threads=16 requests=4000 users=200"
+
+스레드 WSGI 서버를 띄우고 threads 개의 클라이언트 스레드가 users 명의 사용자로 구독/취소를 번갈아
+요청한다. 처리량, 지연 시간(p50/p95), 상태 코드별 개수, 서버 프로세스의 최대 RSS 를 출력한다.
+
+- shared=0 (기본): 요청마다 uow_factory 로 유닛 오브 워크를 만든다.
+- shared=1: 이전처럼 모든 요청이 유닛 오브 워크 하나를 공유한다 (비교용).
+
+ForceLoginMiddleware 대신 X-Bench-User 헤더의 사용자로 인증한다. 만든 사용자와 데이터는 마지막에
+지운다.
+"""
+import http.client
+import json
+import resource
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import SubscriptionPlan
+from subscription.domain.domain_models import PlanName
+from subscription.service_layer.unit_of_work import DjangoUnitOfWork
+from subscription.views.api import SubscriptionViewSet
+
+USERNAME_PREFIX = "bench-concurrency-"
+
+
+class BenchUserMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.users = {}
+
+    def __call__(self, request):
+        user_id = int(request.headers["X-Bench-User"])
+        if user_id not in self.users:
+            self.users[user_id] = User.objects.get(id=user_id)
+        request.user = self.users[user_id]
+        # NOTE: 세션 인증이 아니므로 CSRF 검사를 건너뛴다.
+        request._dont_enforce_csrf_checks = True
+        return self.get_response(request)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_args(args):
+    options = {"threads": 8, "requests": 2000, "users": 100, "shared": 0}
+    for arg in args:
+        key, value = arg.split("=")
+        options[key] = int(value)
+    return options
+
+
+def setup_users(count):
+    SubscriptionPlan.objects.get_or_create(
+        name=PlanName.BASIC.value,
+        defaults=dict(
+            price="10.00",
+            payment_cycle="monthly",
+            description="Benchmark plan",
+            duration=timedelta(days=30),
+        ),
+    )
+    plan_catalog.reload()
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+    users = User.objects.bulk_create(
+        [User(username=f"{USERNAME_PREFIX}{i}") for i in range(count)]
+    )
+    return [user.id for user in users]
+
+
+def client_worker(port, user_ids, count, latencies, statuses):
+    subscribe = json.dumps(
+        {
+            "plan_name": PlanName.BASIC.value,
+            "payment_details": {
+                "method_type": "credit_card",
+                "card_number": "4242-4242-4242-4242",
+                "expiration_date": "12/49",
+                "cvc": "123",
+            },
+        }
+    )
+    for i in range(count):
+        user_id = user_ids[i % len(user_ids)]
+        # 사용자마다 구독 -> 취소를 번갈아 한다.
+        path, body = (
+            ("/api/subscriptions/subscribe/", subscribe)
+            if (i // len(user_ids)) % 2 == 0
+            else ("/api/subscriptions/cancel/", "")
+        )
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        started = time.perf_counter()
+        connection.request(
+            "POST",
+            path,
+            body=body,
+            headers={"Content-Type": "application/json", "X-Bench-User": user_id},
+        )
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status] += 1
+        connection.close()
+
+
+def run(*args):
+    options = parse_args(args)
+    user_ids = setup_users(options["users"])
+    if options["shared"]:
+        shared = DjangoUnitOfWork()
+        SubscriptionViewSet.uow_factory = staticmethod(lambda: shared)
+
+    middleware = [
+        m
+        if not m.endswith("ForceLoginMiddleware")
+        else f"{__name__}.BenchUserMiddleware"
+        for m in settings.MIDDLEWARE
+    ]
+    try:
+        with override_settings(
+            MIDDLEWARE=middleware, DEBUG=False, ALLOWED_HOSTS=["127.0.0.1"]
+        ):
+            application = get_wsgi_application()
+            server = make_server(
+                "127.0.0.1",
+                0,
+                application,
+                server_class=ThreadingWSGIServer,
+                handler_class=QuietHandler,
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            port = server.server_address[1]
+
+            threads = options["threads"]
+            # NOTE: 클라이언트 스레드마다 서로 다른 사용자를 맡아 같은 사용자의 요청이 겹치지 않게 한다.
+            groups = [user_ids[i::threads] for i in range(threads)]
+            per_thread = options["requests"] // threads
+            latencies = []
+            statuses = Counter()
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            started = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                futures = [
+                    pool.submit(
+                        client_worker, port, group, per_thread, latencies, statuses
+                    )
+                    for group in groups
+                    if group
+                ]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+            server.server_close()
+    finally:
+        if options["shared"]:
+            SubscriptionViewSet.uow_factory = DjangoUnitOfWork
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    latencies.sort()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"mode={'shared' if options['shared'] else 'per-request'} "
+        f"threads={options['threads']} requests={len(latencies)}"
+    )
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s ({elapsed:.2f} s)")
+    print(
+        f"latency: p50={statistics.median(latencies) * 1000:.1f} ms "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms"
+    )
+    print(f"status: {dict(sorted(statuses.items()))}")
+    print(f"max rss: {rss_before / 1024:.1f} MB -> {rss_after / 1024:.1f} MB")
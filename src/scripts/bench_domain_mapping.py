@@ -0,0 +1,122 @@
+"""도메인 객체 materialize 비용을 비교하는 벤치마크.
+
+    make benchmark script=bench_domain_mapping args="rows=1000000"
+
+같은 values_list() 튜플 rows 개를 세 가지 방법으로 도메인 UserSubscription 으로 만든다.
+
+- model: Django 가 하듯 Model.from_db() 로 모델 인스턴스를 만든 뒤 to_domain()
+- mapper: mappers.map_subscriptions() 로 튜플에서 바로 변환
+- dict: mapper 와 같지만 __slots__ 없는(이전) 도메인 클래스
+
+각각의 소요 시간과 결과를 모두 들고 있을 때의 메모리(tracemalloc peak)를 출력한다.
+플랜이 없으면 하나 만들고 마지막에 롤백한다.
+"""
+import gc
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from subscription.adapters import mappers
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import SubscriptionPlan, UserSubscription
+from subscription.domain.domain_models import PlanName
+
+
+class DictUserSubscription:
+    # NOTE: 비교용. __slots__ 도입 전 도메인 클래스와 같은 모양이다.
+    def __init__(self, user_id, plan, start_date, end_date, status, id=None):
+        self.user_id = user_id
+        self.plan = plan
+        self.start_date = start_date
+        self.end_date = end_date
+        self.status = status
+        self.id = id or uuid.uuid4()
+        self.events = []
+
+
+def parse_args(args):
+    options = {"rows": 1_000_000}
+    for arg in args:
+        key, value = arg.split("=")
+        options[key] = int(value)
+    return options
+
+
+def make_rows(count, plan_id):
+    today = date.today()
+    return [
+        (
+            uuid.uuid4(),
+            i,
+            plan_id,
+            today - timedelta(days=30),
+            today + timedelta(days=i % 30),
+            "active" if i % 4 else "expired",
+            0,
+        )
+        for i in range(count)
+    ]
+
+
+def by_model(rows):
+    field_names = list(mappers.SUBSCRIPTION_COLUMNS)
+    from_db = UserSubscription.from_db
+    return [from_db("default", field_names, row).to_domain() for row in rows]
+
+
+def by_mapper(rows):
+    return list(mappers.map_subscriptions(rows))
+
+
+def by_dict_class(rows):
+    statuses = mappers._SUBSCRIPTION_STATUSES
+    get_plan = plan_catalog.get_by_id
+    return [
+        DictUserSubscription(user_id, get_plan(plan_id), start, end, statuses[s], id)
+        for id, user_id, plan_id, start, end, s, _ in rows
+    ]
+
+
+def measure(title, func, rows):
+    gc.collect()
+    started = time.perf_counter()
+    func(rows)
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    result = func(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    per_row = peak / len(rows)
+    print(
+        f"{title:>6}: {elapsed:7.3f} s, peak {peak / 2**20:8.1f} MiB "
+        f"({per_row:.0f} B/row)"
+    )
+
+
+def run(*args):
+    options = parse_args(args)
+    with transaction.atomic():
+        plan, _ = SubscriptionPlan.objects.get_or_create(
+            name=PlanName.BASIC.value,
+            defaults=dict(
+                price="10.00",
+                payment_cycle="monthly",
+                description="Benchmark plan",
+                duration=timedelta(days=30),
+            ),
+        )
+        plan_catalog.reload()
+        rows = make_rows(options["rows"], plan.id)
+        print(f"rows={len(rows)}")
+        measure("model", by_model, rows)
+        measure("mapper", by_mapper, rows)
+        measure("dict", by_dict_class, rows)
+        transaction.set_rollback(True)
+    plan_catalog.invalidate()
@@ -0,0 +1,101 @@
+"""구독 요청 검증 비용을 비교하는 벤치마크.
+
+    make benchmark script=bench_validation args="requests=100000"
+
+같은 요청 본문 requests 개를 두 가지 방법으로 검증한다.
+
+- serializer: SubscriptionRequestSerializer(data=...).is_valid() 와 이전 handler 의 CardSerializer
+- validator: validators.validate_subscription_request() 와 handlers.payment_method_details()
+
+올바른 요청과 잘못된 요청(카드 번호 Luhn 실패)을 반반 섞는다. 각각의 소요 시간과 요청당 시간을 출력하고,
+두 방법의 결과와 오류가 같은지 확인한다. DB 는 사용하지 않는다.
+"""
+import time
+
+from rest_framework import serializers
+
+from subscription import validators
+from subscription.domain.domain_models import Card
+from subscription.serializers import SubscriptionRequestSerializer
+from subscription.service_layer.handlers import payment_method_details
+
+
+class CardSerializer(serializers.Serializer):
+    # NOTE: 비교용. 이전에 subscribe_user_to_plan 이 트랜잭션 안에서 한 번 더 돌리던 시리얼라이저다.
+    card_number = serializers.CharField()
+    card_expiry = serializers.DateField(
+        format="%Y-%m-%dT%H:%M:%S.%fZ", input_formats=["%m/%y", "%Y-%m-%dT%H:%M:%S.%fZ"]
+    )
+    card_cvc = serializers.CharField()
+
+    def create(self, validated_data):
+        return Card(**validated_data)
+
+
+def parse_args(args):
+    options = {"requests": 100_000}
+    for arg in args:
+        key, value = arg.split("=")
+        options[key] = int(value)
+    return options
+
+
+def make_bodies(count):
+    return [
+        {
+            "plan_name": "basic",
+            "payment_details": {
+                "method_type": "credit_card",
+                "card_number": (
+                    "4242-4242-4242-4242" if i % 2 else "1234-1234-1234-1234"
+                ),
+                "expiration_date": "12/49",
+                "cvc": "123",
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def by_serializer(body):
+    serializer = SubscriptionRequestSerializer(data=body)
+    if not serializer.is_valid():
+        return serializer.errors
+    details = serializer.validated_data["payment_details"]
+    card_serializer = CardSerializer(
+        data={
+            "card_number": details["card_number"],
+            "card_expiry": details["expiration_date"],
+            "card_cvc": details["cvc"],
+        }
+    )
+    card_serializer.is_valid(raise_exception=True)
+    return dict(card_serializer.data)
+
+
+def by_validator(body):
+    try:
+        valid_data = validators.validate_subscription_request(body)
+    except serializers.ValidationError as e:
+        return e.detail
+    return payment_method_details(valid_data["payment_details"])
+
+
+def measure(title, func, bodies):
+    started = time.perf_counter()
+    results = [func(body) for body in bodies]
+    elapsed = time.perf_counter() - started
+    print(
+        f"{title:>10}: {elapsed:7.3f} s "
+        f"({elapsed / len(bodies) * 1e6:6.1f} us/request)"
+    )
+    return results
+
+
+def run(*args):
+    options = parse_args(args)
+    bodies = make_bodies(options["requests"])
+    print(f"requests={len(bodies)}")
+    expected = measure("serializer", by_serializer, bodies)
+    actual = measure("validator", by_validator, bodies)
+    print(f"identical results: {expected == actual}")
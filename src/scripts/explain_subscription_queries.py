@@ -0,0 +1,106 @@
+"""구독 핫 쿼리의 실행 계획을 확인하는 벤치마크.
+
+    make benchmark script=explain_subscription_queries args="users=100000"
+
+로컬 Postgres 에 사용자와 구독 이력을 시드한 뒤 EXPLAIN ANALYZE 결과와 평균 실행 시간을
+출력한다. 시드한 데이터는 마지막에 롤백한다.
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from subscription.adapters.models import SubscriptionPlan, UserSubscription
+from subscription.domain.domain_models import SubscriptionStatus
+
+BATCH_SIZE = 5000
+HISTORY_PER_USER = 3
+REPEAT = 200
+
+
+def parse_args(args):
+    options = {"users": 100_000}
+    for arg in args:
+        key, value = arg.split("=")
+        options[key] = int(value)
+    return options
+
+
+def seed(user_count):
+    plan = SubscriptionPlan.objects.create(
+        name="bench",
+        price="10.00",
+        payment_cycle="monthly",
+        description="Benchmark plan",
+        duration=timedelta(days=30),
+    )
+    today = date.today()
+    for offset in range(0, user_count, BATCH_SIZE):
+        users = User.objects.bulk_create(
+            User(username=f"bench-{i}", password="!")
+            for i in range(offset, min(offset + BATCH_SIZE, user_count))
+        )
+        subscriptions = []
+        for user in users:
+            end_date = today + timedelta(days=random.randint(0, 30))
+            for months in range(HISTORY_PER_USER, 0, -1):
+                subscriptions.append(
+                    UserSubscription(
+                        user=user,
+                        plan=plan,
+                        start_date=end_date - timedelta(days=30 * (months + 1)),
+                        end_date=end_date - timedelta(days=30 * months),
+                        status=SubscriptionStatus.EXPIRED.value,
+                    )
+                )
+            subscriptions.append(
+                UserSubscription(
+                    user=user,
+                    plan=plan,
+                    start_date=end_date - timedelta(days=30),
+                    end_date=end_date,
+                    status=SubscriptionStatus.ACTIVE.value,
+                )
+            )
+        UserSubscription.objects.bulk_create(subscriptions)
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {UserSubscription._meta.db_table}")
+    return users[-1].id
+
+
+def report(title, queryset):
+    print(f"\n=== {title}")
+    print(queryset.explain(analyze=True, buffers=True))
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        list(queryset.all())
+    elapsed = (time.perf_counter() - started) / REPEAT
+    print(f"--- 평균 {elapsed * 1000:.3f} ms ({REPEAT}회)")
+
+
+def run(*args):
+    options = parse_args(args)
+    with transaction.atomic():
+        user_id = seed(options["users"])
+        active = SubscriptionStatus.ACTIVE.value
+        expiring_on = date.today() + timedelta(days=15)
+
+        report(
+            "get_active_subscription_by_user_id",
+            UserSubscription.objects.filter(user_id=user_id, status=active).order_by(
+                "-start_date"
+            )[:1],
+        )
+        report(
+            "get_subscriptions_expiring_on",
+            UserSubscription.objects.filter(end_date=expiring_on, status=active),
+        )
+        report(
+            "iter_subscriptions_expiring_on (첫 페이지)",
+            UserSubscription.objects.filter(
+                end_date=expiring_on, status=active
+            ).order_by("end_date", "id")[:1000],
+        )
+        transaction.set_rollback(True)
@@ -0,0 +1,173 @@
+import functools
+import itertools
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from ..domain import domain_models
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "subscription:plan_catalog:version"
+
+
+class PlanCatalog:
+    """프로세스 로컬 구독 플랜 카탈로그.
+
+    플랜은 몇 개 되지 않고 거의 바뀌지 않으므로 이름/ID 조회를 dict 조회로 처리한다.
+    다른 프로세스에서의 변경은 공유 캐시에 있는 버전 카운터로 감지한다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name = {}  # type: Dict[str, domain_models.SubscriptionPlan]
+        self._by_id = {}  # type: Dict[uuid.UUID, domain_models.SubscriptionPlan]
+        self._version = None
+        self._checked_at = None
+        self._reloaded_at = None
+        # NOTE: invalidate() 마다 번호를 붙이고, 카탈로그를 읽을 때 그때까지의 마지막 번호를 기록한다.
+        self._changes = itertools.count(1)
+        self._last_change = 0
+        self._loaded_change = 0
+
+    @property
+    def version(self):
+        self._ensure_fresh()
+        return self._version
+
+    def get(self, name: str) -> Optional[domain_models.SubscriptionPlan]:
+        name = getattr(name, "value", name)
+        if self._changed_in_transaction():
+            return self._load(name=name)
+        self._ensure_fresh()
+        if name not in self._by_name and self._may_reload_on_miss():
+            # NOTE: 다른 프로세스에서 추가된 플랜일 수 있으므로 다시 읽되, 없는 이름이 반복해서
+            # 들어와도 확인 주기마다 한 번만 읽는다.
+            self.reload()
+        return self._by_name.get(name) or self._load(name=name)
+
+    def get_by_id(self, id: uuid.UUID) -> Optional[domain_models.SubscriptionPlan]:
+        if self._changed_in_transaction():
+            return self._load(id=id)
+        self._ensure_fresh()
+        if id not in self._by_id and self._may_reload_on_miss():
+            self.reload()
+        return self._by_id.get(id) or self._load(id=id)
+
+    def list(self) -> List[domain_models.SubscriptionPlan]:
+        if self._changed_in_transaction():
+            from .models import SubscriptionPlan
+
+            return [plan.to_domain() for plan in SubscriptionPlan.objects.all()]
+        self._ensure_fresh()
+        return list(self._by_name.values())
+
+    # NOTE: async 조회는 카탈로그가 최신이면 바로 돌려주고, 버전 확인이나 다시 읽기가 필요할
+    # 때만 스레드로 넘긴다.
+    async def aget(self, name: str) -> Optional[domain_models.SubscriptionPlan]:
+        plan = self._by_name.get(getattr(name, "value", name))
+        if plan is None or not self._is_fresh():
+            plan = await sync_to_async(self.get)(name)
+        return plan
+
+    async def aget_by_id(
+        self, id: uuid.UUID
+    ) -> Optional[domain_models.SubscriptionPlan]:
+        plan = self._by_id.get(id)
+        if plan is None or not self._is_fresh():
+            plan = await sync_to_async(self.get_by_id)(id)
+        return plan
+
+    def reload(self):
+        from .models import SubscriptionPlan
+
+        # 버전을 먼저 읽어야 로드 도중 커밋된 변경을 놓치지 않는다.
+        version = cache.get_or_set(VERSION_CACHE_KEY, 0, timeout=None)
+        loaded_change = self._last_change
+        plans = [plan.to_domain() for plan in SubscriptionPlan.objects.all()]
+        with self._lock:
+            self._loaded_change = loaded_change
+            self._by_name = {plan.name.value: plan for plan in plans}
+            self._by_id = {plan.id: plan for plan in plans}
+            self._version = version
+            self._checked_at = self._reloaded_at = time.monotonic()
+
+    def _changed_in_transaction(self) -> bool:
+        # NOTE: 현재 트랜잭션이 카탈로그를 읽은 뒤에 플랜을 바꿨으면 invalidate() 의 on_commit
+        # 콜백이 대기 중이다. 커밋 전에는 카탈로그가 그 변경을 모르므로 행을 직접 읽는다. 롤백되면
+        # Django 가 콜백을 버리므로 다시 카탈로그를 쓴다.
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            return False
+        return any(
+            getattr(callback, "func", None) == self._invalidated
+            and callback.args[0] > self._loaded_change
+            for _, callback, _ in connection.run_on_commit
+        )
+
+    def _load(self, **lookup) -> Optional[domain_models.SubscriptionPlan]:
+        # NOTE: 카탈로그에 없는 플랜(같은 트랜잭션에서 만들었거나 아직 다시 읽지 않은 플랜)은 그 행만
+        # 읽는다. 커밋되지 않았을 수 있으므로 카탈로그에는 넣지 않는다.
+        from .models import SubscriptionPlan
+
+        plan = SubscriptionPlan.objects.filter(**lookup).first()
+        return plan.to_domain() if plan else None
+
+    def warm(self):
+        try:
+            self.reload()
+        except DatabaseError:
+            logger.warning("Could not warm the plan catalog", exc_info=True)
+
+    def invalidate(self):
+        # NOTE: 커밋 전에 다시 읽으면 커밋되지 않은 플랜이 프로세스 전체에 캐시되므로 로컬 카탈로그도
+        # 커밋된 뒤에 비운다.
+        self._last_change = next(self._changes)
+        transaction.on_commit(functools.partial(self._invalidated, self._last_change))
+
+    def _invalidated(self, change: int):
+        bump_version()
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+            self._reloaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._checked_at is not None
+            and time.monotonic() - self._checked_at
+            < settings.PLAN_CATALOG_VERSION_CHECK_INTERVAL
+        )
+
+    def _may_reload_on_miss(self) -> bool:
+        return (
+            self._reloaded_at is None
+            or time.monotonic() - self._reloaded_at
+            >= settings.PLAN_CATALOG_VERSION_CHECK_INTERVAL
+        )
+
+    def _ensure_fresh(self):
+        if self._is_fresh():
+            return
+        version = cache.get(VERSION_CACHE_KEY)
+        if self._version is None or version != self._version:
+            self.reload()
+        else:
+            self._checked_at = time.monotonic()
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+plan_catalog = PlanCatalog()
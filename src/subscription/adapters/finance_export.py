@@ -0,0 +1,90 @@
+"""재무용 결제 내보내기. 결제 한 건이 CSV 한 줄 또는 JSON 한 줄이다."""
+
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.utils import timezone
+
+from subscription.domain.domain_models import PaymentStatus
+
+# NOTE: 내보내는 열 이름 -> values_list() 조회 경로. 순서대로 출력된다.
+COLUMNS = {
+    "payment_id": "id",
+    "date": "date",
+    "amount": "amount",
+    "status": "status",
+    "payment_method": "payment_method__method_type",
+    "subscription_id": "subscription_id",
+    "subscription_status": "subscription__status",
+    "user_id": "subscription__user_id",
+    "username": "subscription__user__username",
+    "plan_name": "subscription__plan__name",
+    "payment_cycle": "subscription__plan__payment_cycle",
+}
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# NOTE: 저장되는 값은 PaymentStatus 값이고 대소문자가 섞여 있다 ("Succeeded", "failed").
+# 필터는 대소문자를 가리지 않고 받아 저장된 값으로 바꾼다.
+STATUSES = {status.value.lower(): status.value for status in PaymentStatus}
+
+
+def period(start: Optional[str], end: Optional[str]) -> Tuple[datetime, datetime]:
+    """YYYY-MM-DD 두 개를 [start, end) 시각으로 바꾼다. end 가 없으면 start 다음 날까지다.
+
+    잘못된 값이면 ValueError 를 던진다.
+    """
+    if not start:
+        raise ValueError("start is required (YYYY-MM-DD)")
+    start_date = date.fromisoformat(start)
+    end_date = date.fromisoformat(end) if end else start_date + timedelta(days=1)
+    if end_date <= start_date:
+        raise ValueError("end must be after start")
+    # NOTE: 결제 시각을 날짜로 자르지 않고 시각 범위로 비교해야 (date, id) 인덱스를 탄다.
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date, time.min)),
+    )
+
+
+def statuses(values: Iterable[str]) -> List[str]:
+    """status=succeeded&status=refunded 또는 status=succeeded,refunded 형태를 받는다."""
+    requested = [value for item in values for value in item.split(",") if value]
+    unknown = sorted(value for value in requested if value.lower() not in STATUSES)
+    if unknown:
+        raise ValueError(f"Unknown payment status: {', '.join(unknown)}")
+    return [STATUSES[value.lower()] for value in requested]
+
+
+class _Echo:
+    # NOTE: csv.writer 가 만든 줄을 버퍼에 쌓지 않고 그대로 돌려받는다.
+    def write(self, value: str) -> str:
+        return value
+
+
+def lines(rows: Iterable[Sequence], format: str) -> Iterator[str]:
+    """values_list() 튜플을 CSV(헤더 포함) 또는 NDJSON 줄로 바꾼다. 한 번에 한 줄만 만든다."""
+    header = list(COLUMNS)
+    if format == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(_cell(value) for value in row)
+    elif format == "ndjson":
+        for row in rows:
+            yield json.dumps(dict(zip(header, row)), default=_json_value) + "\n"
+    else:
+        raise ValueError(f"Unknown export format: {format}")
+
+
+def _cell(value) -> str:
+    return "" if value is None else _json_value(value)
+
+
+def _json_value(value) -> str:
+    # NOTE: 금액(Decimal)은 float 로 바꾸지 않고 문자열 그대로 내보낸다.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,89 @@
+"""버전으로 무효화되는 렌더링 결과 캐시.
+
+요금제 페이지나 플랜 목록처럼 모든 사용자에게 같고 거의 바뀌지 않는 응답을 미리 만들어 둔다.
+원본의 버전(플랜 카탈로그 버전)이 바뀌면 다음 요청에서 한 번만 다시 만든다.
+
+- 프로세스 메모리에 현재 버전의 결과를 두어 적중 시에는 공유 캐시도 조회하지 않는다.
+- 여러 요청이 동시에 놓치면 공유 캐시의 락(cache.add)을 잡은 하나만 다시 만들고, 나머지는
+  이전 버전 결과가 있으면 그것을 돌려주고 없으면 새 결과가 올라올 때까지 잠깐 기다린다.
+"""
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = "subscription:fragment"
+POLL_INTERVAL = 0.05
+
+
+@dataclass(frozen=True)
+class Fragment:
+    version: object
+    body: bytes
+    etag: str
+
+
+_local = {}  # type: Dict[str, Fragment]
+_local_lock = threading.Lock()
+
+
+def get_or_build(name: str, version, build: Callable[[], bytes]) -> Fragment:
+    """name 의 version 결과를 돌려준다. 없으면 build() 로 만들어 저장한다."""
+    fragment = _local.get(name)
+    if fragment is not None and fragment.version == version:
+        return fragment
+
+    key = f"{KEY_PREFIX}:{name}"
+    fragment = cache.get(key)
+    if fragment is None or fragment.version != version:
+        fragment = _rebuild(key, version, build, stale=fragment)
+    with _local_lock:
+        _local[name] = fragment
+    return fragment
+
+
+def _rebuild(key: str, version, build, stale: Fragment = None) -> Fragment:
+    lock_key = f"{key}:lock:{version}"
+    lock_seconds = settings.FRAGMENT_CACHE_LOCK_SECONDS
+    if cache.add(lock_key, 1, timeout=lock_seconds):
+        return _build_and_store(key, lock_key, version, build)
+
+    # NOTE: 다른 요청이 다시 만드는 중이다. 이전 결과가 있으면 잠깐 동안은 그것으로 충분하다.
+    if stale is not None:
+        return stale
+    deadline = time.monotonic() + lock_seconds
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        fragment = cache.get(key)
+        if fragment is not None and fragment.version == version:
+            return fragment
+        if cache.add(lock_key, 1, timeout=lock_seconds):
+            # 락을 잡았던 요청이 결과를 저장하지 못하고 실패했다.
+            return _build_and_store(key, lock_key, version, build)
+    # NOTE: 기다려도 결과가 없으면 직접 만든다. 버전을 비워 두어 다음 요청이 다시 확인하게 한다.
+    return _fragment(None, build())
+
+
+def _build_and_store(key: str, lock_key: str, version, build) -> Fragment:
+    try:
+        fragment = _fragment(version, build())
+        cache.set(key, fragment, timeout=None)
+        return fragment
+    finally:
+        cache.delete(lock_key)
+
+
+def _fragment(version, body: bytes) -> Fragment:
+    return Fragment(
+        version=version, body=body, etag=hashlib.sha256(body).hexdigest()[:32]
+    )
+
+
+def clear():
+    with _local_lock:
+        _local.clear()
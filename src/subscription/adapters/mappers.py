@@ -0,0 +1,138 @@
+# mappers.py
+
+"""values_list() 튜플을 Django 모델 인스턴스를 거치지 않고 바로 도메인 객체로 만든다.
+
+대량 조회에서는 모델 인스턴스 생성(Model.from_db, 필드 디스크립터, _state)이 to_domain()
+보다 비싸므로, 리포지토리는 필요한 컬럼만 튜플로 읽어 여기의 매퍼로 변환한다.
+"""
+
+import uuid
+from typing import Callable, Iterable, Iterator, Optional
+
+import subscription.domain.domain_models as domain_models
+from subscription.adapters.catalog import plan_catalog
+
+PlanResolver = Callable[[uuid.UUID], Optional[domain_models.SubscriptionPlan]]
+
+SUBSCRIPTION_COLUMNS = (
+    "id",
+    "user_id",
+    "plan_id",
+    "start_date",
+    "end_date",
+    "status",
+    "renewal_attempts",
+)
+
+PAYMENT_METHOD_COLUMNS = ("id", "method_type", "details")
+
+PAYMENT_COLUMNS = (
+    "id",
+    "amount",
+    "date",
+    "status",
+    "subscription_id",
+    "subscription__user_id",
+    "subscription__plan_id",
+    "subscription__start_date",
+    "subscription__end_date",
+    "subscription__status",
+    "payment_method_id",
+    "payment_method__method_type",
+    "payment_method__details",
+    "subscription__renewal_attempts",
+)
+
+# NOTE: Enum(value) 호출은 매 행마다 하기엔 느리므로 값 -> 멤버 dict 로 찾는다.
+_SUBSCRIPTION_STATUSES = {
+    status.value: status for status in domain_models.SubscriptionStatus
+}
+_PAYMENT_STATUSES = {status.value: status for status in domain_models.PaymentStatus}
+_PAYMENT_METHOD_TYPES = {
+    method_type.value: method_type for method_type in domain_models.PaymentMethodType
+}
+
+
+def map_subscriptions(
+    rows: Iterable[tuple], get_plan: PlanResolver = None
+) -> Iterator[domain_models.UserSubscription]:
+    """SUBSCRIPTION_COLUMNS 순서의 행을 UserSubscription 으로 변환한다."""
+    get_plan = get_plan or plan_catalog.get_by_id
+    plans = {}
+    UserSubscription = domain_models.UserSubscription
+    for id, user_id, plan_id, start_date, end_date, status, attempts in rows:
+        plan = plans.get(plan_id)
+        if plan is None:
+            plan = plans[plan_id] = get_plan(plan_id)
+        yield UserSubscription(
+            user_id,
+            plan,
+            start_date,
+            end_date,
+            _SUBSCRIPTION_STATUSES[status],
+            id,
+            attempts,
+        )
+
+
+def map_payment_methods(
+    rows: Iterable[tuple],
+) -> Iterator[domain_models.PaymentMethod]:
+    """PAYMENT_METHOD_COLUMNS 순서의 행을 PaymentMethod 로 변환한다."""
+    PaymentMethod = domain_models.PaymentMethod
+    for id, method_type, details in rows:
+        yield PaymentMethod(_PAYMENT_METHOD_TYPES[method_type], details, id)
+
+
+def map_payments(
+    rows: Iterable[tuple], get_plan: PlanResolver = None
+) -> Iterator[domain_models.Payment]:
+    """PAYMENT_COLUMNS 순서의 행을 Payment 로 변환한다.
+
+    같은 구독/결제수단을 가리키는 결제는 하나의 도메인 객체를 공유한다. 공유용 dict 는 rows 를
+    다 읽을 때까지 남으므로 스트리밍할 때는 페이지마다 따로 호출한다.
+    """
+    get_plan = get_plan or plan_catalog.get_by_id
+    plans = {}
+    subscriptions = {}
+    payment_methods = {}
+    Payment = domain_models.Payment
+    for row in rows:
+        subscription_id = row[4]
+        subscription = subscriptions.get(subscription_id)
+        if subscription is None:
+            plan_id = row[6]
+            plan = plans.get(plan_id)
+            if plan is None:
+                plan = plans[plan_id] = get_plan(plan_id)
+            subscription = subscriptions[
+                subscription_id
+            ] = domain_models.UserSubscription(
+                row[5],
+                plan,
+                row[7],
+                row[8],
+                _SUBSCRIPTION_STATUSES[row[9]],
+                subscription_id,
+                row[13],
+            )
+
+        payment_method_id = row[10]
+        payment_method = None
+        if payment_method_id is not None:
+            payment_method = payment_methods.get(payment_method_id)
+            if payment_method is None:
+                payment_method = payment_methods[
+                    payment_method_id
+                ] = domain_models.PaymentMethod(
+                    _PAYMENT_METHOD_TYPES[row[11]], row[12], payment_method_id
+                )
+
+        yield Payment(
+            subscription,
+            payment_method,
+            float(row[1]),
+            row[2],
+            _PAYMENT_STATUSES[row[3]],
+            row[0],
+        )
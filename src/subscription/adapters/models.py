@@ -1,14 +1,19 @@
 import uuid
 from datetime import timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
-from ..domain import domain_models
+from ..domain import domain_models, events
+from . import renewal_schedule
+from .catalog import plan_catalog
 
 
 class SubscriptionPlan(models.Model):
@@ -59,6 +64,34 @@ class SubscriptionPlan(models.Model):
         )
         plan_django.save()
 
+    @staticmethod
+    def from_domain(plan: domain_models.SubscriptionPlan) -> "SubscriptionPlan":
+        return SubscriptionPlan(
+            id=plan.id,
+            name=plan.name.value,
+            price=Decimal(plan.price),
+            payment_cycle=plan.payment_cycle.value,
+            description=plan.description,
+            duration=timedelta(days=plan.duration_days),
+        )
+
+    @staticmethod
+    def bulk_upsert(plans: List[domain_models.SubscriptionPlan]):
+        # NOTE: update_from_domain 과 동일하게 이미 존재하는 플랜은 건드리지 않는다.
+        SubscriptionPlan.objects.bulk_create(
+            [SubscriptionPlan.from_domain(plan) for plan in plans],
+            ignore_conflicts=True,
+        )
+        # bulk_create 는 post_save 시그널을 보내지 않으므로 직접 무효화한다.
+        plan_catalog.invalidate()
+
+
+# NOTE: update_from_domain, 어드민, initialize_plans 등 플랜 row 가 바뀌는 모든 경로에서
+# 플랜 카탈로그 버전을 올린다.
+@receiver([post_save, post_delete], sender=SubscriptionPlan)
+def invalidate_plan_catalog(**kwargs):
+    plan_catalog.invalidate()
+
 
 class UserSubscription(models.Model):
     SUBSCRIPTION_STATUS_CHOICES = [
@@ -79,6 +112,39 @@ class UserSubscription(models.Model):
     status = models.CharField(
         max_length=10, choices=SUBSCRIPTION_STATUS_CHOICES, default="pending"
     )
+    # NOTE: 갱신 예정 시각. 활성 구독에만 있고 도메인 상태에서 계산된다 (renewal_schedule).
+    next_renewal_at = models.DateTimeField(null=True, blank=True)
+    # NOTE: 이번 기간의 갱신 결제가 거절된 횟수. 재시도 시각과 결제 idempotency key 에 쓰인다.
+    renewal_attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # get_by_user_id, get_active_subscription_by_user_id
+            models.Index(
+                fields=["user", "status", "-start_date"],
+                name="usersub_user_status_start_idx",
+            ),
+            # get_subscriptions_expiring_on 과 (end_date, id) keyset 순회
+            models.Index(
+                fields=["end_date", "id"],
+                condition=models.Q(status="active"),
+                name="usersub_active_end_date_idx",
+            ),
+            # 갱신 대상(next_renewal_at <= now) 조회와 백로그 집계
+            models.Index(
+                fields=["next_renewal_at", "id"],
+                condition=models.Q(status="active"),
+                name="usersub_active_renewal_idx",
+            ),
+        ]
+        constraints = [
+            # NOTE: 사용자당 활성 구독은 최대 하나. 활성 구독 조회도 이 인덱스 한 번으로 끝난다.
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status="active"),
+                name="unique_active_subscription_per_user",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s subscription to {self.plan.name}"
@@ -86,11 +152,12 @@ class UserSubscription(models.Model):
     def to_domain(self) -> domain_models.UserSubscription:
         return domain_models.UserSubscription(
             id=self.id,
-            user_id=self.user.id,
-            plan=self.plan.to_domain(),
+            user_id=self.user_id,
+            plan=plan_catalog.get_by_id(self.plan_id) or self.plan.to_domain(),
             start_date=self.start_date,
             end_date=self.end_date,
             status=domain_models.SubscriptionStatus(self.status),
+            renewal_attempts=self.renewal_attempts,
         )
 
     @staticmethod
@@ -106,8 +173,36 @@ class UserSubscription(models.Model):
         )
 
         subscription_django.status = subscription.status.value
+        subscription_django.renewal_attempts = subscription.renewal_attempts
+        subscription_django.next_renewal_at = renewal_schedule.next_renewal_at(
+            subscription
+        )
         subscription_django.save()
 
+    @staticmethod
+    def from_domain(
+        subscription: domain_models.UserSubscription,
+    ) -> "UserSubscription":
+        return UserSubscription(
+            id=subscription.id,
+            user_id=subscription.user_id,
+            plan_id=subscription.plan.id,
+            start_date=subscription.start_date,
+            end_date=subscription.end_date,
+            status=subscription.status.value,
+            next_renewal_at=renewal_schedule.next_renewal_at(subscription),
+            renewal_attempts=subscription.renewal_attempts,
+        )
+
+    @staticmethod
+    def bulk_upsert(subscriptions: List[domain_models.UserSubscription]):
+        UserSubscription.objects.bulk_create(
+            [UserSubscription.from_domain(s) for s in subscriptions],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["status", "next_renewal_at", "renewal_attempts"],
+        )
+
 
 class PaymentMethod(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -139,6 +234,23 @@ class PaymentMethod(models.Model):
             payment_method_django.details = payment_method.details
             payment_method_django.save()
 
+    @staticmethod
+    def from_domain(payment_method: domain_models.PaymentMethod) -> "PaymentMethod":
+        return PaymentMethod(
+            id=payment_method.id,
+            method_type=payment_method.method_type.value,
+            details=payment_method.details,
+        )
+
+    @staticmethod
+    def bulk_upsert(payment_methods: List[domain_models.PaymentMethod]):
+        PaymentMethod.objects.bulk_create(
+            [PaymentMethod.from_domain(method) for method in payment_methods],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["method_type", "details"],
+        )
+
 
 class Payment(models.Model):
     STATUS_CHOICES = [
@@ -163,6 +275,12 @@ class Payment(models.Model):
     date = models.DateTimeField()
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default="pending")
 
+    class Meta:
+        indexes = [
+            # (date, id) keyset 순회
+            models.Index(fields=["date", "id"], name="payment_date_id_idx"),
+        ]
+
     def __str__(self):
         return f"Payment of {self.amount} for {self.subscription.plan.name} of {self.subscription.user.username}"
 
@@ -170,7 +288,9 @@ class Payment(models.Model):
         return domain_models.Payment(
             id=self.id,
             subscription=self.subscription.to_domain(),
-            payment_method=self.payment_method.to_domain(),
+            payment_method=self.payment_method.to_domain()
+            if self.payment_method_id
+            else None,
             amount=float(self.amount),
             date=self.date,
             status=domain_models.PaymentStatus(self.status),
@@ -190,3 +310,205 @@ class Payment(models.Model):
 
         payment_django.status = payment.status.value
         payment_django.save()
+
+    @staticmethod
+    def from_domain(payment: domain_models.Payment) -> "Payment":
+        return Payment(
+            id=payment.id,
+            subscription_id=payment.subscription.id,
+            payment_method_id=payment.payment_method.id,
+            amount=Decimal(payment.amount),
+            date=payment.date,
+            status=payment.status.value,
+        )
+
+    @staticmethod
+    def bulk_upsert(payments: List[domain_models.Payment]):
+        Payment.objects.bulk_create(
+            [Payment.from_domain(payment) for payment in payments],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["status"],
+        )
+
+
+class CurrentSubscription(models.Model):
+    # NOTE: 사용자별 "지금 어떤 구독인가" 읽기 모델. 커맨드 핸들러가 같은 트랜잭션에서 갱신하고,
+    # rebuild_current_subscriptions 커맨드로 처음부터 다시 만들 수 있다.
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="current_subscription",
+    )
+    subscription = models.ForeignKey(
+        UserSubscription, on_delete=models.CASCADE, related_name="+"
+    )
+    plan_name = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=10, choices=UserSubscription.SUBSCRIPTION_STATUS_CHOICES
+    )
+    end_date = models.DateField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.plan_name} ({self.status})"
+
+    @staticmethod
+    def from_domain(
+        subscription: domain_models.UserSubscription,
+    ) -> "CurrentSubscription":
+        plan = subscription.plan
+        return CurrentSubscription(
+            user_id=subscription.user_id,
+            subscription_id=subscription.id,
+            plan_name=getattr(plan.name, "value", plan.name),
+            status=subscription.status.value,
+            end_date=subscription.end_date,
+            price=Decimal(plan.price),
+        )
+
+    @staticmethod
+    def bulk_upsert(subscriptions: List[domain_models.UserSubscription]):
+        # 같은 사용자의 구독이 여러 번 들어오면 마지막 것이 현재 구독이다.
+        rows = {
+            subscription.user_id: CurrentSubscription.from_domain(subscription)
+            for subscription in subscriptions
+        }
+        CurrentSubscription.objects.bulk_create(
+            list(rows.values()),
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=[
+                "subscription",
+                "plan_name",
+                "status",
+                "end_date",
+                "price",
+                "updated_at",
+            ],
+        )
+
+    @staticmethod
+    def rebuild(user_ids_sql: str = None, params=()) -> int:
+        """사용자마다 활성 구독을, 없으면 가장 최근에 시작한 구독을 현재 구독으로 다시 만든다.
+
+        user_ids_sql 에 사용자 ID 를 돌려주는 서브쿼리를 주면 그 사용자들만 다시 만든다.
+        """
+        where = f"WHERE s.user_id IN ({user_ids_sql})" if user_ids_sql else ""
+        sql = f"""
+            INSERT INTO {CurrentSubscription._meta.db_table}
+                (user_id, subscription_id, plan_name, status, end_date, price, updated_at)
+            SELECT DISTINCT ON (s.user_id)
+                s.user_id, s.id, p.name, s.status, s.end_date, p.price, now()
+            FROM {UserSubscription._meta.db_table} s
+            JOIN {SubscriptionPlan._meta.db_table} p ON p.id = s.plan_id
+            {where}
+            ORDER BY s.user_id, s.status = %s DESC, s.start_date DESC, s.end_date DESC
+            ON CONFLICT (user_id) DO UPDATE SET
+                subscription_id = EXCLUDED.subscription_id,
+                plan_name = EXCLUDED.plan_name,
+                status = EXCLUDED.status,
+                end_date = EXCLUDED.end_date,
+                price = EXCLUDED.price,
+                updated_at = EXCLUDED.updated_at
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [*params, domain_models.SubscriptionStatus.ACTIVE.value]
+            )
+            return cursor.rowcount
+
+
+class AccountVersion(models.Model):
+    # NOTE: 사용자의 구독/결제가 바뀔 때마다 증가하는 버전. 조회 API 의 ETag 로 쓴다.
+    # 유닛 오브 워크가 flush 할 때 같은 트랜잭션에서 올리므로 데이터와 어긋나지 않는다.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    version = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.user_id}: v{self.version}"
+
+    @staticmethod
+    def bump_all(user_ids_sql: str, params=()):
+        # NOTE: bump 와 같지만 대상 사용자를 서브쿼리로 받는다. 대량 적재 후에 쓴다.
+        table = AccountVersion._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, version) "
+                f"SELECT DISTINCT user_id, 1 FROM ({user_ids_sql}) AS changed(user_id) "
+                f"ON CONFLICT (user_id) DO UPDATE SET version = {table}.version + 1",
+                params,
+            )
+
+    @staticmethod
+    def bump(user_ids: List[int]):
+        if not user_ids:
+            return
+        table = AccountVersion._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, version) "
+                "SELECT unnest(%s::integer[]), 1 "
+                f"ON CONFLICT (user_id) DO UPDATE SET version = {table}.version + 1",
+                [sorted(set(user_ids))],
+            )
+
+
+class OutboxMessage(models.Model):
+    # NOTE: 트랜잭셔널 아웃박스. 도메인 이벤트는 상태 변경과 같은 트랜잭션에서 여기에 저장되고
+    # relay_outbox 태스크가 EVENT_HANDLERS 로 전달한다.
+    id = models.BigAutoField(primary_key=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(delivered_at__isnull=True),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
+
+    @staticmethod
+    def from_event(event: events.Event) -> "OutboxMessage":
+        return OutboxMessage(event_type=type(event).__name__, payload=vars(event))
+
+    def to_event(self) -> events.Event:
+        event_types = {cls.__name__: cls for cls in events.Event.__subclasses__()}
+        return event_types[self.event_type](**self.payload)
+
+
+class IdempotencyKey(models.Model):
+    # NOTE: Idempotency-Key 헤더로 받은 요청과 그 응답. 같은 키로 다시 요청하면 저장된 응답을 돌려주고,
+    # 처리 중(status_code 가 없음)이면 동시에 들어온 중복 요청을 막는다. expires_at 이 지나면 지운다.
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
@@ -0,0 +1,320 @@
+"""결제 게이트웨이 포트와 어댑터.
+
+- RandomPaymentGateway: 게이트웨이가 설정되지 않았을 때 쓰는 로컬 스텁 (이전 random.choice 동작)
+- HttpPaymentGateway: keep-alive 커넥션 풀, 타임아웃, 서킷 브레이커를 갖춘 HTTP 클라이언트
+
+게이트웨이 호출은 한 번만 시도한다. 일시적인 실패(타임아웃, 5xx, 서킷 열림)는
+PaymentGatewayUnavailable 로 알리고, 재시도는 호출한 쪽이 워커를 재우지 않고 예약한다
+(갱신 청크는 Celery countdown, API 는 503 + Retry-After). 같은 idempotency_key 로 다시 요청하면
+게이트웨이는 같은 결과를 돌려주므로 재시도해도 두 번 결제되지 않는다.
+"""
+
+import abc
+import http.client
+import json
+import logging
+import math
+import queue
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayUnavailable(Exception):
+    """게이트웨이에 일시적으로 결제를 요청할 수 없다. 나중에 같은 키로 다시 시도하면 된다."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(math.ceil(self.retry_after))
+
+
+class CircuitOpenError(PaymentGatewayUnavailable):
+    pass
+
+
+@dataclass(frozen=True)
+class ChargeRequest:
+    user_id: int
+    amount: float
+    idempotency_key: str
+
+
+@dataclass(frozen=True)
+class ChargeResult:
+    success: bool
+    transaction_id: Optional[str] = None
+    failure_reason: str = ""
+
+
+class AbstractPaymentGateway(abc.ABC):
+    @abc.abstractmethod
+    def charge(self, user_id: int, amount: float, idempotency_key: str) -> ChargeResult:
+        raise NotImplementedError
+
+    def charge_many(self, requests: Sequence[ChargeRequest]) -> List[ChargeResult]:
+        """여러 건을 결제하고 요청과 같은 순서로 결과를 돌려준다. 배치 API 가 없으면 한 건씩 요청한다."""
+        return [
+            self.charge(request.user_id, request.amount, request.idempotency_key)
+            for request in requests
+        ]
+
+    async def acharge(
+        self, user_id: int, amount: float, idempotency_key: str
+    ) -> ChargeResult:
+        # NOTE: 이벤트 루프를 막지 않도록 스레드 풀에서 호출한다.
+        return await sync_to_async(self.charge, thread_sensitive=False)(
+            user_id, amount, idempotency_key
+        )
+
+
+class RandomPaymentGateway(AbstractPaymentGateway):
+    # FIXME: 테스트 목적으로 임시로 추가한 게이트웨이
+    def charge(self, user_id: int, amount: float, idempotency_key: str) -> ChargeResult:
+        if random.choice([True, False]):
+            return ChargeResult(success=True, transaction_id=str(uuid.uuid4()))
+        return ChargeResult(
+            success=False,
+            failure_reason="Random failure reason or specific error message",
+        )
+
+
+class CircuitBreaker:
+    """연속 failure_threshold 번 실패하면 reset_timeout 초 동안 호출을 바로 거절한다.
+
+    그 뒤 한 번의 시험 호출(half-open)이 성공하면 닫히고, 실패하면 다시 열린다.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(
+                    "Payment gateway circuit is open",
+                    retry_after=max(remaining, 1.0),
+                )
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class ConnectionPool:
+    """호스트 하나에 대한 keep-alive HTTP 커넥션 풀.
+
+    최대 maxsize 개의 유휴 커넥션을 보관하고, 모두 사용 중이면 새 커넥션을 만든다.
+    """
+
+    def __init__(self, base_url: str, timeout: float, maxsize: int):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=maxsize)
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        connection_class = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: dict, headers: dict):
+        """(status, 응답 JSON) 을 돌려준다. 재사용한 커넥션이 끊겨 있었으면 한 번 새로 연결한다."""
+        payload = json.dumps(body).encode()
+        headers = {"Content-Type": "application/json", **headers}
+        for attempt in range(2):
+            try:
+                connection, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                connection, reused = self._new_connection(), False
+            try:
+                connection.request(
+                    method, self.base_path + path, body=payload, headers=headers
+                )
+                response = connection.getresponse()
+                data = response.read()
+            except (
+                http.client.RemoteDisconnected,
+                BrokenPipeError,
+                ConnectionResetError,
+            ):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    self._idle.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            return response.status, json.loads(data or b"{}")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HttpPaymentGateway(AbstractPaymentGateway):
+    """POST {base_url}/charges 로 결제를 요청하는 게이트웨이 클라이언트."""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 2.0,
+        pool_size: int = 10,
+        breaker: CircuitBreaker = None,
+        max_batch_size: int = 500,
+    ):
+        self.pool = ConnectionPool(base_url, timeout, pool_size)
+        self.max_batch_size = max_batch_size
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30)
+
+    def charge(self, user_id: int, amount: float, idempotency_key: str) -> ChargeResult:
+        status, data = self._post(
+            "/charges",
+            {"user_id": user_id, "amount": amount},
+            {"Idempotency-Key": idempotency_key},
+        )
+        return self._result(status, data)
+
+    def charge_many(self, requests: Sequence[ChargeRequest]) -> List[ChargeResult]:
+        """POST /charges/batch 로 max_batch_size 건씩 나눠 요청한다.
+
+        배치 하나가 게이트웨이 장애로 실패하면 PaymentGatewayUnavailable 이 올라간다. 항목마다
+        멱등 키가 있으므로 이미 처리된 배치를 다시 보내도 두 번 결제되지 않는다.
+        """
+        results = []
+        for start in range(0, len(requests), self.max_batch_size):
+            batch = requests[start : start + self.max_batch_size]
+            status, data = self._post(
+                "/charges/batch",
+                {
+                    "charges": [
+                        {
+                            "user_id": request.user_id,
+                            "amount": request.amount,
+                            "idempotency_key": request.idempotency_key,
+                        }
+                        for request in batch
+                    ]
+                },
+            )
+            items = data.get("results") if status == 200 else None
+            if items is None or len(items) != len(batch):
+                # NOTE: 항목별 결과를 맞출 수 없으면 전체를 거절된 것으로 본다.
+                results.extend(self._result(status, data) for _ in batch)
+                continue
+            results.extend(self._result(200, item) for item in items)
+        return results
+
+    def _post(self, path: str, body: dict, headers: dict = None):
+        self.breaker.before_call()
+        try:
+            status, data = self.pool.request("POST", path, body, headers or {})
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            self.breaker.record_failure()
+            raise PaymentGatewayUnavailable(f"Payment gateway request failed: {e!r}")
+
+        if status >= 500 or status == 429:
+            self.breaker.record_failure()
+            raise PaymentGatewayUnavailable(f"Payment gateway responded with {status}")
+
+        self.breaker.record_success()
+        return status, data
+
+    @staticmethod
+    def _result(status: int, data: dict) -> ChargeResult:
+        if status == 200 and data.get("status") == "succeeded":
+            return ChargeResult(success=True, transaction_id=data.get("id"))
+        return ChargeResult(
+            success=False,
+            transaction_id=data.get("id"),
+            failure_reason=data.get("failure_reason") or f"Declined ({status})",
+        )
+
+
+def retry_countdown(attempt: int) -> float:
+    """attempt 번째 재시도까지 기다릴 시간 (초). 지수 백오프에 지터를 더해 재시도가 몰리지 않게 한다."""
+    delay = min(
+        settings.PAYMENT_RETRY_MAX_DELAY,
+        settings.PAYMENT_RETRY_BASE_DELAY * 2**attempt,
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> AbstractPaymentGateway:
+    """설정에 맞는 프로세스 공용 게이트웨이. 커넥션 풀과 서킷 브레이커를 요청 사이에 공유한다."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+def build_gateway() -> AbstractPaymentGateway:
+    if not settings.PAYMENT_GATEWAY_URL:
+        return RandomPaymentGateway()
+    return HttpPaymentGateway(
+        settings.PAYMENT_GATEWAY_URL,
+        timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+        pool_size=settings.PAYMENT_GATEWAY_POOL_SIZE,
+        max_batch_size=settings.PAYMENT_GATEWAY_BATCH_SIZE,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.PAYMENT_GATEWAY_BREAKER_THRESHOLD,
+            reset_timeout=settings.PAYMENT_GATEWAY_BREAKER_RESET_TIMEOUT,
+        ),
+    )
@@ -0,0 +1,58 @@
+"""구독 갱신 예정 시각(next_renewal_at) 계산.
+
+활성 구독은 end_date 다음 날 0시에 갱신 대상이 되고, 플랜별로 설정한 jitter 만큼 뒤로 흩어져서
+결제가 한 시각에 몰리지 않는다. jitter 는 구독 ID 로 정해지므로 다시 계산해도 같은 값이 나온다.
+갱신 결제가 거절되면 RENEWAL_RETRY_DELAY_SECONDS 부터 두 배씩 늘어나는 간격으로 다시 시도한다.
+"""
+
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..domain import domain_models
+
+
+def jitter_seconds(plan_name: str, subscription_id: uuid.UUID) -> int:
+    plan_name = getattr(plan_name, "value", plan_name)
+    window = settings.RENEWAL_JITTER_SECONDS.get(
+        plan_name, settings.RENEWAL_DEFAULT_JITTER_SECONDS
+    )
+    if window <= 0:
+        return 0
+    return subscription_id.int % window
+
+
+def retry_delay_seconds(renewal_attempts: int) -> int:
+    """거절된 횟수만큼 쌓인 재시도 지연. 1, 2, 4, ... 배를 더한 값이다."""
+    return settings.RENEWAL_RETRY_DELAY_SECONDS * (2**renewal_attempts - 1)
+
+
+def due_at(
+    end_date: date,
+    plan_name: str,
+    subscription_id: uuid.UUID,
+    renewal_attempts: int = 0,
+) -> datetime:
+    start_of_next_day = timezone.make_aware(
+        datetime.combine(end_date + timedelta(days=1), time.min)
+    )
+    return start_of_next_day + timedelta(
+        seconds=jitter_seconds(plan_name, subscription_id)
+        + retry_delay_seconds(renewal_attempts)
+    )
+
+
+def next_renewal_at(
+    subscription: domain_models.UserSubscription,
+) -> Optional[datetime]:
+    if subscription.status != domain_models.SubscriptionStatus.ACTIVE:
+        return None
+    return due_at(
+        subscription.end_date,
+        subscription.plan.name,
+        subscription.id,
+        subscription.renewal_attempts,
+    )
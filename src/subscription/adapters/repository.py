@@ -1,15 +1,90 @@
 # repository.py
 
-from datetime import date, timedelta
-from typing import Generic, Iterable, List, Optional, Protocol, Set, TypeVar
+import inspect
+import uuid
+from datetime import date, datetime, timedelta
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Model, Q, QuerySet
 
 import subscription.adapters.models as models
 import subscription.domain.domain_models as domain_models
+from subscription.domain.events import Event
+from subscription.adapters import mappers
+from subscription.adapters.catalog import plan_catalog
 
 T = TypeVar("T")
 
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def iter_keyset(
+    queryset: QuerySet,
+    field: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    columns: Sequence[str] = None,
+) -> Iterator[Union[Model, tuple]]:
+    """(field, id) keyset 페이지네이션으로 chunk_size 개씩 읽는다.
+
+    OFFSET 이나 긴 트랜잭션 없이 테이블 전체를 일정한 메모리로 순회할 수 있다.
+    columns 를 넘기면 모델 인스턴스 대신 values_list() 튜플을 돌려준다.
+    """
+    for rows in iter_keyset_pages(queryset, field, chunk_size, columns):
+        yield from rows
+
+
+def iter_keyset_pages(
+    queryset: QuerySet,
+    field: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    columns: Sequence[str] = None,
+) -> Iterator[List[Union[Model, tuple]]]:
+    """iter_keyset 과 같지만 한 페이지(chunk_size 개) 목록씩 돌려준다."""
+    keyset = (field, "id") if field != "id" else ("id",)
+    queryset = queryset.order_by(*keyset)
+    if columns is not None:
+        queryset = queryset.values_list(*columns)
+        id_index = columns.index("id")
+        field_index = columns.index(field)
+    page = queryset
+    while True:
+        rows = list(page[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        if columns is not None:
+            last_id, value = last[id_index], last[field_index]
+        else:
+            last_id, value = last.id, last
+            for attr in field.split("__"):
+                value = getattr(value, attr)
+        after = Q(id__gt=last_id)
+        if field != "id":
+            after = Q(**{f"{field}__gt": value}) | (Q(**{field: value}) & after)
+        page = queryset.filter(after)
+
 
 class AbstractRepository(Protocol, Generic[T]):
+    # NOTE: identity map 이 자연키로 캐시할 수 있는 조회 메서드 이름 -> 자연키 함수
+    natural_key_lookups: Dict[str, Callable[..., Hashable]] = {}
+
     def add(self, obj: T):
         ...
 
@@ -22,178 +97,564 @@ class AbstractRepository(Protocol, Generic[T]):
     def update(self, obj: T):
         ...
 
+    def add_many(self, objs: List[T]):
+        ...
+
+    def natural_keys(self, obj: T) -> Iterable[Hashable]:
+        return ()
 
-class TrackingRepository:
-    seen: Set[T]
 
+class TrackingRepository:
     def __init__(self, repo: AbstractRepository):
-        self.seen = set()  # type: Set[domain_model.T]
         self._repo = repo
+        # NOTE: 유닛 오브 워크 안에서는 쓰기를 바로 하지 않고 트랜잭션(세이브포인트) 단계별로
+        # 모아 두었다가 flush() 때 한 번에 bulk upsert 한다.
+        self._pending = []  # type: List[Dict[object, T]]
+        # NOTE: identity map. 같은 유닛 오브 워크 안에서 같은 엔티티는 하나의 객체로만 존재한다.
+        self._identity_map = {}  # type: Dict[object, T]
+        self._natural_keys = {}  # type: Dict[Hashable, T]
+        self._natural_key_lookups = {
+            "get": lambda id: ("id", id),
+            **getattr(repo, "natural_key_lookups", {}),
+        }
+
+    @property
+    def seen(self) -> Iterable[T]:
+        return self._identity_map.values()
 
     def add(self, obj: T):
-        self._repo.add(obj)
-        self.seen.add(obj)
+        self._write(obj, self._repo.add)
+        if self._pending:
+            self._register(obj)
 
     def get(self, id) -> Optional[T]:
-        obj = self._repo.get(id)
-        if obj:
-            self.seen.add(obj)
-        return obj
+        return self._lookup("get", self._repo.get, id)
 
     def update(self, obj: T):
-        self._repo.update(obj)
-        self.seen.add(obj)
+        self._write(obj, self._repo.update)
+        if self._pending:
+            self._register(obj)
+
+    def _write(self, obj: T, write_through):
+        if self._pending:
+            self._pending[-1][obj.id] = obj
+        else:
+            write_through(obj)
+
+    def _identity_keys(self, obj: T) -> List[Hashable]:
+        natural_keys = getattr(self._repo, "natural_keys", None)
+        keys = [("id", obj.id)]
+        if natural_keys:
+            keys.extend(natural_keys(obj))
+        return keys
+
+    def _register(self, obj: Optional[T]) -> Optional[T]:
+        if obj is None:
+            return None
+        # 이미 로드된 엔티티가 있으면 새로 만든 객체 대신 그 객체를 돌려준다.
+        obj = self._identity_map.setdefault(obj.id, obj)
+        for key in self._identity_keys(obj):
+            self._natural_keys[key] = obj
+        if getattr(obj, "_events", None):
+            # 블록 밖에서 발생한 이벤트도 유닛 오브 워크가 수집할 수 있게 한다.
+            obj.mark_dirty()
+        return obj
+
+    def _lookup(self, name: str, method, *args, **kwargs):
+        obj = self._cached(name, *args, **kwargs)
+        if obj is not None:
+            return obj
+        return self._track(method(*args, **kwargs))
+
+    def _cached(self, name: str, *args, **kwargs) -> Optional[T]:
+        key_func = self._natural_key_lookups.get(name)
+        if self._pending and key_func:
+            key = key_func(*args, **kwargs)
+            obj = self._natural_keys.get(key)
+            # 메모리에서 상태가 바뀌어 더 이상 자연키에 해당하지 않으면 다시 조회한다.
+            if obj is not None and key in self._identity_keys(obj):
+                return obj
+            self._natural_keys.pop(key, None)
+        return None
+
+    def _track(self, result):
+        if not self._pending or isinstance(result, Iterator):
+            # NOTE: 블록 밖의 조회와 iter_* 스트리밍 결과는 추적하지 않는다.
+            return result
+        if isinstance(result, Iterable) and not isinstance(result, str):
+            return [self._register(item) for item in result]
+        return self._register(result)
+
+    def begin(self):
+        if not self._pending:
+            self._identity_map.clear()
+            self._natural_keys.clear()
+        self._pending.append({})
+
+    def end(self, discard: bool = False):
+        level = self._pending.pop()
+        if not discard and self._pending:
+            self._pending[-1].update(level)
+
+    @property
+    def pending(self) -> List[T]:
+        return [obj for level in self._pending for obj in level.values()]
+
+    def flush(self):
+        pending = self.pending
+        if pending:
+            self._repo.add_many(pending)
+        for level in self._pending:
+            level.clear()
 
     # NOTE: 이 메서드는 래핑된 리포지토리의 get,add 이외의 메서드가 호출될 때 사용된다.
+    # 만든 래퍼는 인스턴스에 저장해 두므로 다음 호출부터는 __getattr__ 를 거치지 않는다.
     def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self._repo, name)
+        if not callable(method):
+            return method
+
         def wrapper(*args, **kwargs):
-            result = getattr(self._repo, name)(*args, **kwargs)
-            if isinstance(result, Iterable) and not isinstance(result, str):
-                for item in result:
-                    self.seen.add(item)
-            else:
-                self.seen.add(result)
-            return result
+            return self._lookup(name, method, *args, **kwargs)
+
+        self.__dict__[name] = wrapper
+        return wrapper
+
+
+class AsyncTrackingRepository(TrackingRepository):
+    """`async with AsyncDjangoUnitOfWork()` 안에서 쓰는 TrackingRepository.
 
+    조회는 래핑된 리포지토리의 a 접두사 메서드(aget, aget_active_subscription_by_user_id 등)를
+    await 하고, 쓰기는 동기 버전과 같이 flush 때까지 메모리에 모아 둔다.
+    """
+
+    async def aget(self, id) -> Optional[T]:
+        return await self._alookup("get", self._repo.aget, id)
+
+    async def _alookup(self, name: str, method, *args, **kwargs):
+        obj = self._cached(name, *args, **kwargs)
+        if obj is not None:
+            return obj
+        return self._track(await method(*args, **kwargs))
+
+    def __getattr__(self, name: str):
+        method = getattr(self._repo, name, None)
+        if not inspect.iscoroutinefunction(method):
+            return super().__getattr__(name)
+
+        # NOTE: aget_x 는 get_x 와 같은 자연키를 쓴다.
+        async def wrapper(*args, **kwargs):
+            return await self._alookup(name[1:], method, *args, **kwargs)
+
+        self.__dict__[name] = wrapper
         return wrapper
 
 
 class DjangoUserSubscriptionRepository(
     AbstractRepository[domain_models.UserSubscription]
 ):
+    natural_key_lookups = {
+        "get_active_subscription_by_user_id": lambda user_id: ("active", user_id),
+    }
+
+    # NOTE: plan 은 플랜 카탈로그에서 가져오므로 JOIN 하지 않는다. 모델 인스턴스를 만들지 않고
+    # values_list() 튜플을 바로 도메인 객체로 변환한다.
+    @staticmethod
+    def _queryset():
+        return models.UserSubscription.objects.all()
+
+    @staticmethod
+    def _map(queryset) -> List[domain_models.UserSubscription]:
+        return list(
+            mappers.map_subscriptions(
+                queryset.values_list(*mappers.SUBSCRIPTION_COLUMNS)
+            )
+        )
+
+    @staticmethod
+    async def _amap(queryset) -> List[domain_models.UserSubscription]:
+        rows = [
+            row async for row in queryset.values_list(*mappers.SUBSCRIPTION_COLUMNS)
+        ]
+        plans = {
+            plan_id: await plan_catalog.aget_by_id(plan_id)
+            for plan_id in {row[2] for row in rows}
+        }
+        return list(mappers.map_subscriptions(rows, plans.get))
+
+    def natural_keys(self, subscription: domain_models.UserSubscription):
+        if subscription.status == domain_models.SubscriptionStatus.ACTIVE:
+            yield ("active", subscription.user_id)
+
     def add(self, subscription: domain_models.UserSubscription):
         self.update(subscription)
 
     def get(self, subscription_id: int) -> Optional[domain_models.UserSubscription]:
-        try:
-            subscription = models.UserSubscription.objects.get(id=subscription_id)
-            return subscription.to_domain()
+        subscriptions = self._map(self._queryset().filter(id=subscription_id))
+        if not subscriptions:
+            raise ValueError(f"Subscription for  {subscription_id} does not exist")
+        return subscriptions[0]
 
-        except models.UserSubscription.DoesNotExist:
+    def list_for_update(
+        self, subscription_ids: List[uuid.UUID]
+    ) -> List[domain_models.UserSubscription]:
+        # NOTE: 여러 워커가 겹치는 구독을 잠가도 교착되지 않도록 항상 id 순서로 잠근다.
+        queryset = (
+            self._queryset()
+            .select_for_update()
+            .filter(id__in=subscription_ids)
+            .order_by("id")
+        )
+        return self._map(queryset)
+
+    async def aget(
+        self, subscription_id: int
+    ) -> Optional[domain_models.UserSubscription]:
+        subscriptions = await self._amap(self._queryset().filter(id=subscription_id))
+        if not subscriptions:
             raise ValueError(f"Subscription for  {subscription_id} does not exist")
+        return subscriptions[0]
 
     def get_by_user_id(self, user_id: int) -> Optional[domain_models.UserSubscription]:
-        queryset = models.UserSubscription.objects.filter(user_id=user_id)
-
-        django_subscription = queryset.first()
-
-        if django_subscription:
-            return django_subscription.to_domain()
-        else:
-            return None
+        queryset = self._queryset().filter(user_id=user_id).order_by("pk")[:1]
+        subscriptions = self._map(queryset)
+        return subscriptions[0] if subscriptions else None
 
     def get_subscriptions_expiring_on(
         self,
         date: date,
     ) -> List[domain_models.UserSubscription]:
-        return [
-            django_subscription.to_domain()
-            for django_subscription in models.UserSubscription.objects.filter(
+        return self._map(
+            self._queryset().filter(
                 end_date=date,
                 status=domain_models.SubscriptionStatus.ACTIVE.value,
             )
-        ]
+        )
+
+    def iter_subscriptions_expiring_on(
+        self, date: date, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[domain_models.UserSubscription]:
+        queryset = self._queryset().filter(
+            end_date=date,
+            status=domain_models.SubscriptionStatus.ACTIVE.value,
+        )
+        pages = iter_keyset_pages(
+            queryset, "end_date", chunk_size, mappers.SUBSCRIPTION_COLUMNS
+        )
+        for rows in pages:
+            yield from mappers.map_subscriptions(rows)
+
+    def _due(self, now: datetime) -> QuerySet:
+        return self._queryset().filter(
+            status=domain_models.SubscriptionStatus.ACTIVE.value,
+            next_renewal_at__lte=now,
+        )
+
+    def claim_due(
+        self, now: datetime, lease_until: datetime, limit: int
+    ) -> List[Tuple[uuid.UUID, int]]:
+        """갱신 시각이 지난 활성 구독의 (id, user_id) 를 limit 개까지 가져간다.
+
+        가져간 구독은 next_renewal_at 을 lease_until 로 미뤄 두므로 처리 중에 다시 가져가지 않고,
+        처리가 실패하면 그 시각 이후에 다시 대상이 된다. SKIP LOCKED 로 잠그므로 폴러가 겹쳐 돌아도
+        같은 구독을 두 번 가져가지 않는다.
+        """
+        with transaction.atomic():
+            keys = list(
+                self._due(now)
+                .order_by("next_renewal_at", "id")
+                .select_for_update(skip_locked=True)
+                .values_list("id", "user_id")[:limit]
+            )
+            if keys:
+                models.UserSubscription.objects.filter(
+                    id__in=[id for id, _ in keys]
+                ).update(next_renewal_at=lease_until)
+        return keys
+
+    def renewal_backlog(self, now: datetime) -> dict:
+        stats = self._due(now).aggregate(due=Count("id"), oldest=Min("next_renewal_at"))
+        oldest = stats["oldest"]
+        return {
+            "due": stats["due"],
+            "oldest_due_at": oldest,
+            "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+        }
 
     def list(self) -> List[domain_models.UserSubscription]:
-        return [
-            django_subscription.to_domain()
-            for django_subscription in models.UserSubscription.objects.all()
-        ]
+        return self._map(self._queryset())
+
+    def iter_list(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[domain_models.UserSubscription]:
+        pages = iter_keyset_pages(
+            self._queryset(), "end_date", chunk_size, mappers.SUBSCRIPTION_COLUMNS
+        )
+        for rows in pages:
+            yield from mappers.map_subscriptions(rows)
 
     def update(self, subscription: domain_models.UserSubscription):
         models.UserSubscription.update_from_domain(subscription)
 
+    def add_many(self, subscriptions: List[domain_models.UserSubscription]):
+        models.UserSubscription.bulk_upsert(subscriptions)
+
     def get_active_subscription_by_user_id(
         self, user_id: int
     ) -> Optional[domain_models.UserSubscription]:
-        try:
-            active_subscription = (
-                models.UserSubscription.objects.filter(
-                    user_id=user_id,
-                    status=domain_models.SubscriptionStatus.ACTIVE.value,
-                )
-                .order_by("-start_date")
-                .first()
-            )
-            return active_subscription.to_domain() if active_subscription else None
-        except models.UserSubscription.DoesNotExist:
-            return None
+        queryset = self._queryset().filter(
+            user_id=user_id,
+            status=domain_models.SubscriptionStatus.ACTIVE.value,
+        )
+        subscriptions = self._map(queryset.order_by("-start_date")[:1])
+        return subscriptions[0] if subscriptions else None
+
+    def list_active_by_user_ids(
+        self, user_ids: List[int]
+    ) -> List[domain_models.UserSubscription]:
+        queryset = self._queryset().filter(
+            user_id__in=user_ids,
+            status=domain_models.SubscriptionStatus.ACTIVE.value,
+        )
+        return self._map(queryset)
+
+    async def aget_active_subscription_by_user_id(
+        self, user_id: int
+    ) -> Optional[domain_models.UserSubscription]:
+        queryset = self._queryset().filter(
+            user_id=user_id,
+            status=domain_models.SubscriptionStatus.ACTIVE.value,
+        )
+        subscriptions = await self._amap(queryset.order_by("-start_date")[:1])
+        return subscriptions[0] if subscriptions else None
 
 
 class DjangoSubscriptionPlanRepository(
     AbstractRepository[domain_models.SubscriptionPlan]
 ):
+    natural_key_lookups = {
+        "get": lambda name: ("name", getattr(name, "value", name)),
+        "get_by_id": lambda id: ("id", id),
+    }
+
+    def natural_keys(self, plan: domain_models.SubscriptionPlan):
+        yield ("name", getattr(plan.name, "value", plan.name))
+
     def add(self, plan: domain_models.SubscriptionPlan):
         self.update(plan)
 
     def get(self, name: str) -> domain_models.SubscriptionPlan:
-        try:
-            plan = models.SubscriptionPlan.objects.get(name=name)
-            return plan.to_domain()
-        except models.SubscriptionPlan.DoesNotExist:
+        plan = plan_catalog.get(name)
+        if plan is None:
             raise ValueError(f"Plan {name} does not exist")
+        return plan
 
     def get_by_id(self, id: int) -> domain_models.SubscriptionPlan:
-        try:
-            plan = models.SubscriptionPlan.objects.get(id=id)
-            return plan.to_domain()
-        except models.SubscriptionPlan.DoesNotExist:
+        plan = plan_catalog.get_by_id(id)
+        if plan is None:
             raise ValueError(f"Plan {id} does not exist")
+        return plan
+
+    async def aget(self, name: str) -> domain_models.SubscriptionPlan:
+        plan = await plan_catalog.aget(name)
+        if plan is None:
+            raise ValueError(f"Plan {name} does not exist")
+        return plan
+
+    async def aget_by_id(self, id: int) -> domain_models.SubscriptionPlan:
+        plan = await plan_catalog.aget_by_id(id)
+        if plan is None:
+            raise ValueError(f"Plan {id} does not exist")
+        return plan
 
     def list(self) -> List[domain_models.SubscriptionPlan]:
-        return [
-            django_plan.to_domain()
-            for django_plan in models.SubscriptionPlan.objects.all()
-        ]
+        return plan_catalog.list()
+
+    def iter_list(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[domain_models.SubscriptionPlan]:
+        yield from plan_catalog.list()
 
     def update(self, plan: domain_models.SubscriptionPlan):
         models.SubscriptionPlan.update_from_domain(plan)
 
+    def add_many(self, plans: List[domain_models.SubscriptionPlan]):
+        models.SubscriptionPlan.bulk_upsert(plans)
+
 
 class DjangoPaymentRepository(AbstractRepository[domain_models.Payment]):
+    # NOTE: 결제는 subscription, payment_method 를 따라가므로 한 번의 JOIN 으로 필요한 컬럼만
+    # 함께 가져온다. plan 은 플랜 카탈로그에서 가져온다.
+    @staticmethod
+    def _queryset():
+        return models.Payment.objects.all()
+
+    @staticmethod
+    def _map(queryset) -> List[domain_models.Payment]:
+        return list(
+            mappers.map_payments(queryset.values_list(*mappers.PAYMENT_COLUMNS))
+        )
+
     def add(self, payment: domain_models.Payment):
         self.update(payment)
 
     def get(self, id: int) -> domain_models.Payment:
-        try:
-            payment = models.Payment.objects.get(id=id)
-            return payment.to_domain()
-        except models.Payment.DoesNotExist:
+        payments = self._map(self._queryset().filter(id=id))
+        if not payments:
             raise ValueError(f"Payment for  {id} does not exist")
+        return payments[0]
 
     def get_list_by_user_id(self, user_id: int) -> domain_models.Payment:
-        try:
-            payments = models.Payment.objects.filter(subscription__user_id=user_id)
-            return [payment.to_domain() for payment in payments]
-        except models.Payment.DoesNotExist:
-            raise ValueError(f"Payment for user {user_id} does not exist")
+        return self._map(self._queryset().filter(subscription__user_id=user_id))
 
     def list(self) -> List[domain_models.Payment]:
-        return [
-            django_payment.to_domain()
-            for django_payment in models.Payment.objects.all()
-        ]
+        return self._map(self._queryset())
+
+    def iter_list(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[domain_models.Payment]:
+        # NOTE: 매퍼의 공유 캐시가 테이블 전체로 커지지 않도록 페이지마다 매퍼를 새로 돌린다.
+        pages = iter_keyset_pages(
+            self._queryset(), "date", chunk_size, mappers.PAYMENT_COLUMNS
+        )
+        for rows in pages:
+            yield from mappers.map_payments(rows)
+
+    def iter_list_by_user_id(
+        self, user_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[domain_models.Payment]:
+        queryset = self._queryset().filter(subscription__user_id=user_id)
+        pages = iter_keyset_pages(queryset, "date", chunk_size, mappers.PAYMENT_COLUMNS)
+        for rows in pages:
+            yield from mappers.map_payments(rows)
+
+    def history_page(
+        self, user_id: int, before: Optional[Tuple[datetime, uuid.UUID]], limit: int
+    ) -> List[dict]:
+        """사용자의 결제를 최신순으로 limit 개 돌려준다. before 는 이전 페이지 마지막 (date, id) 이다."""
+        queryset = self._queryset().filter(subscription__user_id=user_id)
+        if before is not None:
+            before_date, before_id = before
+            queryset = queryset.filter(
+                Q(date__lt=before_date) | Q(date=before_date, id__lt=before_id)
+            )
+        return list(
+            queryset.order_by("-date", "-id").values(
+                "id",
+                "amount",
+                "date",
+                "status",
+                plan_name=F("subscription__plan__name"),
+            )[:limit]
+        )
+
+    def export_rows(
+        self,
+        columns: Sequence[str],
+        start: datetime,
+        end: datetime,
+        statuses: Sequence[str] = (),
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[tuple]:
+        """[start, end) 사이 결제의 columns 를 (date, id) 순으로 돌려준다.
+
+        columns 에 구독, 사용자, 플랜, 결제 수단 컬럼이 있으면 한 번의 JOIN 쿼리로 읽는다. 서버 측 커서로
+        chunk_size 개씩 가져오므로 기간이 길어도 메모리가 일정하다.
+        """
+        queryset = models.Payment.objects.filter(date__gte=start, date__lt=end)
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        return (
+            queryset.order_by("date", "id")
+            .values_list(*columns)
+            .iterator(chunk_size=chunk_size)
+        )
 
     def update(self, payment: domain_models.Payment):
         models.Payment.update_from_domain(payment)
 
+    def add_many(self, payments: List[domain_models.Payment]):
+        models.Payment.bulk_upsert(payments)
+
 
 class DjangoPaymentMethodRepository(AbstractRepository[domain_models.PaymentMethod]):
+    @staticmethod
+    def _map(queryset) -> List[domain_models.PaymentMethod]:
+        return list(
+            mappers.map_payment_methods(
+                queryset.values_list(*mappers.PAYMENT_METHOD_COLUMNS)
+            )
+        )
+
     def add(self, payment_method: domain_models.PaymentMethod):
         self.update(payment_method)
 
     def get(self, id: int) -> domain_models.PaymentMethod:
-        try:
-            payment_method = models.PaymentMethod.objects.get(id=id)
-            return payment_method.to_domain()
-        except models.PaymentMethod.DoesNotExist:
+        payment_methods = self._map(models.PaymentMethod.objects.filter(id=id))
+        if not payment_methods:
             raise ValueError(f"PaymentMethod for  {id} does not exist")
+        return payment_methods[0]
 
     def list(self) -> List[domain_models.PaymentMethod]:
-        return [
-            django_payment_method.to_domain()
-            for django_payment_method in models.PaymentMethod.objects.all()
-        ]
+        return self._map(models.PaymentMethod.objects.all())
+
+    def iter_list(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[domain_models.PaymentMethod]:
+        queryset = models.PaymentMethod.objects.all()
+        rows = iter_keyset(queryset, "id", chunk_size, mappers.PAYMENT_METHOD_COLUMNS)
+        yield from mappers.map_payment_methods(rows)
 
     def update(self, payment_method: domain_models.PaymentMethod):
         models.PaymentMethod.update_from_domain(payment_method)
+
+    def add_many(self, payment_methods: List[domain_models.PaymentMethod]):
+        models.PaymentMethod.bulk_upsert(payment_methods)
+
+
+class DjangoCurrentSubscriptionRepository(
+    AbstractRepository[domain_models.UserSubscription]
+):
+    # NOTE: 쓰기 전용이다. 조회는 도메인 객체가 아닌 dict 이므로 유닛 오브 워크가 추적하지 않는
+    # DjangoCurrentSubscriptionReader 로 한다.
+    def add(self, subscription: domain_models.UserSubscription):
+        self.add_many([subscription])
+
+    def update(self, subscription: domain_models.UserSubscription):
+        self.add_many([subscription])
+
+    def add_many(self, subscriptions: List[domain_models.UserSubscription]):
+        models.CurrentSubscription.bulk_upsert(subscriptions)
+
+
+class DjangoCurrentSubscriptionReader:
+    FIELDS = ("user_id", "subscription_id", "plan_name", "status", "end_date", "price")
+
+    def get(self, user_id: int) -> Optional[dict]:
+        return (
+            models.CurrentSubscription.objects.filter(user_id=user_id)
+            .values(*self.FIELDS)
+            .first()
+        )
+
+
+class DjangoAccountVersionRepository:
+    def bump(self, user_ids: Iterable[int]):
+        models.AccountVersion.bump(list(user_ids))
+
+    def get(self, user_id: int) -> int:
+        version = (
+            models.AccountVersion.objects.filter(user_id=user_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+
+class DjangoOutboxRepository:
+    def add_many(self, events: List[Event]):
+        models.OutboxMessage.objects.bulk_create(
+            [models.OutboxMessage.from_event(event) for event in events]
+        )
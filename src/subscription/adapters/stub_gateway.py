@@ -0,0 +1,112 @@
+"""테스트와 부하 테스트에서 쓰는 로컬 결제 게이트웨이 스텁 서버.
+
+HttpPaymentGateway 가 호출하는 POST /charges 와 POST /charges/batch 를 구현한다. 지연, 거절 비율, 5xx 비율을 조절할 수
+있고, 같은 Idempotency-Key 로 다시 요청하면 처음 결과를 그대로 돌려준다.
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    # NOTE: keep-alive 를 지원하려면 HTTP/1.1 로 응답하고 Content-Length 를 보내야 한다.
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server: StubGatewayServer = self.server
+        body = json.loads(
+            self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}"
+        )
+        path = self.path.rstrip("/")
+        if path not in ("/charges", "/charges/batch"):
+            return self._respond(404, {"detail": "Not found"})
+        if server.latency:
+            time.sleep(server.latency)
+        if random.random() < server.error_rate:
+            return self._respond(503, {"detail": "Gateway unavailable"})
+
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+        if path == "/charges/batch":
+            results = [
+                self._charge_once(item.pop("idempotency_key", None), item)
+                for item in body.get("charges", [])
+            ]
+            return self._respond(200, {"results": results})
+        self._respond(200, self._charge_once(self.headers.get("Idempotency-Key"), body))
+
+    def _charge_once(self, key: str, payload: dict) -> dict:
+        server: StubGatewayServer = self.server
+        key = key or str(uuid.uuid4())
+        with server.lock:
+            result = server.charges.get(key)
+            if result is None:
+                result = server.charges[key] = self._charge(payload)
+        return result
+
+    def _charge(self, payload: dict) -> dict:
+        if random.random() < self.server.decline_rate:
+            return {
+                "id": str(uuid.uuid4()),
+                "status": "failed",
+                "failure_reason": "Card declined",
+            }
+        return {"id": str(uuid.uuid4()), "status": "succeeded", **payload}
+
+    def _respond(self, status: int, data: dict):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency: float = 0.0,
+        decline_rate: float = 0.0,
+        error_rate: float = 0.0,
+        verbose: bool = False,
+    ):
+        super().__init__(address, StubGatewayHandler)
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.charges = {}
+        self.requests = 0
+        # NOTE: 클라이언트 (host, port) 집합. 커넥션 재사용 여부를 확인하는 데 쓴다.
+        self.connections = set()
+
+    def handle_error(self, request, client_address):
+        # NOTE: 타임아웃으로 클라이언트가 먼저 끊은 경우는 정상 상황이다.
+        if self.verbose:
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubGatewayServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,359 @@
+"""기존 시스템의 사용자/구독/결제 내역 대량 적재.
+
+파일(CSV 또는 NDJSON)을 스트리밍으로 읽어 청크 단위로 검증하고, Postgres COPY 로 UNLOGGED
+스테이징 테이블에 넣은 뒤 한 트랜잭션에서 집합 연산으로 실제 테이블에 합친다.
+
+레코드는 type 필드로 구분한다.
+
+- user: username, email
+- subscription: external_id, username, plan_name, start_date, end_date, status
+- payment: external_id, subscription_id(구독의 external_id), amount, date, status
+
+구독/결제의 ID 는 external_id 로 만든 uuid5 이므로 같은 파일을 다시 적재해도 중복되지 않는다.
+스테이징과 체크포인트는 같은 트랜잭션에서 기록되므로 중단되면 마지막으로 커밋된 청크 다음부터
+이어서 적재한다.
+"""
+
+import csv
+import io
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..domain import domain_models
+from . import renewal_schedule
+from .catalog import plan_catalog
+from .models import (
+    AccountVersion,
+    CurrentSubscription,
+    Payment,
+    SubscriptionPlan,
+    UserSubscription,
+)
+
+NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "subscription-import")
+# NOTE: 동시에 두 적재가 스테이징 테이블을 같이 쓰지 않도록 잡는 advisory lock 키
+LOCK_KEY = 0x5355425F494D5054
+
+USER_TABLE = "subscription_import_user"
+SUBSCRIPTION_TABLE = "subscription_import_subscription"
+PAYMENT_TABLE = "subscription_import_payment"
+CHECKPOINT_TABLE = "subscription_import_checkpoint"
+
+# NOTE: 스테이징과 체크포인트를 모두 UNLOGGED 로 두어 DB 가 비정상 종료되면 함께 비워진다.
+# 체크포인트만 남아 적재하지 않은 청크를 건너뛰는 일이 없다.
+STAGING_DDL = [
+    f"""CREATE UNLOGGED TABLE IF NOT EXISTS {USER_TABLE} (
+        line bigint NOT NULL, username text NOT NULL, email text
+    )""",
+    f"""CREATE UNLOGGED TABLE IF NOT EXISTS {SUBSCRIPTION_TABLE} (
+        line bigint NOT NULL, id uuid NOT NULL, username text NOT NULL,
+        plan_name text NOT NULL, start_date date NOT NULL, end_date date NOT NULL,
+        status text NOT NULL, next_renewal_at timestamptz
+    )""",
+    f"""CREATE UNLOGGED TABLE IF NOT EXISTS {PAYMENT_TABLE} (
+        line bigint NOT NULL, id uuid NOT NULL, subscription_id uuid NOT NULL,
+        amount numeric(10, 2) NOT NULL, date timestamptz NOT NULL, status text NOT NULL
+    )""",
+    f"""CREATE UNLOGGED TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+        source text PRIMARY KEY, position bigint NOT NULL,
+        rejected bigint NOT NULL DEFAULT 0
+    )""",
+]
+
+SUBSCRIPTION_STATUSES = {status.value for status in domain_models.SubscriptionStatus}
+# NOTE: 저장 값은 PaymentStatus 값이어야 도메인으로 읽을 수 있다 ("Succeeded" 는 대문자로 시작한다).
+# 기존 시스템의 값은 대소문자를 가리지 않고 받아 PaymentStatus 값으로 바꾼다.
+PAYMENT_STATUSES = {
+    status.value.lower(): status.value for status in domain_models.PaymentStatus
+}
+MAX_AMOUNT = Decimal("99999999.99")
+
+
+class SubscriptionImportError(Exception):
+    pass
+
+
+@dataclass
+class Chunk:
+    users: List[tuple] = field(default_factory=list)
+    subscriptions: List[tuple] = field(default_factory=list)
+    payments: List[tuple] = field(default_factory=list)
+    rejects: List[dict] = field(default_factory=list)
+
+    def __len__(self):
+        return (
+            len(self.users)
+            + len(self.subscriptions)
+            + len(self.payments)
+            + len(self.rejects)
+        )
+
+
+def subscription_id(external_id: str) -> uuid.UUID:
+    return uuid.uuid5(NAMESPACE, f"subscription:{external_id}")
+
+
+def payment_id(external_id: str) -> uuid.UUID:
+    return uuid.uuid5(NAMESPACE, f"payment:{external_id}")
+
+
+def read_records(stream, format: str) -> Iterator[dict]:
+    """파일에서 레코드를 하나씩 읽는다. 빈 줄은 건너뛴다."""
+    if format == "csv":
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value != ""}
+    elif format == "ndjson":
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield {"__invalid__": f"Invalid JSON: {e}"}
+    else:
+        raise SubscriptionImportError(f"Unknown format {format!r}")
+
+
+def validate(records: List[Tuple[int, dict]]) -> Chunk:
+    """(줄 번호, 레코드) 목록을 검증해 스테이징 테이블 행으로 바꾼다. 잘못된 레코드는 rejects 로 모은다."""
+    chunk = Chunk()
+    # NOTE: 잘못된 플랜 이름마다 카탈로그를 다시 읽지 않도록 청크마다 한 번만 가져온다.
+    plans = {plan.name.value: plan for plan in plan_catalog.list()}
+    for line, record in records:
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Record is not an object")
+            if "__invalid__" in record:
+                raise ValueError(record["__invalid__"])
+            kind = record.get("type")
+            if kind == "user":
+                chunk.users.append(_user_row(line, record))
+            elif kind == "subscription":
+                chunk.subscriptions.append(_subscription_row(line, record, plans))
+            elif kind == "payment":
+                chunk.payments.append(_payment_row(line, record))
+            else:
+                raise ValueError(f"Unknown record type {kind!r}")
+        except (ValueError, TypeError, KeyError) as e:
+            chunk.rejects.append({"line": line, "error": str(e), "record": record})
+    return chunk
+
+
+def _required(record: dict, name: str) -> str:
+    value = record.get(name)
+    if value is None or str(value).strip() == "":
+        raise ValueError(f"{name} is required")
+    return str(value).strip()
+
+
+def _username(record: dict) -> str:
+    username = _required(record, "username")
+    if len(username) > User._meta.get_field("username").max_length:
+        raise ValueError("username is too long")
+    return username
+
+
+def _user_row(line: int, record: dict) -> tuple:
+    return (line, _username(record), str(record.get("email") or "").strip() or None)
+
+
+def _subscription_row(
+    line: int, record: dict, plans: Dict[str, domain_models.SubscriptionPlan]
+) -> tuple:
+    id = subscription_id(_required(record, "external_id"))
+    plan_name = _required(record, "plan_name")
+    plan = plans.get(plan_name)
+    if plan is None:
+        raise ValueError(f"Unknown plan {plan_name!r}")
+    start_date = date.fromisoformat(_required(record, "start_date"))
+    end_date = date.fromisoformat(_required(record, "end_date"))
+    if end_date < start_date:
+        raise ValueError("end_date is before start_date")
+    status = _required(record, "status")
+    if status not in SUBSCRIPTION_STATUSES:
+        raise ValueError(f"Unknown subscription status {status!r}")
+    next_renewal_at = (
+        renewal_schedule.due_at(end_date, plan.name, id) if status == "active" else None
+    )
+    return (
+        line,
+        id,
+        _username(record),
+        plan.name.value,
+        start_date,
+        end_date,
+        status,
+        next_renewal_at,
+    )
+
+
+def _payment_row(line: int, record: dict) -> tuple:
+    id = payment_id(_required(record, "external_id"))
+    try:
+        amount = Decimal(_required(record, "amount")).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError("amount is not a number")
+    if not Decimal(0) <= amount <= MAX_AMOUNT:
+        raise ValueError("amount is out of range")
+    paid_at = datetime.fromisoformat(_required(record, "date"))
+    if timezone.is_naive(paid_at):
+        paid_at = timezone.make_aware(paid_at)
+    status = _required(record, "status")
+    if status.lower() not in PAYMENT_STATUSES:
+        raise ValueError(f"Unknown payment status {status!r}")
+    return (
+        line,
+        id,
+        subscription_id(_required(record, "subscription_id")),
+        amount,
+        paid_at,
+        PAYMENT_STATUSES[status.lower()],
+    )
+
+
+def prepare():
+    with connection.cursor() as cursor:
+        for ddl in STAGING_DDL:
+            cursor.execute(ddl)
+
+
+def lock() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [LOCK_KEY])
+        return cursor.fetchone()[0]
+
+
+def unlock():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", [LOCK_KEY])
+
+
+def checkpoint() -> Optional[Tuple[str, int, int]]:
+    """(source, 적재한 레코드 수, 거절한 레코드 수). 진행 중인 적재가 없으면 None."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [CHECKPOINT_TABLE])
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute(f"SELECT source, position, rejected FROM {CHECKPOINT_TABLE}")
+        return cursor.fetchone()
+
+
+def stage(source: str, position: int, chunk: Chunk):
+    """청크를 COPY 로 스테이징 테이블에 넣고 같은 트랜잭션에서 체크포인트를 position 으로 옮긴다."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        _copy(cursor, USER_TABLE, chunk.users)
+        _copy(cursor, SUBSCRIPTION_TABLE, chunk.subscriptions)
+        _copy(cursor, PAYMENT_TABLE, chunk.payments)
+        cursor.execute(
+            f"INSERT INTO {CHECKPOINT_TABLE} (source, position, rejected) "
+            "VALUES (%s, %s, %s) ON CONFLICT (source) DO UPDATE SET "
+            f"position = EXCLUDED.position, "
+            f"rejected = {CHECKPOINT_TABLE}.rejected + EXCLUDED.rejected",
+            [source, position, len(chunk.rejects)],
+        )
+
+
+def _copy(cursor, table: str, rows: List[tuple]):
+    if not rows:
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+    # NOTE: CSV 형식에서 따옴표 없는 빈 값은 NULL 이다. (csv.writer 는 None 을 빈 값으로 쓴다)
+    cursor.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def merge() -> Dict[str, int]:
+    """스테이징 테이블을 실제 테이블에 합친다. 이미 있는 행은 건너뛰므로 다시 실행해도 된다."""
+    user_table = User._meta.db_table
+    subscription_table = UserSubscription._meta.db_table
+    payment_table = Payment._meta.db_table
+    plan_table = SubscriptionPlan._meta.db_table
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {user_table} (
+                username, email, password, first_name, last_name,
+                is_superuser, is_staff, is_active, date_joined
+            )
+            SELECT DISTINCT ON (username)
+                username, coalesce(email, ''), %s, '', '', false, false, true, now()
+            FROM {USER_TABLE}
+            ORDER BY username, line DESC
+            ON CONFLICT (username) DO NOTHING
+            """,
+            # NOTE: 기존 시스템의 비밀번호는 옮기지 않는다. 사용자는 비밀번호를 다시 설정해야 한다.
+            [UNUSABLE_PASSWORD_PREFIX],
+        )
+        counts["users"] = cursor.rowcount
+
+        # NOTE: 충돌 대상을 지정하지 않아 같은 ID 뿐 아니라 사용자당 활성 구독 하나 제약에 걸리는
+        # 행도 건너뛴다.
+        cursor.execute(
+            f"""
+            INSERT INTO {subscription_table} (
+                id, user_id, plan_id, start_date, end_date, status, next_renewal_at,
+                renewal_attempts
+            )
+            SELECT DISTINCT ON (s.id)
+                s.id, u.id, p.id, s.start_date, s.end_date, s.status, s.next_renewal_at,
+                0
+            FROM {SUBSCRIPTION_TABLE} s
+            JOIN {user_table} u ON u.username = s.username
+            JOIN {plan_table} p ON p.name = s.plan_name
+            ORDER BY s.id, s.line DESC
+            ON CONFLICT DO NOTHING
+            """
+        )
+        counts["subscriptions"] = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            INSERT INTO {payment_table} (
+                id, subscription_id, payment_method_id, amount, date, status
+            )
+            SELECT DISTINCT ON (p.id)
+                p.id, p.subscription_id, NULL, p.amount, p.date, p.status
+            FROM {PAYMENT_TABLE} p
+            JOIN {subscription_table} s ON s.id = p.subscription_id
+            ORDER BY p.id, p.line DESC
+            ON CONFLICT (id) DO NOTHING
+            """
+        )
+        counts["payments"] = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            SELECT
+                (SELECT count(DISTINCT s.id) FROM {SUBSCRIPTION_TABLE} s
+                 WHERE NOT EXISTS (SELECT 1 FROM {subscription_table} t WHERE t.id = s.id)),
+                (SELECT count(DISTINCT p.id) FROM {PAYMENT_TABLE} p
+                 WHERE NOT EXISTS (SELECT 1 FROM {payment_table} t WHERE t.id = p.id))
+            """
+        )
+        counts["skipped_subscriptions"], counts["skipped_payments"] = cursor.fetchone()
+
+        imported_users = (
+            f"SELECT u.id FROM {user_table} u "
+            f"JOIN {SUBSCRIPTION_TABLE} s ON s.username = u.username"
+        )
+        counts["current_subscriptions"] = CurrentSubscription.rebuild(imported_users)
+        AccountVersion.bump_all(imported_users)
+    return counts
+
+
+def clear():
+    """스테이징 테이블과 체크포인트를 지운다."""
+    with connection.cursor() as cursor:
+        for table in (USER_TABLE, SUBSCRIPTION_TABLE, PAYMENT_TABLE, CHECKPOINT_TABLE):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
 from subscription.adapters.models import (
+    CurrentSubscription,
+    OutboxMessage,
     Payment,
     PaymentMethod,
     SubscriptionPlan,
@@ -24,6 +26,7 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
 @admin.register(UserSubscription)
 class UserSubscriptionAdmin(admin.ModelAdmin):
     list_display = ("user", "plan", "start_date", "end_date", "status")
+    list_select_related = ("user", "plan")
     list_filter = ("status", "plan")
     search_fields = ("user__username", "plan__name")
 
@@ -37,5 +40,23 @@ class PaymentMethodAdmin(admin.ModelAdmin):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ("subscription", "payment_method", "amount", "date", "status")
+    # NOTE: Payment.__str__ 과 UserSubscription.__str__ 이 사용자와 플랜을 따라가므로 목록 쿼리에서
+    # 함께 가져온다. 그렇지 않으면 행마다 쿼리가 나간다.
+    list_select_related = ("subscription__user", "subscription__plan", "payment_method")
     list_filter = ("status", "payment_method")
     search_fields = ("subscription__user__username", "payment_method__method_type")
+
+
+@admin.register(CurrentSubscription)
+class CurrentSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("user", "plan_name", "status", "end_date", "price", "updated_at")
+    list_select_related = ("user",)
+    list_filter = ("status", "plan_name")
+    search_fields = ("user__username",)
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("id", "event_type", "created_at", "delivered_at", "attempts")
+    list_filter = ("event_type",)
+    readonly_fields = ("event_type", "payload", "created_at")
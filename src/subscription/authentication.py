@@ -0,0 +1,196 @@
+"""요청의 사용자(principal)를 DB 조회 없이 결정한다.
+
+- principal_cache: 한 번 조회한 User 의 불변 사본을 TTL 동안 프로세스 메모리에 두는 크기 제한 캐시.
+  요청마다 사본에서 새 User 를 만들므로 요청끼리 같은 인스턴스를 나눠 쓰지 않는다.
+- 서명 토큰: `Authorization: Bearer <token>`. HMAC 서명과 만료만 확인하므로 DB 를 조회하지 않는다.
+- CachedAuthenticationMiddleware (subscription.middleware): 세션의 사용자를 principal_cache 에서 찾는다.
+
+User 가 바뀌거나 지워지면 이 프로세스의 캐시는 바로 비운다. 다른 프로세스에는 알리지 않으므로
+비활성화 같은 변경이 최대 AUTH_PRINCIPAL_CACHE_TTL 동안 반영되지 않는다. TTL 을 짧게 유지한다.
+토큰은 만료(AUTH_TOKEN_MAX_AGE)까지 유효하므로 짧게 유지한다.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import signing
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from rest_framework import authentication, exceptions
+
+TOKEN_SALT = "subscription.authentication.token"
+
+
+class PrincipalCache:
+    """최대 maxsize 개를 ttl 초 동안 보관하는 LRU 캐시. 여러 스레드에서 함께 쓴다."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Optional[object]]):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        # NOTE: 조회는 잠금 밖에서 한다. 같은 키를 동시에 조회하면 둘 다 DB 를 읽을 수 있다.
+        value = loader()
+        if value is None:
+            return None
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE, ttl=settings.AUTH_PRINCIPAL_CACHE_TTL
+)
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """캐시에 두는 User 의 불변 사본. to_user() 로 요청마다 새 User 를 만든다."""
+
+    db: str
+    values: Tuple[Tuple[str, Any], ...]
+
+    @classmethod
+    def of(cls, user: User) -> "UserSnapshot":
+        # NOTE: 모든 필드를 담아 둔다. 세션 해시(password)를 확인하고, admin 처럼 request.user 를
+        # 저장하는 코드가 비어 있는 필드로 덮어쓰지 않게 한다.
+        return cls(
+            user._state.db,
+            tuple(
+                (field.attname, getattr(user, field.attname))
+                for field in User._meta.concrete_fields
+            ),
+        )
+
+    def to_user(self) -> User:
+        names, values = zip(*self.values)
+        return User.from_db(self.db, names, values)
+
+
+def _load_snapshot(**lookup) -> Optional[UserSnapshot]:
+    user = User.objects.filter(**lookup).first()
+    return UserSnapshot.of(user) if user else None
+
+
+def get_user(user_id: int) -> Optional[User]:
+    snapshot = principal_cache.get_or_load(
+        ("id", user_id), lambda: _load_snapshot(pk=user_id)
+    )
+    return snapshot.to_user() if snapshot else None
+
+
+def get_user_by_username(username: str) -> Optional[User]:
+    snapshot = principal_cache.get_or_load(
+        ("username", username), lambda: _load_snapshot(username=username)
+    )
+    return snapshot.to_user() if snapshot else None
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance: User, **kwargs):
+    principal_cache.invalidate(("id", instance.pk), ("username", instance.username))
+
+
+def get_session_user(request):
+    """django.contrib.auth.get_user 와 같지만 User 를 principal_cache 에서 찾는다."""
+    try:
+        user_id = User._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    user = get_user(user_id)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    # 비밀번호가 바뀌면 기존 세션은 무효가 된다.
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class TokenPrincipal:
+    """서명 토큰에 담긴 정보로 만든 사용자. DRF 권한 검사와 request.user.id 에 필요한 속성만 있다."""
+
+    is_active = True
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, id: int, username: str, is_staff: bool):
+        self.id = self.pk = id
+        self.username = username
+        self.is_staff = is_staff
+
+    def __str__(self):
+        return self.username
+
+
+def issue_token(user: User) -> str:
+    return signing.dumps(
+        {"uid": user.pk, "username": user.get_username(), "staff": user.is_staff},
+        salt=TOKEN_SALT,
+        compress=True,
+    )
+
+
+def verify_token(token: str) -> TokenPrincipal:
+    """서명과 만료를 확인한다. 잘못된 토큰이면 signing.BadSignature 를 던진다."""
+    claims = signing.loads(token, salt=TOKEN_SALT, max_age=settings.AUTH_TOKEN_MAX_AGE)
+    return TokenPrincipal(claims["uid"], claims["username"], claims["staff"])
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            token = header[1].decode()
+            return verify_token(token), token
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("Token has expired.")
+        except (signing.BadSignature, UnicodeError):
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+    def authenticate_header(self, request):
+        return self.keyword
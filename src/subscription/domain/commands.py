@@ -1,3 +1,7 @@
+import uuid
+from typing import List
+
+
 class Command:
     pass
 
@@ -9,6 +13,12 @@ class CreateSubscription(Command):
         self.payment_details = payment_details
 
 
+class CreateSubscriptions(Command):
+    # NOTE: 여러 사용자를 한 트랜잭션에서 구독시킨다. 항목별로 성공/실패를 돌려준다.
+    def __init__(self, subscriptions: List[CreateSubscription]):
+        self.subscriptions = subscriptions
+
+
 class CancelSubscription(Command):
     def __init__(self, user_id: int):
         self.user_id = user_id
@@ -19,7 +29,15 @@ class RenewSubscription(Command):
         self.user_id = user_id
 
 
+class RenewSubscriptions(Command):
+    # NOTE: 여러 구독을 한 번에 갱신한다. 결제는 게이트웨이에 배치로 요청한다.
+    def __init__(self, subscription_ids: List[uuid.UUID]):
+        self.subscription_ids = subscription_ids
+
+
 class ChangeSubscriptionPlan(Command):
-    def __init__(self, user_id: int, new_plan_name: str):
+    # NOTE: attempt_key 는 요청의 Idempotency-Key 다. 같은 요청의 재시도만 같은 결제 키를 쓴다.
+    def __init__(self, user_id: int, new_plan_name: str, attempt_key: str = None):
         self.user_id = user_id
         self.new_plan_name = new_plan_name
+        self.attempt_key = attempt_key
@@ -1,10 +1,18 @@
 import json
 import uuid
+from contextvars import ContextVar
 from dataclasses import asdict, dataclass, field
 from datetime import date, datetime, timedelta
 from enum import Enum
+from typing import Dict, List, Optional
 
-from subscription.domain.events import PaymentFailed
+from subscription.domain.events import Event, PaymentFailed
+
+# NOTE: 이벤트를 발생시킨 엔티티를 모으는 레지스트리. 유닛 오브 워크가 블록에 들어갈 때 설정하므로
+# 이벤트 수집이 건드린 엔티티 수가 아니라 이벤트 수에 비례한다.
+event_registry: ContextVar[Optional[Dict[int, "Entity"]]] = ContextVar(
+    "event_registry", default=None
+)
 
 
 class PlanName(str, Enum):
@@ -41,7 +49,45 @@ class PaymentStatus(str, Enum):
     REFUNDED = "refunded"
 
 
-class SubscriptionPlan:
+class Entity:
+    __slots__ = ("_events",)
+
+    @property
+    def events(self) -> List[Event]:
+        # NOTE: 이벤트를 발생시키는 엔티티는 드물기 때문에 처음 접근할 때 리스트를 만든다.
+        try:
+            return self._events
+        except AttributeError:
+            self._events = []
+            return self._events
+
+    def record_event(self, event: Event):
+        self.events.append(event)
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        registry = event_registry.get()
+        if registry is not None:
+            registry[id(self)] = self
+
+    def pop_events(self) -> List[Event]:
+        events = getattr(self, "_events", None)
+        if not events:
+            return []
+        self._events = []
+        return events
+
+
+class SubscriptionPlan(Entity):
+    __slots__ = (
+        "name",
+        "price",
+        "payment_cycle",
+        "description",
+        "duration_days",
+        "id",
+    )
+
     def __init__(
         self,
         name: PlanName,
@@ -57,7 +103,6 @@ class SubscriptionPlan:
         self.description = description
         self.duration_days = duration_days
         self.id = id or uuid.uuid4()
-        self.events = []
 
     def __eq__(self, other):
         return self.name == other.name
@@ -78,7 +123,17 @@ class SubscriptionPlan:
         )
 
 
-class UserSubscription:
+class UserSubscription(Entity):
+    __slots__ = (
+        "user_id",
+        "plan",
+        "start_date",
+        "end_date",
+        "status",
+        "id",
+        "renewal_attempts",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -87,6 +142,7 @@ class UserSubscription:
         end_date: date,
         status: SubscriptionStatus,
         id: uuid.UUID = None,
+        renewal_attempts: int = 0,
     ):
         self.user_id = user_id
         self.plan = plan
@@ -94,7 +150,8 @@ class UserSubscription:
         self.end_date = end_date
         self.status = status
         self.id = id or uuid.uuid4()
-        self.events = []
+        # NOTE: 이번 기간의 갱신 결제가 거절된 횟수
+        self.renewal_attempts = renewal_attempts
 
     def __eq__(self, other):
         return self.id == other.id
@@ -102,19 +159,40 @@ class UserSubscription:
     def __hash__(self):
         return hash(self.id)
 
-    def renew(self) -> None:
+    def ensure_renewable(self) -> None:
         if self.status == SubscriptionStatus.ACTIVE and self.end_date > date.today():
             raise ValueError("Subscription is already active and cannot be renewed.")
+
+    def renew(self) -> None:
+        self.ensure_renewable()
         self.end_date = date.today() + timedelta(days=self.plan.duration_days)
         self.status = SubscriptionStatus.ACTIVE
 
+    @property
+    def renewal_key(self) -> str:
+        """갱신 결제의 idempotency key.
+
+        같은 시도를 다시 보내면(전송 실패, 청크 재실행) 같은 키라 한 번만 결제되고, 거절된 뒤의 다음
+        시도는 새 결제이므로 키가 바뀐다.
+        """
+        if not self.renewal_attempts:
+            return f"renewal:{self.id}"
+        return f"renewal:{self.id}:{self.renewal_attempts}"
+
+    def decline_renewal(self, max_attempts: int) -> None:
+        """갱신 결제가 거절됐다. max_attempts 번째 거절이면 구독을 만료시킨다."""
+        self.renewal_attempts += 1
+        if self.renewal_attempts >= max_attempts:
+            self.status = SubscriptionStatus.EXPIRED
+
+
+class PaymentMethod(Entity):
+    __slots__ = ("method_type", "details", "id")
 
-class PaymentMethod:
     def __init__(self, method_type: PaymentMethodType, details: dict, id=None):
         self.method_type = method_type
         self.details = details
         self.id = id or uuid.uuid4()
-        self.events = []
 
     def __eq__(self, other):
         return self.id == other.id
@@ -123,7 +201,9 @@ class PaymentMethod:
         return hash(self.id)
 
 
-class Payment:
+class Payment(Entity):
+    __slots__ = ("subscription", "payment_method", "amount", "date", "status", "id")
+
     def __init__(
         self,
         subscription: UserSubscription,
@@ -139,7 +219,6 @@ class Payment:
         self.date = date
         self.status = status
         self.id = id or uuid.uuid4()
-        self.events = []
 
     def __eq__(self, other):
         return self.id == other.id
@@ -155,7 +234,7 @@ class Payment:
             amount=self.amount,
             failure_reason=failure_reason,
         )
-        self.events.append(failed_event)
+        self.record_event(failed_event)
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from subscription.adapters import finance_export
+from subscription.service_layer import queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams payments joined to their subscription, user, plan and payment method "
+        "as CSV or NDJSON, reading them through a server-side cursor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="YYYY-MM-DD (inclusive)")
+        parser.add_argument(
+            "--end", help="YYYY-MM-DD (exclusive, default: the day after --start)"
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            default=[],
+            help="Payment status to include; repeat or comma-separate (default: all)",
+        )
+        parser.add_argument(
+            "--format", choices=sorted(finance_export.CONTENT_TYPES), default="csv"
+        )
+        parser.add_argument("--output", help="File to write to (default: stdout)")
+
+    def handle(self, start, end, status, format, output, **kwargs):
+        try:
+            start, end = finance_export.period(start, end)
+            statuses = finance_export.statuses(status)
+        except ValueError as e:
+            raise CommandError(e)
+
+        rows = queries.payment_export(start, end, statuses)
+        lines = finance_export.lines(rows, format)
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        count = 0
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        if format == "csv":
+            count -= 1
+        # NOTE: 데이터는 파일로 가므로 요약은 stderr 에 쓴다.
+        self.stderr.write(f"Exported {count} payments to {output}")
@@ -0,0 +1,118 @@
+import itertools
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from subscription.adapters import subscription_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports users, subscriptions and payments from a CSV or NDJSON file "
+        "through COPY into staging tables, then merges them. Resumes an interrupted import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"])
+        parser.add_argument("--chunk-size", type=int, default=50000)
+        parser.add_argument(
+            "--rejects",
+            help="File to append rejected records to (default: <path>.rejects.ndjson)",
+        )
+        parser.add_argument(
+            "--stage-only",
+            action="store_true",
+            help="Stage the file without merging; run again to merge",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Drop the staged records and checkpoint and start over",
+        )
+
+    def handle(self, path, format, chunk_size, rejects, stage_only, restart, **kwargs):
+        source = os.path.abspath(path)
+        format = format or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+        rejects = rejects or f"{path}.rejects.ndjson"
+
+        if not subscription_import.lock():
+            raise CommandError("Another import is running")
+        try:
+            if restart:
+                subscription_import.clear()
+            subscription_import.prepare()
+            position = self._resume_position(source)
+            position = self._stage(source, format, chunk_size, rejects, position)
+            if stage_only:
+                self.stdout.write(
+                    f"Staged {position} records; run again without --stage-only to merge"
+                )
+                return
+
+            started = time.monotonic()
+            counts = subscription_import.merge()
+            subscription_import.clear()
+        finally:
+            subscription_import.unlock()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {counts['users']} users, {counts['subscriptions']} "
+                f"subscriptions and {counts['payments']} payments "
+                f"in {time.monotonic() - started:.1f}s "
+                f"(skipped {counts['skipped_subscriptions']} subscriptions and "
+                f"{counts['skipped_payments']} payments without a matching "
+                f"user/plan/subscription or already active subscription)"
+            )
+        )
+
+    def _resume_position(self, source: str) -> int:
+        checkpoint = subscription_import.checkpoint()
+        if checkpoint is None:
+            return 0
+        staged_source, position, rejected = checkpoint
+        if staged_source != source:
+            raise CommandError(
+                f"{staged_source} is partially staged; "
+                "finish it or run with --restart to discard it"
+            )
+        # NOTE: 마지막으로 커밋된 청크 다음 레코드부터 이어서 적재한다.
+        self.stdout.write(
+            f"Resuming after record {position} ({rejected} rejected so far)"
+        )
+        return position
+
+    def _stage(self, source, format, chunk_size, rejects_path, position) -> int:
+        started = time.monotonic()
+        staged = 0
+        with open(source, newline="", encoding="utf-8") as stream, open(
+            rejects_path, "a", encoding="utf-8"
+        ) as rejects:
+            records = enumerate(
+                subscription_import.read_records(stream, format), start=1
+            )
+            records = itertools.islice(records, position, None)
+            while True:
+                batch = list(itertools.islice(records, chunk_size))
+                if not batch:
+                    break
+                chunk = subscription_import.validate(batch)
+                position = batch[-1][0]
+                # NOTE: 체크포인트보다 먼저 기록한다. 중단되면 거절 기록이 중복될 수는 있어도
+                # 빠지지는 않는다.
+                for reject in chunk.rejects:
+                    rejects.write(json.dumps(reject, default=str) + "\n")
+                rejects.flush()
+                subscription_import.stage(source, position, chunk)
+                staged += len(chunk) - len(chunk.rejects)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"record {position}: staged {staged}, "
+                    f"rejected {len(chunk.rejects)} in this chunk "
+                    f"({staged / max(elapsed, 1e-6):,.0f} records/s)"
+                )
+        return position
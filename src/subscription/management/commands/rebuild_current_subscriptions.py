@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from subscription.adapters.models import CurrentSubscription
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the current subscription read model from user subscriptions"
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {CurrentSubscription._meta.db_table}")
+            count = CurrentSubscription.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully rebuilt {count} current subscriptions")
+        )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from subscription.adapters import renewal_schedule
+from subscription.adapters.models import UserSubscription
+from subscription.adapters.repository import DEFAULT_CHUNK_SIZE, iter_keyset
+from subscription.domain.domain_models import SubscriptionStatus
+
+
+class Command(BaseCommand):
+    help = "Recomputes next_renewal_at of active subscriptions with the current jitter settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, chunk_size, **kwargs):
+        queryset = UserSubscription.objects.filter(
+            status=SubscriptionStatus.ACTIVE.value
+        )
+        columns = ("id", "end_date", "plan__name", "renewal_attempts")
+        rows = iter_keyset(queryset, "id", chunk_size, columns)
+        count = 0
+        batch = []
+        for id, end_date, plan_name, renewal_attempts in rows:
+            batch.append(
+                UserSubscription(
+                    id=id,
+                    next_renewal_at=renewal_schedule.due_at(
+                        end_date, plan_name, id, renewal_attempts
+                    ),
+                )
+            )
+            if len(batch) == chunk_size:
+                count += self._save(batch)
+                batch = []
+        count += self._save(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully rescheduled {count} subscriptions")
+        )
+
+    @staticmethod
+    def _save(batch):
+        with transaction.atomic():
+            UserSubscription.objects.bulk_update(batch, ["next_renewal_at"])
+        return len(batch)
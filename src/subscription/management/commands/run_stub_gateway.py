@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from subscription.adapters.stub_gateway import StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = "Runs a local payment gateway stub for PAYMENT_GATEWAY_URL (tests and load runs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8099)
+        parser.add_argument("--latency-ms", type=float, default=0)
+        parser.add_argument("--decline-rate", type=float, default=0.0)
+        parser.add_argument("--error-rate", type=float, default=0.0)
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(
+        self, *args, host, port, latency_ms, decline_rate, error_rate, verbose, **kwargs
+    ):
+        server = StubGatewayServer(
+            (host, port),
+            latency=latency_ms / 1000,
+            decline_rate=decline_rate,
+            error_rate=error_rate,
+            verbose=verbose,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Stub payment gateway listening on {server.url}")
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -1,11 +1,26 @@
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
 
+from subscription import authentication
 
-class ForceLoginMiddleware(MiddlewareMixin):
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    # NOTE: 세션의 사용자를 요청마다 DB 에서 읽지 않고 principal_cache 에서 찾는다.
     def process_request(self, request):
-        from django.contrib.auth.models import User
+        super().process_request(request)
+        request.user = SimpleLazyObject(
+            lambda: authentication.get_session_user(request)
+        )
+
 
-        user = User.objects.get(
-            username="admin"
-        )  # 여기서 'your_username'을 강제 로그인할 사용자의 이름으로 대체합니다.
-        request.user = user
+class ForceLoginMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        # NOTE: FORCE_LOGIN_USERNAME 사용자로 강제 로그인한다. 조회는 캐시가 만료될 때만 하고,
+        # 토큰으로 인증하는 요청처럼 request.user 를 쓰지 않으면 조회하지 않는다.
+        request.user = SimpleLazyObject(
+            lambda: authentication.get_user_by_username(settings.FORCE_LOGIN_USERNAME)
+            or AnonymousUser()
+        )
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def expire_duplicate_active_subscriptions(apps, schema_editor):
+    # NOTE: 유니크 제약을 걸기 전에 사용자별로 가장 최근 활성 구독만 남기고 만료 처리한다.
+    UserSubscription = apps.get_model("subscription", "UserSubscription")
+    duplicated_users = (
+        UserSubscription.objects.filter(status="active")
+        .values("user_id")
+        .annotate(active_count=Count("id"))
+        .filter(active_count__gt=1)
+        .values_list("user_id", flat=True)
+    )
+    for user_id in duplicated_users:
+        active = UserSubscription.objects.filter(
+            user_id=user_id, status="active"
+        ).order_by("-start_date", "-end_date")
+        UserSubscription.objects.filter(
+            id__in=list(active.values_list("id", flat=True)[1:])
+        ).update(status="expired")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("subscription", "0002_alter_usersubscription_status"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["date", "id"], name="payment_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="usersubscription",
+            index=models.Index(
+                fields=["user", "status", "-start_date"],
+                name="usersub_user_status_start_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersubscription",
+            index=models.Index(
+                condition=models.Q(("status", "active")),
+                fields=["end_date", "id"],
+                name="usersub_active_end_date_idx",
+            ),
+        ),
+        migrations.RunPython(
+            expire_duplicate_active_subscriptions, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="usersubscription",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "active")),
+                fields=("user",),
+                name="unique_active_subscription_per_user",
+            ),
+        ),
+    ]
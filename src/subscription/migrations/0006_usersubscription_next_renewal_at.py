@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_next_renewal_at(apps, schema_editor):
+    # NOTE: 기존 활성 구독은 jitter 없이 end_date 다음 날 0시로 채운다.
+    # jitter 를 적용하려면 reschedule_renewals 커맨드를 실행한다.
+    UserSubscription = apps.get_model("subscription", "UserSubscription")
+    schema_editor.execute(
+        f"UPDATE {UserSubscription._meta.db_table} "
+        "SET next_renewal_at = ((end_date + 1)::timestamp AT TIME ZONE %s) "
+        "WHERE status = 'active'",
+        [settings.TIME_ZONE],
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("subscription", "0005_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usersubscription",
+            name="next_renewal_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_next_renewal_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="usersubscription",
+            index=models.Index(
+                condition=models.Q(("status", "active")),
+                fields=["next_renewal_at", "id"],
+                name="usersub_active_renewal_idx",
+            ),
+        ),
+    ]
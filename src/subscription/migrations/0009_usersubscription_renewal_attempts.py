@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("subscription", "0008_accountversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usersubscription",
+            name="renewal_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -3,7 +3,7 @@ from datetime import datetime
 
 from rest_framework import serializers
 
-from subscription.domain.domain_models import Card, PlanName
+from subscription.domain.domain_models import PlanName
 
 
 class PaymentDetailsSerializer(serializers.Serializer):
@@ -50,25 +50,6 @@ class PaymentDetailsSerializer(serializers.Serializer):
         return value
 
 
-class CardSerializer(serializers.Serializer):
-    card_number = serializers.CharField()
-    card_expiry = serializers.DateField(
-        format="%Y-%m-%dT%H:%M:%S.%fZ", input_formats=["%m/%y", "%Y-%m-%dT%H:%M:%S.%fZ"]
-    )
-    card_cvc = serializers.CharField()
-
-    def create(self, validated_data):
-        return Card(**validated_data)
-
-    def update(self, instance, validated_data):
-        for field, value in validated_data.items():
-            setattr(instance, field, value)
-        return instance
-
-    def validate(self, data):
-        return data
-
-
 class SubscriptionRequestSerializer(serializers.Serializer):
     plan_name = serializers.CharField(required=True)
     payment_details = PaymentDetailsSerializer(required=True)
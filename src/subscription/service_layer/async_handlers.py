@@ -0,0 +1,172 @@
+import json
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+
+from subscription.domain import commands, events
+from subscription.domain.domain_models import (
+    Payment,
+    PaymentMethod,
+    PaymentMethodType,
+    PaymentStatus,
+    SubscriptionStatus,
+    UserSubscription,
+)
+from subscription.service_layer import handlers, unit_of_work
+from subscription.service_layer.services import SubscriptionService
+
+# NOTE: handlers.py 의 핸들러와 같은 동작을 AsyncDjangoUnitOfWork 로 한다.
+
+
+async def send_payment_failed_notification(
+    event: events.PaymentFailed,
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    await sync_to_async(
+        handlers.send_payment_failed_notification, thread_sensitive=False
+    )(event, uow)
+
+
+async def subscribe_user_to_plan(
+    command: commands.CreateSubscription,
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    async with uow:
+        plan = await uow.subscription_plans.aget(command.plan_name)
+
+        if await uow.user_subscriptions.aget_active_subscription_by_user_id(
+            command.user_id
+        ):
+            raise ValueError(
+                f"User {command.user_id} already has an active subscription"
+            )
+
+        user_subscription = plan.create_user_subscription(
+            command.user_id, date.today(), plan.duration_days
+        )
+        uow.user_subscriptions.add(user_subscription)
+        uow.current_subscriptions.add(user_subscription)
+
+        payment_method = PaymentMethod(
+            method_type=PaymentMethodType(command.payment_details["method_type"]),
+            details=json.dumps(
+                handlers.payment_method_details(command.payment_details)
+            ),
+        )
+        uow.payment_methods.add(payment_method)
+
+        payment = Payment(
+            subscription=user_subscription,
+            payment_method=payment_method,
+            amount=plan.price,
+            date=date.today(),
+            status=PaymentStatus.SUCCESS,
+        )
+        uow.payments.add(payment)
+
+        return {
+            "success": True,
+            "message": f"User {command.user_id} has subscribed to {command.plan_name} plan successfully.",
+        }
+
+
+async def cancel_subscription(
+    command: commands.CancelSubscription,
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    async with uow:
+        user_subscription = (
+            await uow.user_subscriptions.aget_active_subscription_by_user_id(
+                command.user_id
+            )
+        )
+        if user_subscription is None:
+            raise ValueError(f"User {command.user_id} has no active subscription")
+
+        user_subscription.status = SubscriptionStatus.CANCELED
+        uow.user_subscriptions.update(user_subscription)
+        uow.current_subscriptions.update(user_subscription)
+        return {
+            "success": True,
+            "message": f"User {command.user_id} has cancelled subscription successfully.",
+        }
+
+
+async def renew_subscription(
+    command: commands.RenewSubscription,
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    async with uow:
+        current_subscription = (
+            await uow.user_subscriptions.aget_active_subscription_by_user_id(
+                command.user_id
+            )
+        )
+        if current_subscription is None:
+            raise ValueError(f"User {command.user_id} has no active subscription")
+        current_subscription.ensure_renewable()
+
+        payment_success, _ = await SubscriptionService(uow).aprocess_payment(
+            command.user_id,
+            current_subscription.plan.price,
+            idempotency_key=current_subscription.renewal_key,
+        )
+        if not payment_success:
+            handlers.decline_renewal(current_subscription, uow)
+            return dict(handlers.RENEWAL_PAYMENT_FAILED)
+
+        handlers.start_next_period(current_subscription, uow)
+
+        return dict(handlers.RENEWED)
+
+
+async def change_subscription_plan(
+    command: commands.ChangeSubscriptionPlan,
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    async with uow:
+        current_subscription = (
+            await uow.user_subscriptions.aget_active_subscription_by_user_id(
+                command.user_id
+            )
+        )
+        if current_subscription is None:
+            raise ValueError(f"User {command.user_id} has no active subscription")
+        new_plan = await uow.subscription_plans.aget(command.new_plan_name)
+
+        service = SubscriptionService(uow)
+        prorated_amount, remaining_days = service.calculate_proration(
+            current_subscription, new_plan
+        )
+
+        payment_success, _ = await service.aprocess_payment(
+            command.user_id,
+            prorated_amount,
+            idempotency_key=handlers.plan_change_key(
+                command, current_subscription, new_plan
+            ),
+        )
+        if not payment_success:
+            return {
+                "success": False,
+                "message": "Failed to process payment for plan change.",
+            }
+
+        current_subscription.end_date = date.today()
+        current_subscription.status = SubscriptionStatus.CANCELED
+        uow.user_subscriptions.update(current_subscription)
+
+        new_subscription = UserSubscription(
+            user_id=command.user_id,
+            plan=new_plan,
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=remaining_days),
+            status=SubscriptionStatus.ACTIVE,
+        )
+        uow.user_subscriptions.add(new_subscription)
+        uow.current_subscriptions.add(new_subscription)
+
+        return {
+            "success": True,
+            "message": "Subscription plan changed successfully.",
+        }
@@ -1,9 +1,16 @@
+import dataclasses
 import json
+import logging
+import uuid
 from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from django.conf import settings
 
 from subscription.adapters import email
 from subscription.domain import commands, events
 from subscription.domain.domain_models import (
+    Card,
     Payment,
     PaymentMethod,
     PaymentMethodType,
@@ -12,10 +19,27 @@ from subscription.domain.domain_models import (
     SubscriptionStatus,
     UserSubscription,
 )
-from subscription.serializers import CardSerializer
 from subscription.service_layer import unit_of_work
 from subscription.service_layer.services import SubscriptionService
 
+logger = logging.getLogger(__name__)
+
+ALREADY_RENEWED = {
+    "success": False,
+    "skipped": True,
+    "message": "Subscription is no longer active; renewal skipped.",
+}
+
+# NOTE: 기존에 저장된 details 와 같은 형식 (이전 CardSerializer 의 card_expiry 출력 형식)
+CARD_EXPIRY_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+RENEWED = {"success": True, "message": "Subscription renewed successfully."}
+
+RENEWAL_PAYMENT_FAILED = {
+    "success": False,
+    "message": "Failed to process payment for subscription renewal.",
+}
+
 
 def send_payment_failed_notification(
     event: events.PaymentFailed,
@@ -27,6 +51,27 @@ def send_payment_failed_notification(
     )
 
 
+def payment_method_details(payment_details: dict):
+    # NOTE: payment_details 는 뷰에서 이미 검증되었으므로 트랜잭션 안에서 다시 검증하지 않고
+    # 저장할 형태로만 바꾼다.
+    if payment_details["method_type"] == PaymentMethodType.CREDIT_CARD.value:
+        card = Card(
+            card_number=payment_details["card_number"],
+            card_expiry=card_expiry(payment_details["expiration_date"]),
+            card_cvc=payment_details["cvc"],
+        )
+        return dataclasses.asdict(card)
+    # NOTE: 다른 결제 수단이 추가되면 이곳에 추가
+    return "{}"
+
+
+def card_expiry(expiration_date) -> str:
+    """만료일(date 또는 "MM/YY")을 결제 수단 details 에 저장하는 문자열로 바꾼다."""
+    if isinstance(expiration_date, str):
+        expiration_date = datetime.strptime(expiration_date, "%m/%y")
+    return expiration_date.strftime(CARD_EXPIRY_FORMAT)
+
+
 def subscribe_user_to_plan(
     command: commands.CreateSubscription,
     uow: unit_of_work.DjangoUnitOfWork,
@@ -39,48 +84,75 @@ def subscribe_user_to_plan(
         except ValueError as e:
             raise e
 
-        user_subscription = plan.create_user_subscription(
-            command.user_id, date.today(), plan.duration_days
-        )
-        uow.user_subscriptions.add(user_subscription)
-
-        if (
-            command.payment_details["method_type"]
-            == PaymentMethodType.CREDIT_CARD.value
-        ):
-            card_serializer = CardSerializer(
-                data={
-                    "card_number": command.payment_details["card_number"],
-                    "card_expiry": command.payment_details["expiration_date"],
-                    "card_cvc": command.payment_details["cvc"],
-                }
+        if uow.user_subscriptions.get_active_subscription_by_user_id(command.user_id):
+            raise ValueError(
+                f"User {command.user_id} already has an active subscription"
             )
 
-            if card_serializer.is_valid(raise_exception=True):
-                details = card_serializer.data
-        else:
-            # NOTE: 다른 결제 수단이 추가되면 이곳에 추가
-            details = "{}"
+        return create_user_subscription(command, plan, uow)
 
-        payment_method = PaymentMethod(
-            method_type=PaymentMethodType(command.payment_details["method_type"]),
-            details=json.dumps(details),
-        )
-        uow.payment_methods.add(payment_method)
-
-        payment = Payment(
-            subscription=user_subscription,
-            payment_method=payment_method,
-            amount=plan.price,
-            date=date.today(),
-            status=PaymentStatus.SUCCESS,
-        )
-        uow.payments.add(payment)
 
-        return {
-            "success": True,
-            "message": f"User {command.user_id} has subscribed to {command.plan_name} plan successfully.",
+def subscribe_users_to_plans(
+    command: commands.CreateSubscriptions,
+    uow: unit_of_work.DjangoUnitOfWork,
+):
+    """여러 사용자를 구독시키고 항목 순서대로 결과 dict 를 돌려준다.
+
+    활성 구독은 한 번에 조회하고, 새 구독/결제 수단/결제는 flush 때 bulk upsert 된다. 구독할 수
+    없는 항목은 그 항목만 실패로 기록된다.
+    """
+    results = []
+    with uow:
+        subscribed = {
+            subscription.user_id
+            for subscription in uow.user_subscriptions.list_active_by_user_ids(
+                [item.user_id for item in command.subscriptions]
+            )
         }
+        for item in command.subscriptions:
+            try:
+                plan = uow.subscription_plans.get(item.plan_name)
+                if item.user_id in subscribed:
+                    raise ValueError(
+                        f"User {item.user_id} already has an active subscription"
+                    )
+                results.append(create_user_subscription(item, plan, uow))
+            except ValueError as e:
+                results.append({"success": False, "message": str(e)})
+                continue
+            subscribed.add(item.user_id)
+    return results
+
+
+def create_user_subscription(
+    command: commands.CreateSubscription,
+    plan: SubscriptionPlan,
+    uow: unit_of_work.DjangoUnitOfWork,
+) -> dict:
+    payment_method = PaymentMethod(
+        method_type=PaymentMethodType(command.payment_details["method_type"]),
+        details=json.dumps(payment_method_details(command.payment_details)),
+    )
+    user_subscription = plan.create_user_subscription(
+        command.user_id, date.today(), plan.duration_days
+    )
+    uow.user_subscriptions.add(user_subscription)
+    uow.current_subscriptions.add(user_subscription)
+    uow.payment_methods.add(payment_method)
+
+    payment = Payment(
+        subscription=user_subscription,
+        payment_method=payment_method,
+        amount=plan.price,
+        date=date.today(),
+        status=PaymentStatus.SUCCESS,
+    )
+    uow.payments.add(payment)
+
+    return {
+        "success": True,
+        "message": f"User {command.user_id} has subscribed to {command.plan_name} plan successfully.",
+    }
 
 
 def cancel_subscription(
@@ -96,9 +168,12 @@ def cancel_subscription(
             )
         except ValueError as e:
             raise e
+        if user_subscription is None:
+            raise ValueError(f"User {command.user_id} has no active subscription")
 
         user_subscription.status = SubscriptionStatus.CANCELED
         uow.user_subscriptions.update(user_subscription)
+        uow.current_subscriptions.update(user_subscription)
         return {
             "success": True,
             "message": f"User {command.user_id} has cancelled subscription successfully.",
@@ -113,35 +188,157 @@ def renew_subscription(
         current_subscription: UserSubscription = (
             uow.user_subscriptions.get_active_subscription_by_user_id(command.user_id)
         )
-        current_subscription.renew()
+        if current_subscription is None:
+            raise ValueError(f"User {command.user_id} has no active subscription")
+        current_subscription.ensure_renewable()
 
+        # NOTE: 같은 시도의 재전송은 같은 키를 쓰므로 게이트웨이에서 한 번만 결제된다.
         payment_success, payment_details = SubscriptionService(uow).process_payment(
-            command.user_id, current_subscription.plan.price
+            command.user_id,
+            current_subscription.plan.price,
+            idempotency_key=current_subscription.renewal_key,
         )
         if not payment_success:
-            return {
-                "success": False,
-                "message": "Failed to process payment for subscription renewal.",
-            }
+            decline_renewal(current_subscription, uow)
+            return dict(RENEWAL_PAYMENT_FAILED)
 
-        if current_subscription:
-            current_subscription.status = SubscriptionStatus.EXPIRED
-            uow.user_subscriptions.update(current_subscription)
+        start_next_period(current_subscription, uow)
 
-        new_subscription = UserSubscription(
-            user_id=command.user_id,
-            plan=current_subscription.plan,
-            start_date=datetime.today(),
-            end_date=datetime.today()
-            + timedelta(days=current_subscription.plan.duration_days),
-            status=SubscriptionStatus.ACTIVE,
-        )
-        uow.user_subscriptions.add(new_subscription)
+        return dict(RENEWED)
 
-        return {
-            "success": True,
-            "message": "Subscription renewed successfully.",
+
+def renew_subscriptions(
+    command: commands.RenewSubscriptions,
+    uow: unit_of_work.DjangoUnitOfWork,
+):
+    """구독 여러 개를 갱신하고 subscription_id -> 결과 dict 를 돌려준다.
+
+    결제는 게이트웨이에 배치로 한 번에 요청한다. 갱신할 수 없는 구독은 그 항목만 실패("error")로
+    기록되고, 게이트웨이 장애(PaymentGatewayUnavailable)는 배치 전체를 롤백시킨다.
+    """
+    results = {}
+    with uow:
+        subscriptions = {
+            subscription.id: subscription
+            for subscription in uow.user_subscriptions.list_for_update(
+                command.subscription_ids
+            )
         }
+        renewable = []
+        for subscription_id in command.subscription_ids:
+            subscription = subscriptions.get(subscription_id)
+            if subscription is None:
+                results[subscription_id] = {
+                    "success": False,
+                    "error": f"Subscription for  {subscription_id} does not exist",
+                }
+            elif subscription.status != SubscriptionStatus.ACTIVE:
+                results[subscription_id] = dict(ALREADY_RENEWED)
+            else:
+                try:
+                    subscription.ensure_renewable()
+                except ValueError as e:
+                    results[subscription_id] = {"success": False, "error": str(e)}
+                    continue
+                renewable.append(subscription)
+
+        payments = SubscriptionService(uow).process_payments(
+            [
+                (subscription, subscription.plan.price, subscription.renewal_key)
+                for subscription in renewable
+            ]
+        )
+        paid = []
+        for subscription, (payment_success, _) in zip(renewable, payments):
+            if payment_success:
+                paid.append(subscription)
+            else:
+                decline_renewal(subscription, uow)
+                results[subscription.id] = dict(RENEWAL_PAYMENT_FAILED)
+        # NOTE: 결제는 이미 끝났으므로 구독 처리가 실패해도 결제 기록은 남도록 먼저 저장한다.
+        uow.commit()
+
+        results.update(start_next_periods(paid, uow))
+
+    return results
+
+
+def start_next_periods(
+    subscriptions: List[UserSubscription],
+    uow: unit_of_work.DjangoUnitOfWork,
+) -> Dict[uuid.UUID, dict]:
+    """결제된 구독들을 다음 기간으로 넘긴다. 쓰기는 한 번에 flush 한다.
+
+    flush 가 실패하면(예: 유니크 인덱스 위반) 구독마다 세이브포인트에서 다시 처리해 문제가 되는
+    구독만 실패로 남긴다.
+    """
+    try:
+        with uow:
+            for subscription in subscriptions:
+                start_next_period(subscription, uow)
+            uow.commit()
+        return {subscription.id: dict(RENEWED) for subscription in subscriptions}
+    except Exception:
+        logger.warning(
+            "Batched renewal flush failed; retrying item by item", exc_info=True
+        )
+
+    results = {}
+    for subscription in subscriptions:
+        try:
+            with uow:
+                start_next_period(subscription, uow)
+                uow.commit()
+        except Exception as e:
+            logger.exception("Could not renew subscription %s", subscription.id)
+            results[subscription.id] = {"success": False, "error": str(e)}
+        else:
+            results[subscription.id] = dict(RENEWED)
+    return results
+
+
+def decline_renewal(
+    subscription: UserSubscription,
+    uow: unit_of_work.DjangoUnitOfWork,
+):
+    """거절된 갱신 시도를 기록한다. 다음 시도는 새 키로, 뒤로 미룬 시각에 다시 잡힌다."""
+    subscription.decline_renewal(settings.RENEWAL_MAX_ATTEMPTS)
+    uow.user_subscriptions.update(subscription)
+    if subscription.status == SubscriptionStatus.EXPIRED:
+        uow.current_subscriptions.update(subscription)
+
+
+def start_next_period(
+    current_subscription: UserSubscription,
+    uow: unit_of_work.DjangoUnitOfWork,
+):
+    current_subscription.status = SubscriptionStatus.EXPIRED
+    uow.user_subscriptions.update(current_subscription)
+
+    new_subscription = UserSubscription(
+        user_id=current_subscription.user_id,
+        plan=current_subscription.plan,
+        start_date=datetime.today(),
+        end_date=datetime.today()
+        + timedelta(days=current_subscription.plan.duration_days),
+        status=SubscriptionStatus.ACTIVE,
+    )
+    uow.user_subscriptions.add(new_subscription)
+    uow.current_subscriptions.add(new_subscription)
+
+
+def plan_change_key(
+    command: commands.ChangeSubscriptionPlan,
+    subscription: UserSubscription,
+    plan: SubscriptionPlan,
+) -> str:
+    """플랜 변경 결제의 idempotency key.
+
+    게이트웨이는 같은 키에 거절 결과도 그대로 돌려주므로 키는 시도마다 달라야 한다. 요청에
+    Idempotency-Key 가 있으면 그 요청의 재시도끼리만 같은 키를 쓴다.
+    """
+    attempt = command.attempt_key or uuid.uuid4().hex
+    return f"plan-change:{subscription.id}:{plan.id}:{attempt}"
 
 
 def change_subscription_plan(
@@ -155,6 +352,8 @@ def change_subscription_plan(
                     command.user_id
                 )
             )
+            if current_subscription is None:
+                raise ValueError(f"User {command.user_id} has no active subscription")
             new_plan = uow.subscription_plans.get(command.new_plan_name)
 
             prorated_amount, remaining_days = SubscriptionService(
@@ -162,7 +361,11 @@ def change_subscription_plan(
             ).calculate_proration(current_subscription, new_plan)
 
             payment_success, payment_details = SubscriptionService(uow).process_payment(
-                command.user_id, prorated_amount
+                command.user_id,
+                prorated_amount,
+                idempotency_key=plan_change_key(
+                    command, current_subscription, new_plan
+                ),
             )
             if not payment_success:
                 return {
@@ -182,6 +385,7 @@ def change_subscription_plan(
                 status=SubscriptionStatus.ACTIVE,
             )
             uow.user_subscriptions.add(new_subscription)
+            uow.current_subscriptions.add(new_subscription)
 
             return {
                 "success": True,
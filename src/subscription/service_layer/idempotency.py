@@ -0,0 +1,176 @@
+"""Idempotency-Key 저장소.
+
+요청을 처리하기 전에 (user, key) 행을 먼저 넣어 같은 키의 동시 요청을 막고, 처리가 끝나면 응답을
+저장해 재요청(replay)에 그대로 돌려준다. 행은 IdempotencyKey 테이블에 두고 expires_at 이 지나면
+purge_expired 가 지운다. IDEMPOTENCY_USE_CACHE 이면 완료된 응답을 캐시(Redis)에도 두어 재요청을
+DB 조회 없이 처리한다.
+"""
+
+import functools
+import hashlib
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from subscription.adapters.models import IdempotencyKey
+
+CACHE_KEY_PREFIX = "idempotency"
+UNIQUE_CONSTRAINT = "idempotency_user_key_uniq"
+# NOTE: 선점과 조회 사이에 행이 계속 지워지는 경우에만 다시 시도한다.
+BEGIN_ATTEMPTS = 3
+
+
+class IdempotencyKeyInProgress(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("A request with this Idempotency-Key is already in progress")
+        self.retry_after = retry_after
+
+
+class IdempotencyKeyMismatch(Exception):
+    def __init__(self):
+        super().__init__("Idempotency-Key was already used with a different request")
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    body: Any
+
+
+def request_hash(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: int = None, lock_seconds: int = None, use_cache=None):
+        self.ttl = ttl or settings.IDEMPOTENCY_KEY_TTL
+        self.lock_seconds = lock_seconds or settings.IDEMPOTENCY_LOCK_SECONDS
+        self.use_cache = (
+            settings.IDEMPOTENCY_USE_CACHE if use_cache is None else use_cache
+        )
+
+    def begin(
+        self, user_id: int, key: str, request_hash: str
+    ) -> Optional[StoredResponse]:
+        """키를 선점한다. 이미 완료된 요청이면 저장된 응답을 돌려주고, 처음이면 None 을 돌려준다.
+
+        같은 키가 처리 중이면 IdempotencyKeyInProgress, 다른 요청에 쓰인 키면
+        IdempotencyKeyMismatch 를 던진다.
+        """
+        if self.use_cache:
+            cached = cache.get(self._cache_key(user_id, key))
+            if cached is not None:
+                return self._replay(request_hash, *cached)
+
+        for _ in range(BEGIN_ATTEMPTS):
+            now = timezone.now()
+            if self._insert(user_id, key, request_hash, now):
+                return None
+
+            with transaction.atomic():
+                row = (
+                    IdempotencyKey.objects.select_for_update()
+                    .filter(user_id=user_id, key=key)
+                    .first()
+                )
+                if row is None:
+                    # 그 사이에 지워졌다. 다시 선점해 본다.
+                    continue
+
+                in_progress = row.status_code is None
+                if row.expires_at <= now or (in_progress and row.locked_until <= now):
+                    # NOTE: 만료됐거나 처리하던 요청이 응답 없이 사라진 키는 새 요청이 가져간다.
+                    row.request_hash = request_hash
+                    row.status_code = None
+                    row.response_body = None
+                    row.locked_until = now + timedelta(seconds=self.lock_seconds)
+                    row.expires_at = now + timedelta(seconds=self.ttl)
+                    row.save()
+                    return None
+                if in_progress:
+                    if row.request_hash != request_hash:
+                        raise IdempotencyKeyMismatch()
+                    raise IdempotencyKeyInProgress(
+                        retry_after=(row.locked_until - now).total_seconds()
+                    )
+                return self._replay(
+                    request_hash, row.request_hash, row.status_code, row.response_body
+                )
+        raise IdempotencyKeyInProgress(retry_after=1)
+
+    def _insert(self, user_id: int, key: str, request_hash: str, now) -> bool:
+        """키 행을 넣는다. 같은 (user, key) 행이 이미 있으면 False 를 돌려준다."""
+        try:
+            # NOTE: 요청 트랜잭션과 별개로 바로 커밋해야 동시에 들어온 요청이 이 행을 본다.
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    user_id=user_id,
+                    key=key,
+                    request_hash=request_hash,
+                    locked_until=now + timedelta(seconds=self.lock_seconds),
+                    expires_at=now + timedelta(seconds=self.ttl),
+                )
+            return True
+        except IntegrityError as e:
+            # NOTE: NOT NULL, FK 위반 등은 행이 있다는 뜻이 아니므로 그대로 던진다.
+            if not _violates(e, UNIQUE_CONSTRAINT):
+                raise
+            return False
+
+    def complete(
+        self, user_id: int, key: str, request_hash: str, status_code: int, body: Any
+    ):
+        """응답을 저장한다. 명령과 같은 트랜잭션 안에서 불러야 명령과 함께 커밋된다."""
+        IdempotencyKey.objects.filter(user_id=user_id, key=key).update(
+            status_code=status_code, response_body=body
+        )
+        if self.use_cache:
+            # NOTE: 롤백된 응답이 캐시에서 재생되지 않도록 커밋된 뒤에 캐시에 둔다.
+            transaction.on_commit(
+                functools.partial(
+                    cache.set,
+                    self._cache_key(user_id, key),
+                    (request_hash, status_code, body),
+                    timeout=self.ttl,
+                )
+            )
+
+    def release(self, user_id: int, key: str):
+        """응답을 저장하지 않고 키를 놓아 준다. 클라이언트가 같은 키로 다시 시도할 수 있다."""
+        IdempotencyKey.objects.filter(
+            user_id=user_id, key=key, status_code__isnull=True
+        ).delete()
+
+    @staticmethod
+    def _replay(
+        request_hash: str, stored_hash: str, status_code: int, body: Any
+    ) -> StoredResponse:
+        if stored_hash != request_hash:
+            raise IdempotencyKeyMismatch()
+        return StoredResponse(status_code, body)
+
+    @staticmethod
+    def _cache_key(user_id: int, key: str) -> str:
+        return (
+            f"{CACHE_KEY_PREFIX}:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}"
+        )
+
+
+def _violates(error: IntegrityError, constraint: str) -> bool:
+    diag = getattr(error.__cause__, "diag", None)
+    constraint_name = getattr(diag, "constraint_name", None)
+    if constraint_name is not None:
+        return constraint_name == constraint
+    return constraint in str(error)
+
+
+def purge_expired() -> int:
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
@@ -1,8 +1,10 @@
 import logging
-from typing import List, Union
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Iterable, List, Optional, Union
 
 from subscription.domain import commands, events
-from subscription.service_layer import handlers, unit_of_work
+from subscription.service_layer import async_handlers, handlers, unit_of_work
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +16,9 @@ def handle(
     uow: unit_of_work.AbstractUnitOfWork,
 ):
     results = []
-    queue = [message]
+    queue = deque([message])
     while queue:
-        message = queue.pop(0)
+        message = queue.popleft()
         if isinstance(message, events.Event):
             handle_event(message, queue, uow)
         elif isinstance(message, commands.Command):
@@ -27,9 +29,42 @@ def handle(
     return results
 
 
+@dataclass
+class CommandResult:
+    command: commands.Command
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def handle_many(
+    commands_: Iterable[commands.Command],
+    uow: unit_of_work.AbstractUnitOfWork,
+) -> List[CommandResult]:
+    """여러 커맨드를 하나의 트랜잭션에서 처리한다.
+
+    각 핸들러의 `with uow:` 는 바깥 블록 안에서 세이브포인트가 되므로 실패한 커맨드의 변경만
+    롤백되고 나머지는 마지막에 한 번에 flush 된다. 커맨드별 결과나 예외를 순서대로 돌려준다.
+    flush 자체가 실패하면(예: 제약 조건 위반) 배치 전체가 롤백되고 예외가 전파된다.
+    """
+    outcomes = []
+    with uow:
+        for command in commands_:
+            try:
+                results = handle(command, uow)
+            except Exception as e:
+                outcomes.append(CommandResult(command, error=e))
+            else:
+                outcomes.append(CommandResult(command, result=results[0]))
+    return outcomes
+
+
 def handle_command(
     command: commands.Command,
-    queue: List[Message],
+    queue: Deque[Message],
     uow: unit_of_work.AbstractUnitOfWork,
 ):
     logger.debug("handling command %s", command)
@@ -45,7 +80,7 @@ def handle_command(
 
 def handle_event(
     event: events.Event,
-    queue: List[Message],
+    queue: Deque[Message],
     uow: unit_of_work.AbstractUnitOfWork,
 ):
     for handler in EVENT_HANDLERS[type(event)]:
@@ -58,13 +93,76 @@ def handle_event(
             continue
 
 
+async def ahandle(
+    message: Message,
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    """handle()의 async 버전. ASYNC_*_HANDLERS 의 핸들러를 await 한다."""
+    results = []
+    queue = deque([message])
+    while queue:
+        message = queue.popleft()
+        if isinstance(message, events.Event):
+            await ahandle_event(message, queue, uow)
+        elif isinstance(message, commands.Command):
+            cmd_result = await ahandle_command(message, queue, uow)
+            results.append(cmd_result)
+        else:
+            raise Exception(f"{message} was not an Event or Command")
+    return results
+
+
+async def ahandle_command(
+    command: commands.Command,
+    queue: Deque[Message],
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    logger.debug("handling command %s", command)
+    try:
+        handler = ASYNC_COMMAND_HANDLERS[type(command)]
+        result = await handler(command, uow=uow)
+        queue.extend(uow.collect_new_events())
+        return result
+    except Exception:
+        logger.exception("Exception handling command %s", command)
+        raise
+
+
+async def ahandle_event(
+    event: events.Event,
+    queue: Deque[Message],
+    uow: unit_of_work.AsyncDjangoUnitOfWork,
+):
+    for handler in ASYNC_EVENT_HANDLERS[type(event)]:
+        try:
+            logger.debug("handling event %s with handler %s", event, handler)
+            await handler(event, uow=uow)
+            queue.extend(uow.collect_new_events())
+        except Exception:
+            logger.exception("Exception handling event %s", event)
+            continue
+
+
 EVENT_HANDLERS = {
     events.PaymentFailed: [handlers.send_payment_failed_notification],
 }  # type: Dict[Type[events.Event], List[Callable]]
 
 COMMAND_HANDLERS = {
     commands.CreateSubscription: handlers.subscribe_user_to_plan,
+    commands.CreateSubscriptions: handlers.subscribe_users_to_plans,
     commands.CancelSubscription: handlers.cancel_subscription,
     commands.RenewSubscription: handlers.renew_subscription,
+    commands.RenewSubscriptions: handlers.renew_subscriptions,
     commands.ChangeSubscriptionPlan: handlers.change_subscription_plan,
 }  # type: Dict[Type[commands.Command], Callable]
+
+ASYNC_EVENT_HANDLERS = {
+    events.PaymentFailed: [async_handlers.send_payment_failed_notification],
+}  # type: Dict[Type[events.Event], List[Callable]]
+
+ASYNC_COMMAND_HANDLERS = {
+    commands.CreateSubscription: async_handlers.subscribe_user_to_plan,
+    commands.CancelSubscription: async_handlers.cancel_subscription,
+    commands.RenewSubscription: async_handlers.renew_subscription,
+    commands.ChangeSubscriptionPlan: async_handlers.change_subscription_plan,
+}  # type: Dict[Type[commands.Command], Callable]
@@ -0,0 +1,70 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from subscription.adapters.models import OutboxMessage
+from subscription.service_layer import message_bus, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+
+def relay(batch_size: int = None) -> int:
+    """아웃박스에서 아직 전달되지 않은 이벤트를 batch_size 개씩 꺼내 EVENT_HANDLERS 로 전달한다.
+
+    행은 SELECT ... FOR UPDATE SKIP LOCKED 로 가져오므로 여러 워커가 동시에 돌아도 같은 이벤트를
+    처리하지 않는다. 핸들러가 실패한 이벤트는 attempts 를 늘려 두고 다음 실행 때 다시 시도하므로
+    전달은 최소 한 번(at-least-once)이다. 전달한 이벤트 수를 돌려준다.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    delivered = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects.filter(
+                    delivered_at__isnull=True,
+                    attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+                    # NOTE: 한 번의 실행에서는 같은 메시지를 두 번 시도하지 않는다.
+                    id__gt=last_id,
+                )
+                .order_by("id")
+                .select_for_update(skip_locked=True)[:batch_size]
+            )
+            for message in messages:
+                delivered += _deliver(message)
+            OutboxMessage.objects.bulk_update(
+                messages, ["delivered_at", "attempts", "last_error"]
+            )
+
+        if len(messages) < batch_size:
+            return delivered
+        last_id = messages[-1].id
+
+
+def purge_delivered(older_than_days: int = None) -> int:
+    older_than_days = older_than_days or settings.OUTBOX_RETENTION_DAYS
+    deleted, _ = OutboxMessage.objects.filter(
+        delivered_at__lt=timezone.now() - timedelta(days=older_than_days)
+    ).delete()
+    return deleted
+
+
+def _deliver(message: OutboxMessage) -> int:
+    message.attempts += 1
+    try:
+        event = message.to_event()
+        # 핸들러 하나가 실패하면 이 이벤트에 대한 변경만 롤백한다.
+        with transaction.atomic():
+            for handler in message_bus.EVENT_HANDLERS[type(event)]:
+                handler(event, uow=unit_of_work.DjangoUnitOfWork())
+    except Exception as e:
+        logger.exception("Exception relaying outbox message %s", message)
+        message.last_error = repr(e)
+        return 0
+
+    message.delivered_at = timezone.now()
+    message.last_error = ""
+    return 1
@@ -0,0 +1,83 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from subscription.adapters import finance_export
+from subscription.adapters.repository import (
+    DjangoAccountVersionRepository,
+    DjangoCurrentSubscriptionReader,
+    DjangoPaymentRepository,
+    DjangoUserSubscriptionRepository,
+)
+
+PAYMENT_HISTORY_MAX_LIMIT = 100
+
+
+def current_subscription(user_id: int) -> Optional[dict]:
+    # NOTE: 읽기 모델에서 기본키 한 번으로 조회한다. JOIN 이나 정렬이 없다.
+    return DjangoCurrentSubscriptionReader().get(user_id)
+
+
+def renewal_backlog() -> dict:
+    """갱신 시각이 지났는데 아직 처리되지 않은 구독 수와 가장 오래 밀린 시간."""
+    return DjangoUserSubscriptionRepository().renewal_backlog(timezone.now())
+
+
+def account_version(user_id: int) -> int:
+    """사용자의 구독/결제가 바뀔 때마다 커지는 값. 변경이 없으면 0 이다."""
+    return DjangoAccountVersionRepository().get(user_id)
+
+
+def payment_history(
+    user_id: int, cursor: str = None, limit: int = 20
+) -> Tuple[List[dict], Optional[str]]:
+    """결제 내역을 최신순으로 한 페이지 돌려준다. 다음 페이지가 있으면 그 커서를 함께 돌려준다.
+
+    (date, id) keyset 으로 넘기므로 페이지가 뒤로 가도 OFFSET 처럼 느려지지 않는다.
+    """
+    limit = max(1, min(limit, PAYMENT_HISTORY_MAX_LIMIT))
+    before = decode_cursor(cursor) if cursor else None
+    rows = DjangoPaymentRepository().history_page(user_id, before, limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def payment_export(
+    start: datetime, end: datetime, statuses: Sequence[str] = ()
+) -> Iterator[tuple]:
+    """[start, end) 사이 결제를 finance_export.COLUMNS 순서의 튜플로 하나씩 돌려준다. 쿼리는 한 번이다."""
+    return DjangoPaymentRepository().export_rows(
+        list(finance_export.COLUMNS.values()),
+        start,
+        end,
+        statuses,
+        chunk_size=settings.FINANCE_EXPORT_CHUNK_SIZE,
+    )
+
+
+def existing_user_ids(user_ids: Iterable[int]) -> Set[int]:
+    return set(
+        get_user_model()
+        .objects.filter(id__in=list(user_ids))
+        .values_list("id", flat=True)
+    )
+
+
+def encode_cursor(row: dict) -> str:
+    value = f"{row['date'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """잘못된 커서면 ValueError 를 던진다."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date, id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(date), uuid.UUID(id)
+    except (TypeError, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -1,8 +1,8 @@
-import random
+import uuid
 from datetime import date, datetime
+from typing import List, Tuple
 
-from tenacity import retry, stop_after_attempt, wait_fixed
-
+from subscription.adapters import payment_gateway
 from subscription.domain.domain_models import (
     Payment,
     PaymentMethod,
@@ -15,12 +15,64 @@ from subscription.service_layer.unit_of_work import DjangoUnitOfWork
 
 
 class SubscriptionService:
-    def __init__(self, unit_of_work: DjangoUnitOfWork):
+    def __init__(
+        self,
+        unit_of_work: DjangoUnitOfWork,
+        gateway: payment_gateway.AbstractPaymentGateway = None,
+    ):
         self.uow = unit_of_work
+        self.gateway = gateway or payment_gateway.get_gateway()
+
+    def process_payment(self, user_id: int, amount: float, idempotency_key: str = None):
+        """게이트웨이에 한 번 결제를 요청한다.
+
+        게이트웨이 장애는 PaymentGatewayUnavailable 로 올라가고 재시도는 호출한 쪽이 예약한다.
+        재시도에 같은 idempotency_key 를 넘기면 이중 결제되지 않는다.
+        """
+        subscription = self.uow.user_subscriptions.get_active_subscription_by_user_id(
+            user_id
+        )
+        idempotency_key = idempotency_key or str(uuid.uuid4())
+        result = self.gateway.charge(user_id, amount, idempotency_key)
+        return self._record_payment(subscription, amount, result)
 
-    # FIXME: 테스트 목적으로 임시로 추가한 메서드
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def process_payment(self, user_id: int, amount: float):
+    async def aprocess_payment(
+        self, user_id: int, amount: float, idempotency_key: str = None
+    ):
+        subscription = (
+            await self.uow.user_subscriptions.aget_active_subscription_by_user_id(
+                user_id
+            )
+        )
+        idempotency_key = idempotency_key or str(uuid.uuid4())
+        result = await self.gateway.acharge(user_id, amount, idempotency_key)
+        return self._record_payment(subscription, amount, result)
+
+    def process_payments(
+        self, charges: List[Tuple[UserSubscription, float, str]]
+    ) -> List[Tuple[bool, Payment]]:
+        """(구독, 금액, idempotency_key) 목록을 게이트웨이에 한 번에 요청하고 결과를 결제로 기록한다.
+
+        결제 행은 유닛 오브 워크가 블록이 끝날 때 한 번에 저장한다.
+        """
+        results = self.gateway.charge_many(
+            [
+                payment_gateway.ChargeRequest(subscription.user_id, amount, key)
+                for subscription, amount, key in charges
+            ]
+        )
+        return [
+            self._record_payment(subscription, amount, result)
+            for (subscription, amount, _), result in zip(charges, results)
+        ]
+
+    def _record_payment(
+        self,
+        subscription: UserSubscription,
+        amount: float,
+        result: payment_gateway.ChargeResult,
+    ):
+        # FIXME: 저장된 결제 수단을 쓰기 전까지 임시 카드 정보를 사용한다.
         payment_method = PaymentMethod(
             method_type=PaymentMethodType.CREDIT_CARD,
             details={
@@ -31,24 +83,20 @@ class SubscriptionService:
         )
         self.uow.payment_methods.add(payment_method)
 
-        payment_success = random.choice([True, False])
-
         payment = Payment(
-            subscription=self.uow.user_subscriptions.get_active_subscription_by_user_id(
-                user_id
-            ),
+            subscription=subscription,
             payment_method=payment_method,
             amount=amount,
             date=datetime.now(),
-            status=PaymentStatus.SUCCESS if payment_success else PaymentStatus.FAILED,
+            status=PaymentStatus.SUCCESS if result.success else PaymentStatus.FAILED,
         )
 
-        if not payment_success:
-            payment.mark_failed("Random failure reason or specific error message")
+        if not result.success:
+            payment.mark_failed(result.failure_reason)
 
         self.uow.payments.add(payment)
 
-        return payment_success, payment
+        return result.success, payment
 
     def calculate_proration(
         self, current_subscription: UserSubscription, new_plan: SubscriptionPlan
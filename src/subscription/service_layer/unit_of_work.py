@@ -1,16 +1,23 @@
 from __future__ import annotations
 
 import abc
+import threading
 
+from asgiref.sync import sync_to_async
 from django.db import transaction
 
 from ..adapters.repository import (
+    AsyncTrackingRepository,
+    DjangoAccountVersionRepository,
+    DjangoCurrentSubscriptionRepository,
+    DjangoOutboxRepository,
     DjangoPaymentMethodRepository,
     DjangoPaymentRepository,
     DjangoSubscriptionPlanRepository,
     DjangoUserSubscriptionRepository,
     TrackingRepository,
 )
+from ..domain.domain_models import event_registry
 
 
 class AbstractUnitOfWork(abc.ABC):
@@ -39,33 +46,202 @@ class DjangoUnitOfWork(AbstractUnitOfWork):
         self.subscription_plans = TrackingRepository(DjangoSubscriptionPlanRepository())
         self.payments = TrackingRepository(DjangoPaymentRepository())
         self.payment_methods = TrackingRepository(DjangoPaymentMethodRepository())
+        # NOTE: 현재 구독 읽기 모델. 핸들러가 구독을 바꿀 때 같은 트랜잭션에서 갱신한다.
+        self.current_subscriptions = TrackingRepository(
+            DjangoCurrentSubscriptionRepository()
+        )
+        # NOTE: 도메인 이벤트는 flush 때 같은 트랜잭션에서 아웃박스에 저장된다.
+        self.outbox = DjangoOutboxRepository()
+        self.account_versions = DjangoAccountVersionRepository()
+        self._transactions = []
+        # NOTE: 이벤트를 발생시킨 엔티티 (id(entity) -> entity)
+        self._dirty_entities = {}
+        # NOTE: 블록마다 진입 시점의 엔티티별 이벤트 개수 (id(entity) -> len(events))
+        self._event_marks = []
+        self._registry_token = None
+        self._owner_thread = None
+
+    @property
+    def repositories(self):
+        # NOTE: FK 순서대로 나열한다. flush 도 이 순서로 한다.
+        return [
+            self.subscription_plans,
+            self.user_subscriptions,
+            self.current_subscriptions,
+            self.payment_methods,
+            self.payments,
+        ]
 
     def __enter__(self):
-        self._transaction = transaction.atomic()
-        self._transaction.__enter__()
+        if not self._transactions:
+            self._owner_thread = threading.get_ident()
+            self._start_recording_events()
+        elif self._owner_thread != threading.get_ident():
+            # NOTE: 트랜잭션 스택과 identity map 이 섞이므로 스레드마다(요청마다) 새로 만들어야 한다.
+            raise RuntimeError(
+                "DjangoUnitOfWork is already in use by another thread; "
+                "create one per request or task"
+            )
+        self._event_marks.append(self._mark_events())
+        # NOTE: 중첩해서 진입하면 atomic()이 세이브포인트가 된다.
+        transaction_ = transaction.atomic()
+        transaction_.__enter__()
+        self._transactions.append(transaction_)
+        for repo in self.repositories:
+            repo.begin()
         return super().__enter__()
 
     def __exit__(self, exc_type, exc_value, traceback):
+        transaction_ = self._transactions.pop()
+        event_mark = self._event_marks.pop()
+        if not self._transactions:
+            self._stop_recording_events()
         if exc_type:
-            self._transaction.__exit__(exc_type, exc_value, traceback)
+            self._discard_events_since(event_mark)
+            for repo in self.repositories:
+                repo.end(discard=True)
+            transaction_.__exit__(exc_type, exc_value, traceback)
             return False
+
+        try:
+            # 가장 바깥 트랜잭션에서만 모아둔 쓰기를 내보낸다.
+            if not self._transactions:
+                self.flush()
+        except Exception as e:
+            for repo in self.repositories:
+                repo.end(discard=True)
+            transaction_.__exit__(type(e), e, e.__traceback__)
+            raise
+
+        for repo in self.repositories:
+            repo.end()
         # 잘 실행 됐으면 커밋 하고 종료
-        self._transaction.__exit__(None, None, None)
+        transaction_.__exit__(None, None, None)
         return True
 
+    def flush(self):
+        user_ids = self._changed_user_ids()
+        for repo in self.repositories:
+            repo.flush()
+        if user_ids:
+            self.account_versions.bump(user_ids)
+        events = list(self._drain_events())
+        if events:
+            self.outbox.add_many(events)
+
     def commit(self):
-        pass
+        self.flush()
 
     def rollback(self):
         pass
 
     def collect_new_events(self):
-        for repo in [
-            self.user_subscriptions,
-            self.subscription_plans,
-            self.payments,
-            self.payment_methods,
-        ]:
-            for entity in repo.seen:
-                while entity.events:
-                    yield entity.events.pop(0)
+        # NOTE: flush 된 이벤트는 아웃박스로 갔으므로 여기서는 flush 되지 않은 이벤트만 나온다.
+        # 블록 안에서는 가장 바깥 flush 가 아웃박스에 저장해야 하므로 가져가지 않는다.
+        if self._transactions:
+            return []
+        return self._drain_events()
+
+    def _changed_user_ids(self):
+        # NOTE: 구독이나 결제가 바뀐 사용자의 버전(조회 API 의 ETag)을 올린다.
+        user_ids = {s.user_id for s in self.user_subscriptions.pending}
+        user_ids.update(p.subscription.user_id for p in self.payments.pending)
+        return user_ids
+
+    def _drain_events(self):
+        entities = list(self._dirty_entities.values())
+        self._dirty_entities.clear()
+        for entity in entities:
+            yield from entity.pop_events()
+
+    def _mark_events(self):
+        return {key: len(entity.events) for key, entity in self._dirty_entities.items()}
+
+    def _discard_events_since(self, mark: dict):
+        # 롤백된 블록에서 발생한 이벤트는 발행하지 않는다. 블록 전에 발생한 이벤트는 남긴다.
+        for key, entity in list(self._dirty_entities.items()):
+            kept = mark.get(key, 0)
+            del entity.events[kept:]
+            if not kept:
+                del self._dirty_entities[key]
+
+    def _start_recording_events(self):
+        self._registry_token = event_registry.set(self._dirty_entities)
+
+    def _stop_recording_events(self):
+        event_registry.reset(self._registry_token)
+        self._registry_token = None
+
+
+class AsyncDjangoUnitOfWork(DjangoUnitOfWork):
+    """ASGI 용 유닛 오브 워크. `async with uow:` 로 사용한다.
+
+    조회는 Django async ORM 으로 하고, 쓰기는 메모리에 모아 두었다가 가장 바깥 블록이 끝날 때
+    하나의 트랜잭션으로 flush 한다. 결제처럼 오래 걸리는 작업을 기다리는 동안 DB 트랜잭션이나
+    워커 스레드를 잡고 있지 않는다. 대신 조회와 쓰기가 같은 트랜잭션이 아니므로 동시에 들어온
+    요청의 충돌은 flush 때 제약 조건(IntegrityError)으로 드러난다.
+    """
+
+    def __init__(self):
+        self.user_subscriptions = AsyncTrackingRepository(
+            DjangoUserSubscriptionRepository()
+        )
+        self.subscription_plans = AsyncTrackingRepository(
+            DjangoSubscriptionPlanRepository()
+        )
+        self.payments = AsyncTrackingRepository(DjangoPaymentRepository())
+        self.payment_methods = AsyncTrackingRepository(DjangoPaymentMethodRepository())
+        self.current_subscriptions = AsyncTrackingRepository(
+            DjangoCurrentSubscriptionRepository()
+        )
+        self.outbox = DjangoOutboxRepository()
+        self.account_versions = DjangoAccountVersionRepository()
+        self._depth = 0
+        self._dirty_entities = {}
+        self._event_marks = []
+        self._registry_token = None
+
+    def __enter__(self):
+        raise TypeError("AsyncDjangoUnitOfWork must be used with 'async with'")
+
+    async def __aenter__(self):
+        if not self._depth:
+            self._start_recording_events()
+        self._event_marks.append(self._mark_events())
+        self._depth += 1
+        for repo in self.repositories:
+            repo.begin()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        event_mark = self._event_marks.pop()
+        outermost = not self._depth
+        if outermost:
+            self._stop_recording_events()
+        if exc_type:
+            self._discard_events_since(event_mark)
+            for repo in self.repositories:
+                repo.end(discard=True)
+            return False
+
+        try:
+            if outermost:
+                await sync_to_async(self._flush_atomically)()
+        except Exception:
+            for repo in self.repositories:
+                repo.end(discard=True)
+            raise
+
+        for repo in self.repositories:
+            repo.end()
+        return False
+
+    def collect_new_events(self):
+        if self._depth:
+            return []
+        return self._drain_events()
+
+    def _flush_atomically(self):
+        with transaction.atomic():
+            self.flush()
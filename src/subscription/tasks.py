@@ -1,28 +1,144 @@
-from datetime import datetime, timedelta
+import logging
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Tuple
 
-from celery import shared_task
+from celery import group, shared_task
 from celery.schedules import crontab
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.utils import timezone
 
+from subscription.adapters import payment_gateway
+from subscription.adapters.catalog import plan_catalog
 from subscription.domain import commands
-from subscription.service_layer import message_bus, unit_of_work
+from subscription.service_layer import (
+    idempotency,
+    message_bus,
+    outbox,
+    queries,
+    unit_of_work,
+)
 from subscription_project.celery import app
 
+logger = logging.getLogger(__name__)
+
 
 @app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
-    # NOTE: 매일 자정에 구독 갱신 태스크 실행
-    sender.add_periodic_task(crontab(minute=0, hour=0), renew_expired_subscriptions.s())
+    # NOTE: 갱신 시각이 지난 구독을 짧은 주기로 찾아 갱신한다.
+    sender.add_periodic_task(
+        settings.RENEWAL_POLL_INTERVAL, renew_expired_subscriptions.s()
+    )
+    # NOTE: 아웃박스에 쌓인 도메인 이벤트를 주기적으로 전달한다.
+    sender.add_periodic_task(settings.OUTBOX_RELAY_INTERVAL, relay_outbox.s())
+    sender.add_periodic_task(crontab(minute=30, hour=3), purge_delivered_outbox.s())
+    sender.add_periodic_task(crontab(minute=15), purge_expired_idempotency_keys.s())
 
 
-@shared_task
-def renew_expired_subscriptions():
-    yesterday = (datetime.today() - timedelta(days=1)).date()
+@worker_process_init.connect
+def warm_plan_catalog(**kwargs):
+    plan_catalog.warm()
+
+
+@shared_task(bind=True)
+def renew_expired_subscriptions(self, chunk_size: int = None):
+    """next_renewal_at 이 지난 구독을 chunk_size 개씩 가져가 renew_subscription_chunk 로 fan-out 한다.
+
+    RENEWAL_POLL_INTERVAL 마다 실행되므로 밀린(overdue) 구독도 다음 실행 때 처리되고, 갱신 시각은
+    플랜별 jitter 로 하루에 흩어져 있다. 코디네이터는 (id, user_id) 만 읽고, 갱신은 워커 수만큼
+    병렬로 처리된다.
+    """
+    chunk_size = chunk_size or settings.RENEWAL_CHUNK_SIZE
+    repository = unit_of_work.DjangoUnitOfWork().user_subscriptions
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.RENEWAL_LEASE_SECONDS)
+
+    chunks = []
+    while True:
+        keys = repository.claim_due(now, lease_until, chunk_size)
+        if keys:
+            chunks.append(
+                [(str(subscription_id), user_id) for subscription_id, user_id in keys]
+            )
+        if len(keys) < chunk_size:
+            break
+
+    job = group(renew_subscription_chunk.s(chunk) for chunk in chunks)
+    # NOTE: .apply() 로 실행된 경우(테스트, 수동 실행)에는 청크도 현재 프로세스에서 처리한다.
+    if self.request.is_eager:
+        job.apply()
+    else:
+        job.apply_async()
+    logger.info(
+        "Dispatched %d renewal chunks", len(chunks), extra=queries.renewal_backlog()
+    )
+    return len(chunks)
+
+
+@shared_task(bind=True, acks_late=True)
+def renew_subscription_chunk(
+    self, chunk: List[Tuple[str, int]], attempt: int = 0
+) -> Dict[str, int]:
+    """청크 하나를 한 트랜잭션으로 갱신한다.
 
-    with unit_of_work.DjangoUnitOfWork() as uow:
-        expired_subscriptions = uow.user_subscriptions.get_subscriptions_expiring_on(
-            yesterday
+    결제는 게이트웨이에 배치로 한 번에 요청하고 결과는 결제 행 하나의 bulk insert 로 저장된다.
+    subscription_id 로 갱신하므로 같은 청크가 다시 실행돼도 이미 갱신된 구독은 건너뛴다.
+    게이트웨이 장애로 결제하지 못하면 청크를 지수 백오프 countdown 으로 다시 예약하므로 워커가
+    재시도를 기다리며 잠들지 않는다.
+    """
+    summary = {
+        "renewed": 0,
+        "skipped": 0,
+        "payment_failed": 0,
+        "failed": 0,
+        "retried": 0,
+    }
+    command = commands.RenewSubscriptions(
+        [uuid.UUID(subscription_id) for subscription_id, _ in chunk]
+    )
+    try:
+        [results] = message_bus.handle(command, unit_of_work.DjangoUnitOfWork())
+    except payment_gateway.PaymentGatewayUnavailable:
+        if attempt >= settings.PAYMENT_RETRY_MAX_ATTEMPTS:
+            # NOTE: 임대(lease)가 끝나면 폴러가 다시 가져간다.
+            summary["failed"] = len(chunk)
+            return summary
+        summary["retried"] = len(chunk)
+        retry = renew_subscription_chunk.signature(
+            args=[chunk],
+            kwargs={"attempt": attempt + 1},
+            countdown=payment_gateway.retry_countdown(attempt),
         )
+        # NOTE: .apply() 로 실행된 경우에는 countdown 없이 바로 다시 실행된다.
+        if self.request.is_eager:
+            retry.apply()
+        else:
+            retry.apply_async()
+        return summary
 
-        for subscription in expired_subscriptions:
-            user_id = subscription.user_id
-            message_bus.handle(commands.RenewSubscription(user_id=user_id), uow=uow)
+    for result in results.values():
+        if "error" in result:
+            summary["failed"] += 1
+        elif result.get("skipped"):
+            summary["skipped"] += 1
+        elif result["success"]:
+            summary["renewed"] += 1
+        else:
+            summary["payment_failed"] += 1
+    return summary
+
+
+@shared_task
+def relay_outbox():
+    return outbox.relay()
+
+
+@shared_task
+def purge_delivered_outbox():
+    return outbox.purge_delivered()
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    return idempotency.purge_expired()
@@ -1,9 +1,16 @@
 # your_app/urls.py
 
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from subscription.views.api import SubscriptionViewSet
+from subscription.views import async_api
+from subscription.views.front import plan_list
+from subscription.views.api import (
+    SubscriptionViewSet,
+    export_payments,
+    issue_auth_token,
+    renewal_backlog,
+)
 
 router = DefaultRouter()
 
@@ -11,4 +18,34 @@ router.register(r"subscriptions", SubscriptionViewSet, basename="subscription")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("renewals/backlog/", renewal_backlog, name="renewal-backlog"),
+    path("auth/token/", issue_auth_token, name="auth-token"),
+    # NOTE: format 이라는 이름은 DRF 가 렌더러 선택에 쓰므로 export_format 으로 받는다.
+    re_path(
+        r"^finance/payments\.(?P<export_format>csv|ndjson)$",
+        export_payments,
+        name="finance-payment-export",
+    ),
+    path("plans/", plan_list, name="plan-list"),
+    # NOTE: ASGI 배포용 async API
+    path(
+        "async/subscriptions/subscribe/",
+        async_api.subscribe,
+        name="async-subscription-subscribe",
+    ),
+    path(
+        "async/subscriptions/cancel/",
+        async_api.cancel,
+        name="async-subscription-cancel",
+    ),
+    path(
+        "async/subscriptions/renew/",
+        async_api.renew,
+        name="async-subscription-renew",
+    ),
+    path(
+        "async/subscriptions/change-plan/",
+        async_api.change,
+        name="async-subscription-change",
+    ),
 ]
@@ -0,0 +1,273 @@
+"""구독 요청 본문을 DRF 시리얼라이저 없이 한 번에 검증한다.
+
+SubscriptionRequestSerializer 와 같은 규칙, 같은 오류 메시지/형태로 검증하지만 필드 객체를 만들거나
+필드마다 run_validation 을 거치지 않는다. 폼 입력(QueryDict)은 중첩 필드 해석이 다르므로
+시리얼라이저로 넘긴다.
+"""
+
+import calendar
+import re
+from collections.abc import Mapping
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.fields import CharField, DateField, Field, IntegerField
+from rest_framework.serializers import Serializer
+from rest_framework.settings import api_settings
+from rest_framework.utils import html
+
+from subscription.domain import commands
+from subscription.domain.domain_models import PlanName
+
+PLAN_NAMES = frozenset(plan.value for plan in PlanName)
+
+# NOTE: datetime.strptime(value, "%m/%y") 와 같은 입력을 받는다.
+EXPIRATION_DATE = re.compile(r"(1[0-2]|0[1-9]|[1-9])/(\d\d)")
+EXPIRATION_DATE_FORMAT = "MM/YY"
+
+# Luhn 에서 짝수 번째 자리를 두 배 한 뒤 각 자리를 더한 값
+LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+REQUIRED = Field.default_error_messages["required"]
+NULL = Field.default_error_messages["null"]
+NOT_A_STRING = CharField.default_error_messages["invalid"]
+BLANK = CharField.default_error_messages["blank"]
+MAX_LENGTH = CharField.default_error_messages["max_length"]
+MIN_LENGTH = CharField.default_error_messages["min_length"]
+INVALID_DATE = DateField.default_error_messages["invalid"]
+DATETIME_NOT_DATE = DateField.default_error_messages["datetime"]
+NOT_A_DICT = Serializer.default_error_messages["invalid"]
+INVALID_INTEGER = IntegerField.default_error_messages["invalid"]
+NOT_A_NON_EMPTY_LIST = "Expected a non-empty list of items."
+MAX_ITEMS = "Ensure this field has no more than {max_items} elements."
+
+
+class _Missing:
+    pass
+
+
+MISSING = _Missing()
+
+
+def create_subscription_command(user_id: int, data) -> commands.CreateSubscription:
+    """요청 본문을 검증해 CreateSubscription 커맨드로 만든다. 잘못된 입력은 ValidationError 로 알린다."""
+    valid_data = validate_subscription_request(data)
+    return commands.CreateSubscription(
+        user_id=user_id,
+        plan_name=valid_data["plan_name"],
+        payment_details=valid_data["payment_details"],
+    )
+
+
+def validate_bulk_subscription_request(
+    data, max_items: int
+) -> Tuple[List[Tuple[int, commands.CreateSubscription]], Dict[int, dict]]:
+    """{"items": [{"user_id", "plan_name", "payment_details"}, ...]} 를 한 번에 검증한다.
+
+    ([(항목 번호, 커맨드), ...], {항목 번호: 오류}) 를 돌려준다. 본문 자체가 잘못되었으면
+    ValidationError 를 던진다.
+    """
+    _ensure_mapping(data)
+    items = data.get("items", MISSING)
+    if not isinstance(items, list) or not items:
+        if items is MISSING or items is None:
+            error = _empty_error(items)
+        else:
+            error = ErrorDetail(NOT_A_NON_EMPTY_LIST, code="invalid")
+        raise ValidationError({"items": [error]})
+    if len(items) > max_items:
+        message = MAX_ITEMS.format(max_items=max_items)
+        raise ValidationError({"items": [ErrorDetail(message, code="max_length")]})
+
+    valid, errors = [], {}
+    for index, item in enumerate(items):
+        try:
+            _ensure_mapping(item)
+            item_errors = {}
+            user_id = _user_id(item.get("user_id", MISSING), item_errors)
+            try:
+                valid_data = validate_subscription_request(item)
+            except ValidationError as e:
+                item_errors.update(e.detail)
+            if item_errors:
+                raise ValidationError(item_errors)
+        except ValidationError as e:
+            errors[index] = e.detail
+            continue
+        valid.append(
+            (
+                index,
+                commands.CreateSubscription(
+                    user_id=user_id,
+                    plan_name=valid_data["plan_name"],
+                    payment_details=valid_data["payment_details"],
+                ),
+            )
+        )
+    return valid, errors
+
+
+def validate_subscription_request(data) -> dict:
+    """SubscriptionRequestSerializer(data=data).validated_data 와 같은 값을 돌려준다."""
+    if html.is_html_input(data):
+        from subscription.serializers import SubscriptionRequestSerializer
+
+        serializer = SubscriptionRequestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    _ensure_mapping(data)
+    errors = {}
+    plan_name = _char(data, "plan_name", errors)
+    if plan_name is not None and plan_name not in PLAN_NAMES:
+        errors["plan_name"] = ["Invalid plan name."]
+    payment_details = _payment_details(data.get("payment_details", MISSING), errors)
+    if errors:
+        raise ValidationError(errors)
+    return {"plan_name": plan_name, "payment_details": payment_details}
+
+
+def _payment_details(data, parent_errors: dict):
+    if data is MISSING or data is None:
+        parent_errors["payment_details"] = [_empty_error(data)]
+        return None
+    try:
+        _ensure_mapping(data)
+    except ValidationError as e:
+        parent_errors["payment_details"] = e.detail
+        return None
+
+    errors = {}
+    method_type = _char(data, "method_type", errors, default="credit_card")
+    card_number = _char(data, "card_number", errors, min_length=19, max_length=19)
+    if card_number is not None and luhn_checksum(card_number.replace(" ", "")):
+        errors["card_number"] = ["Invalid card number"]
+    expiration_date = _expiration_date(data.get("expiration_date", MISSING), errors)
+    cvc = _char(data, "cvc", errors, min_length=3, max_length=4)
+    if cvc is not None and not cvc.isdigit():
+        errors["cvc"] = ["CVC must contain only digits."]
+
+    if errors:
+        parent_errors["payment_details"] = errors
+        return None
+    return {
+        "method_type": method_type,
+        "card_number": card_number,
+        "expiration_date": expiration_date,
+        "cvc": cvc,
+    }
+
+
+def _user_id(value, errors: dict):
+    if value is MISSING or value is None:
+        errors["user_id"] = [_empty_error(value)]
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        errors["user_id"] = [ErrorDetail(INVALID_INTEGER, code="invalid")]
+        return None
+    return value
+
+
+def _ensure_mapping(data):
+    if not isinstance(data, Mapping):
+        message = NOT_A_DICT.format(datatype=type(data).__name__)
+        raise ValidationError(
+            {api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail(message, code="invalid")]}
+        )
+
+
+def _empty_error(value) -> ErrorDetail:
+    if value is MISSING:
+        return ErrorDetail(REQUIRED, code="required")
+    return ErrorDetail(NULL, code="null")
+
+
+def _char(
+    data: Mapping,
+    name: str,
+    errors: dict,
+    default=MISSING,
+    min_length: int = None,
+    max_length: int = None,
+):
+    """CharField(trim_whitespace=True) 검증. 오류가 있으면 errors 에 기록하고 None 을 돌려준다."""
+    value = data.get(name, MISSING)
+    if value is MISSING:
+        if default is MISSING:
+            errors[name] = [ErrorDetail(REQUIRED, code="required")]
+            return None
+        return default
+    if value == "" or str(value).strip() == "":
+        errors[name] = [ErrorDetail(BLANK, code="blank")]
+        return None
+    if value is None:
+        errors[name] = [ErrorDetail(NULL, code="null")]
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        errors[name] = [ErrorDetail(NOT_A_STRING, code="invalid")]
+        return None
+
+    value = str(value).strip()
+    messages = []
+    if max_length is not None and len(value) > max_length:
+        messages.append(
+            ErrorDetail(MAX_LENGTH.format(max_length=max_length), code="max_length")
+        )
+    if min_length is not None and len(value) < min_length:
+        messages.append(
+            ErrorDetail(MIN_LENGTH.format(min_length=min_length), code="min_length")
+        )
+    if messages:
+        errors[name] = messages
+        return None
+    return value
+
+
+def _expiration_date(value, errors: dict):
+    if value is MISSING or value is None:
+        errors["expiration_date"] = [_empty_error(value)]
+        return None
+    if isinstance(value, datetime):
+        errors["expiration_date"] = [ErrorDetail(DATETIME_NOT_DATE, code="datetime")]
+        return None
+    if isinstance(value, date):
+        parsed = value
+    else:
+        match = EXPIRATION_DATE.fullmatch(value) if isinstance(value, str) else None
+        if match is None:
+            message = INVALID_DATE.format(format=EXPIRATION_DATE_FORMAT)
+            errors["expiration_date"] = [ErrorDetail(message, code="invalid")]
+            return None
+        year = int(match.group(2))
+        year += 2000 if year <= 68 else 1900
+        parsed = date(year, int(match.group(1)), 1)
+
+    # NOTE: 만료 월의 마지막 날 0시를 지나면 만료된 것으로 본다. (PaymentDetailsSerializer 와 같다)
+    if is_expired(parsed):
+        errors["expiration_date"] = ["The card's expiration date has passed."]
+        return None
+    return parsed
+
+
+def is_expired(expiration_date: date) -> bool:
+    last_day_of_month = calendar.monthrange(
+        expiration_date.year, expiration_date.month
+    )[1]
+    return (
+        datetime(expiration_date.year, expiration_date.month, last_day_of_month)
+        < datetime.now()
+    )
+
+
+def luhn_checksum(card_number: str) -> int:
+    """숫자가 아닌 문자는 건너뛰고 Luhn 체크섬을 계산한다. 0 이면 올바른 번호다."""
+    checksum = 0
+    double = False
+    for char in reversed(card_number):
+        if not char.isdigit():
+            continue
+        digit = int(char)
+        checksum += LUHN_DOUBLED[digit] if double else digit
+        double = not double
+    return checksum % 10
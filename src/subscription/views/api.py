@@ -1,31 +1,130 @@
+import functools
+import hashlib
+import json
+import logging
+import math
+from typing import Callable
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
+from subscription import authentication, validators
+from subscription.adapters import finance_export
+from subscription.adapters.payment_gateway import PaymentGatewayUnavailable
 from subscription.domain import commands
-from subscription.serializers import SubscriptionRequestSerializer
-from subscription.service_layer import message_bus
-from subscription.service_layer.services import SubscriptionService
-from subscription.service_layer.unit_of_work import DjangoUnitOfWork
+from subscription.service_layer import idempotency, message_bus, queries
+from subscription.service_layer.unit_of_work import (
+    AbstractUnitOfWork,
+    DjangoUnitOfWork,
+)
+
+logger = logging.getLogger(__name__)
+
+# NOTE: 응답은 사용자별이므로 공유 캐시에 두지 않고, 클라이언트는 매번 ETag 로 확인한다.
+PRIVATE_CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+
+def account_etag(request, *args, **kwargs):
+    """사용자 버전과 URL 로 만든 강한 ETag. 버전 조회는 기본키 한 번이다."""
+    version = queries.account_version(request.user.id)
+    value = f"{request.user.id}:{version}:{request.get_full_path()}"
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+def idempotent(view_action):
+    """Idempotency-Key 헤더가 있으면 같은 키의 재요청에 처음 응답을 그대로 돌려준다.
+
+    같은 키가 처리 중이면 409, 다른 요청에 쓰인 키면 422 를 돌려준다. 5xx 응답이나 예외는 저장하지
+    않으므로 같은 키로 다시 시도할 수 있다.
+    """
+
+    @functools.wraps(view_action)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return view_action(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"success": False, "message": "Idempotency-Key is too long"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not request.user.is_authenticated:
+            # NOTE: 키는 사용자별로 저장하므로 익명 요청에는 쓸 수 없다.
+            return Response(
+                {
+                    "success": False,
+                    "message": "Idempotency-Key requires authentication",
+                },
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        store = idempotency.IdempotencyStore()
+        user_id = request.user.id
+        request_hash = idempotency.request_hash(
+            request.method, request.path, request.body
+        )
+        try:
+            replay = store.begin(user_id, key, request_hash)
+        except idempotency.IdempotencyKeyInProgress as e:
+            return Response(
+                {"success": False, "message": str(e)},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+        except idempotency.IdempotencyKeyMismatch as e:
+            return Response(
+                {"success": False, "message": str(e)},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if replay is not None:
+            return Response(
+                replay.body,
+                status=replay.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        try:
+            # NOTE: 응답을 명령과 같은 트랜잭션에 기록한다. 따로 기록하면 명령만 커밋되고 기록이
+            # 빠졌을 때 재요청이 명령을 한 번 더 실행한다.
+            with transaction.atomic():
+                response = view_action(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    store.complete(
+                        user_id, key, request_hash, response.status_code, response.data
+                    )
+        except Exception:
+            store.release(user_id, key)
+            raise
+        if response.status_code >= 500:
+            store.release(user_id, key)
+        return response
+
+    return wrapper
 
 
 class SubscriptionViewSet(viewsets.ViewSet):
-    uow = DjangoUnitOfWork()
-    subscription_service = SubscriptionService(uow)
+    # NOTE: 유닛 오브 워크는 identity map 과 트랜잭션 상태를 들고 있어 스레드/요청 사이에 공유하면
+    # 안 된다. 요청마다 uow_factory 로 새로 만든다. as_view(uow_factory=...) 로 바꿀 수 있다.
+    uow_factory: Callable[[], AbstractUnitOfWork] = DjangoUnitOfWork
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.uow = self.uow_factory()
 
     @action(detail=False, methods=["post"], url_path="subscribe")
+    @idempotent
     def subscribe(self, request):
-        serializer = SubscriptionRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-
-        valid_data = serializer.validated_data
+        cmd = validators.create_subscription_command(request.user.id, request.data)
 
         try:
-            cmd = commands.CreateSubscription(
-                user_id=request.user.id,
-                plan_name=valid_data["plan_name"],
-                payment_details=valid_data["payment_details"],
-            )
             results = message_bus.handle(cmd, self.uow)
             result = results.pop(0)
         except ValueError as e:
@@ -33,10 +132,20 @@ class SubscriptionViewSet(viewsets.ViewSet):
                 {"success": False, "message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except IntegrityError:
+            # NOTE: 동시에 들어온 요청이 먼저 활성 구독을 만든 경우
+            return Response(
+                {
+                    "success": False,
+                    "message": "User already has an active subscription",
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
 
         return Response(result, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"], url_path="cancel")
+    @idempotent
     def cancel(self, request):
         try:
             results = message_bus.handle(
@@ -52,6 +161,7 @@ class SubscriptionViewSet(viewsets.ViewSet):
         return Response(result, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"], url_path="renew")
+    @idempotent
     def renew(self, request):
         try:
             results = message_bus.handle(
@@ -63,16 +173,34 @@ class SubscriptionViewSet(viewsets.ViewSet):
                 {"success": False, "message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except IntegrityError:
+            # NOTE: 동시에 들어온 요청이 먼저 활성 구독을 만든 경우
+            return Response(
+                {
+                    "success": False,
+                    "message": "User already has an active subscription",
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        except PaymentGatewayUnavailable as e:
+            # NOTE: 게이트웨이 장애 시 워커를 잡고 기다리지 않고 클라이언트에게 재시도를 맡긴다.
+            return Response(
+                {"success": False, "message": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": e.retry_after_header},
+            )
 
         return Response(result, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"], url_path="change-plan")
+    @idempotent
     def change(self, request):
         try:
             results = message_bus.handle(
                 commands.ChangeSubscriptionPlan(
                     user_id=request.user.id,
                     new_plan_name=request.data["plan_name"],
+                    attempt_key=request.headers.get("Idempotency-Key"),
                 ),
                 self.uow,
             )
@@ -83,5 +211,185 @@ class SubscriptionViewSet(viewsets.ViewSet):
                 {"success": False, "message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except IntegrityError:
+            # NOTE: 동시에 들어온 요청이 먼저 활성 구독을 만든 경우
+            return Response(
+                {
+                    "success": False,
+                    "message": "User already has an active subscription",
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        except PaymentGatewayUnavailable as e:
+            # NOTE: 게이트웨이 장애 시 워커를 잡고 기다리지 않고 클라이언트에게 재시도를 맡긴다.
+            return Response(
+                {"success": False, "message": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": e.retry_after_header},
+            )
 
         return Response(result, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-subscribe",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_subscribe(self, request):
+        """여러 사용자를 한 요청으로 구독시킨다. 항목별 결과를 NDJSON 으로 스트리밍한다.
+
+        검증은 먼저 끝내고, 구독은 BULK_SUBSCRIBE_CHUNK_SIZE 개씩 응답을 보내면서 처리한다.
+        """
+        commands_, errors = validators.validate_bulk_subscription_request(
+            request.data, settings.BULK_SUBSCRIBE_MAX_ITEMS
+        )
+        existing = queries.existing_user_ids(cmd.user_id for _, cmd in commands_)
+        valid = {}
+        for index, cmd in commands_:
+            if cmd.user_id in existing:
+                valid[index] = cmd
+            else:
+                errors[index] = {"user_id": [f"User {cmd.user_id} does not exist."]}
+
+        return StreamingHttpResponse(
+            self._bulk_subscribe_lines(sorted([*valid, *errors]), valid, errors),
+            content_type="application/x-ndjson",
+        )
+
+    def _bulk_subscribe_lines(self, indexes, valid, errors):
+        chunk_size = settings.BULK_SUBSCRIBE_CHUNK_SIZE
+        for start in range(0, len(indexes), chunk_size):
+            chunk = indexes[start : start + chunk_size]
+            subscribing = [index for index in chunk if index in valid]
+            results = dict(
+                zip(
+                    subscribing,
+                    self._subscribe_chunk([valid[index] for index in subscribing]),
+                )
+            )
+            for index in chunk:
+                if index in errors:
+                    outcome = {
+                        "index": index,
+                        "success": False,
+                        "errors": errors[index],
+                    }
+                else:
+                    outcome = {
+                        "index": index,
+                        "user_id": valid[index].user_id,
+                        **results[index],
+                    }
+                yield json.dumps(outcome) + "\n"
+
+    def _subscribe_chunk(self, commands_):
+        if not commands_:
+            return []
+        try:
+            return message_bus.handle(
+                commands.CreateSubscriptions(commands_), self.uow
+            )[0]
+        except IntegrityError:
+            # NOTE: 동시에 들어온 요청이 먼저 활성 구독을 만든 경우. 묶음이 롤백되므로 항목마다 따로
+            # 다시 처리해 그 항목만 실패로 보낸다.
+            logger.warning(
+                "Bulk subscribe chunk failed; retrying item by item", exc_info=True
+            )
+        results = []
+        for cmd in commands_:
+            try:
+                results.extend(
+                    message_bus.handle(commands.CreateSubscriptions([cmd]), self.uow)[0]
+                )
+            except IntegrityError:
+                results.append(
+                    {
+                        "success": False,
+                        "message": "User already has an active subscription",
+                    }
+                )
+        return results
+
+    @action(detail=False, methods=["get"], url_path="current")
+    @method_decorator(condition(etag_func=account_etag))
+    def current(self, request):
+        subscription = queries.current_subscription(request.user.id)
+        if subscription is None:
+            return Response(
+                {"success": False, "message": "User has no subscription"},
+                status=status.HTTP_404_NOT_FOUND,
+                headers=PRIVATE_CACHE_HEADERS,
+            )
+        return Response(subscription, headers=PRIVATE_CACHE_HEADERS)
+
+    @action(detail=False, methods=["get"], url_path="payments")
+    @method_decorator(condition(etag_func=account_etag))
+    def payments(self, request):
+        try:
+            limit = int(request.query_params.get("limit", 20))
+            rows, next_cursor = queries.payment_history(
+                request.user.id, request.query_params.get("cursor"), limit
+            )
+        except ValueError as e:
+            return Response(
+                {"success": False, "message": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        next_url = None
+        if next_cursor:
+            params = request.query_params.copy()
+            params["cursor"] = next_cursor
+            next_url = request.build_absolute_uri(
+                f"{request.path}?{params.urlencode()}"
+            )
+        return Response(
+            {"results": rows, "next": next_url}, headers=PRIVATE_CACHE_HEADERS
+        )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def renewal_backlog(request):
+    # NOTE: 갱신 시각이 지났지만 아직 처리되지 않은 구독 수 (모니터링용 게이지)
+    return Response(queries.renewal_backlog())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_payments(request, export_format):
+    """기간(start 이상 end 미만)과 상태로 거른 결제를 CSV 나 NDJSON 으로 스트리밍한다."""
+    try:
+        start, end = finance_export.period(
+            request.query_params.get("start"), request.query_params.get("end")
+        )
+        statuses = finance_export.statuses(request.query_params.getlist("status"))
+    except ValueError as e:
+        return Response(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # NOTE: 응답을 보내는 동안 서버 측 커서에서 행을 조금씩 읽어 바로 쓴다.
+    rows = queries.payment_export(start, end, statuses)
+    response = StreamingHttpResponse(
+        finance_export.lines(rows, export_format),
+        content_type=finance_export.CONTENT_TYPES[export_format],
+    )
+    filename = f"payments-{start:%Y%m%d}-{end:%Y%m%d}.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def issue_auth_token(request):
+    # NOTE: 세션이나 Basic 인증으로 로그인한 사용자에게 서명 토큰을 발급한다.
+    return Response(
+        {
+            "token": authentication.issue_token(request.user),
+            "expires_in": settings.AUTH_TOKEN_MAX_AGE,
+        }
+    )
@@ -0,0 +1,129 @@
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework import exceptions, serializers, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from subscription import validators
+from subscription.adapters.payment_gateway import PaymentGatewayUnavailable
+from subscription.domain import commands
+from subscription.service_layer import message_bus
+from subscription.service_layer.unit_of_work import AsyncDjangoUnitOfWork
+
+# NOTE: ASGI 로 띄웠을 때 쓰는 async 버전 API. DRF 뷰는 async 를 지원하지 않으므로 Django async
+# 함수 뷰로 만들고, 요청마다 새 AsyncDjangoUnitOfWork 를 쓴다. 응답은 SubscriptionViewSet 과 같다.
+
+
+def authenticated(view):
+    """SubscriptionViewSet 과 같은 DRF 인증 클래스(서명 토큰, 세션, Basic)로 사용자를 정한다.
+
+    인증에 실패하거나 익명이면 401 을 돌려준다. CSRF 는 DRF 와 같이 세션 인증일 때만 확인한다.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            # NOTE: 세션 사용자는 지연 로드되고 DB 를 읽을 수 있으므로 스레드에서 인증한다.
+            user = await sync_to_async(_authenticate)(request)
+        except exceptions.APIException as e:
+            return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+        if not user.is_authenticated:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def _authenticate(request):
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    return Request(request, authenticators=authenticators).user
+
+
+@authenticated
+async def subscribe(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse(
+            {"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        command = validators.create_subscription_command(request.user.id, data)
+    except serializers.ValidationError as e:
+        return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+    return await _dispatch(command)
+
+
+@authenticated
+async def cancel(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    return await _dispatch(commands.CancelSubscription(user_id=request.user.id))
+
+
+@authenticated
+async def renew(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    return await _dispatch(commands.RenewSubscription(user_id=request.user.id))
+
+
+@authenticated
+async def change(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        plan_name = json.loads(request.body or b"{}")["plan_name"]
+    except (ValueError, KeyError):
+        return JsonResponse(
+            {"plan_name": ["This field is required."]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return await _dispatch(
+        commands.ChangeSubscriptionPlan(
+            user_id=request.user.id,
+            new_plan_name=plan_name,
+            attempt_key=request.headers.get("Idempotency-Key"),
+        )
+    )
+
+
+async def _dispatch(command: commands.Command) -> JsonResponse:
+    try:
+        results = await message_bus.ahandle(command, AsyncDjangoUnitOfWork())
+    except ValueError as e:
+        return JsonResponse(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    except IntegrityError:
+        # NOTE: 동시에 들어온 요청이 먼저 활성 구독을 만든 경우
+        return JsonResponse(
+            {
+                "success": False,
+                "message": "User already has an active subscription",
+            },
+            status=status.HTTP_409_CONFLICT,
+        )
+    except PaymentGatewayUnavailable as e:
+        response = JsonResponse(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        response["Retry-After"] = e.retry_after_header
+        return response
+
+    return JsonResponse(results[0], status=status.HTTP_200_OK)
@@ -1,5 +1,67 @@
-from django.shortcuts import render
+import json
 
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
 
+from subscription.adapters import fragment_cache
+from subscription.adapters.catalog import plan_catalog
+
+
+def pricing_fragment() -> fragment_cache.Fragment:
+    # NOTE: 요금제 페이지는 사용자와 무관하므로 플랜 카탈로그 버전마다 한 번만 렌더링한다.
+    return fragment_cache.get_or_build(
+        "pricing", plan_catalog.version, render_pricing_page
+    )
+
+
+def plan_list_fragment() -> fragment_cache.Fragment:
+    return fragment_cache.get_or_build("plans", plan_catalog.version, render_plan_list)
+
+
+def render_pricing_page() -> bytes:
+    prices = {plan.name.value: f"{plan.price:.0f}" for plan in plan_catalog.list()}
+    return render_to_string("subscription.html", {"prices": prices}).encode()
+
+
+def render_plan_list() -> bytes:
+    plans = sorted(plan_catalog.list(), key=lambda plan: plan.price)
+    return json.dumps(
+        [
+            {
+                "id": str(plan.id),
+                "name": plan.name.value,
+                "price": float(plan.price),
+                "payment_cycle": plan.payment_cycle.value,
+                "description": plan.description,
+                "duration_days": plan.duration_days,
+            }
+            for plan in plans
+        ]
+    ).encode()
+
+
+def public_response(body: bytes, content_type: str) -> HttpResponse:
+    response = HttpResponse(body, content_type=content_type)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.PRICING_CACHE_MAX_AGE,
+        stale_while_revalidate=settings.PRICING_CACHE_MAX_AGE,
+    )
+    return response
+
+
+@require_safe
+@condition(etag_func=lambda request: pricing_fragment().etag)
 def pricing_view(request):
-    return render(request, "subscription.html")
+    return public_response(pricing_fragment().body, "text/html; charset=utf-8")
+
+
+@require_safe
+@condition(etag_func=lambda request: plan_list_fragment().etag)
+def plan_list(request):
+    # NOTE: 인증/세션을 거치지 않는 공개 엔드포인트라 DRF 뷰가 아닌 Django 뷰로 둔다.
+    return public_response(plan_list_fragment().body, "application/json")
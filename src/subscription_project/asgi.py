@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'subscription_project.settings')
 
 application = get_asgi_application()
+
+# NOTE: 첫 요청이 플랜 조회 비용을 치르지 않도록 프로세스 시작 시 플랜 카탈로그를 채운다.
+from subscription.adapters.catalog import plan_catalog  # noqa: E402
+
+plan_catalog.warm()
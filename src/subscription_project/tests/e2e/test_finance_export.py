@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from subscription.adapters.repository import DjangoSubscriptionPlanRepository
+from subscription.domain.domain_models import (
+    Payment,
+    PaymentCycle,
+    PaymentMethod,
+    PaymentMethodType,
+    PaymentStatus,
+    PlanName,
+    SubscriptionPlan,
+    SubscriptionStatus,
+    UserSubscription,
+)
+from subscription.service_layer.unit_of_work import DjangoUnitOfWork
+
+
+class FinanceExportTest(TestCase):
+    def setUp(self):
+        # ForceLoginMiddleware 가 admin 으로 로그인시킨다.
+        self.staff = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.login(username="admin", password="password")
+        plan = SubscriptionPlan(
+            name=PlanName.BASIC,
+            price=10.0,
+            duration_days=30,
+            payment_cycle=PaymentCycle.MONTHLY,
+            description="Basic Plan",
+        )
+        DjangoSubscriptionPlanRepository().add(plan)
+        method = PaymentMethod(PaymentMethodType.CREDIT_CARD, {})
+
+        # NOTE: 핸들러와 같은 경로(도메인 -> 유닛 오브 워크)로 저장해야 실제 상태 값이 들어간다.
+        uow = DjangoUnitOfWork()
+        with uow:
+            uow.payment_methods.add(method)
+            for i, (day, payment_status) in enumerate(
+                [
+                    (1, PaymentStatus.SUCCESS),
+                    (15, PaymentStatus.FAILED),
+                    (31, PaymentStatus.SUCCESS),
+                    (31, PaymentStatus.REFUNDED),
+                ]
+            ):
+                user = User.objects.create_user(
+                    f"user{i}", f"user{i}@example.com", "pw"
+                )
+                subscription = UserSubscription(
+                    user_id=user.id,
+                    plan=plan,
+                    start_date=date(2024, 5, day),
+                    end_date=date(2024, 5, day) + timedelta(days=30),
+                    status=SubscriptionStatus.ACTIVE,
+                )
+                uow.user_subscriptions.add(subscription)
+                uow.payments.add(
+                    Payment(
+                        subscription=subscription,
+                        payment_method=method,
+                        amount=10.0,
+                        date=datetime(2024, 5, day, 20 + i, tzinfo=timezone.utc),
+                        status=payment_status,
+                    )
+                )
+            # 기간 밖 결제
+            uow.payments.add(
+                Payment(
+                    subscription=subscription,
+                    payment_method=method,
+                    amount=10.0,
+                    date=datetime(2024, 6, 1, tzinfo=timezone.utc),
+                    status=PaymentStatus.SUCCESS,
+                )
+            )
+            uow.commit()
+
+    def export(self, export_format, **params):
+        return self.client.get(
+            reverse("finance-payment-export", args=[export_format]), params
+        )
+
+    def test_streams_a_month_as_csv_in_one_query(self):
+        response = self.export("csv", start="2024-05-01", end="2024-06-01")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("payments-20240501-20240601.csv", response["Content-Disposition"])
+
+        with CaptureQueriesContext(connection) as queries:
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(len(queries), 1)
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(
+            [row["username"] for row in rows], [f"user{i}" for i in range(4)]
+        )
+        self.assertEqual(rows[0]["amount"], "10.00")
+        self.assertEqual(rows[0]["plan_name"], "basic")
+        self.assertEqual(rows[0]["payment_method"], "credit_card")
+        self.assertEqual(rows[0]["date"], "2024-05-01T20:00:00+00:00")
+
+    def test_filters_by_status_as_ndjson(self):
+        response = self.export(
+            "ndjson", start="2024-05-01", end="2024-06-01", status="succeeded,refunded"
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.getvalue().splitlines()]
+        self.assertEqual(
+            [line["status"] for line in lines], ["Succeeded", "Succeeded", "refunded"]
+        )
+
+    def test_rejects_invalid_filters(self):
+        for params in (
+            {},
+            {"start": "2024-05"},
+            {"start": "2024-06-01", "end": "2024-05-01"},
+            {"start": "2024-05-01", "status": "paid"},
+        ):
+            with self.subTest(params=params):
+                response = self.export("csv", **params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_is_staff_only(self):
+        self.staff.is_staff = False
+        self.staff.save()
+
+        response = self.export("csv", start="2024-05-01")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_writes_the_export_to_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "payments.ndjson")
+            err = StringIO()
+            call_command(
+                "export_payments",
+                "--start=2024-05-31",
+                "--status=Succeeded",
+                "--format=ndjson",
+                f"--output={path}",
+                stderr=err,
+            )
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual([line["username"] for line in lines], ["user2"])
+        self.assertIn("Exported 1 payments", err.getvalue())
+
+    def test_admin_payment_list_does_not_query_per_row(self):
+        url = reverse("admin:subscription_payment_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, {"status__exact": "failed"})
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(many), len(few))
@@ -2,14 +2,29 @@ import json
 from datetime import date, timedelta
 from unittest import mock
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from freezegun import freeze_time
 from rest_framework import serializers, status
 from rest_framework.test import APITestCase
 
-from subscription.adapters.repository import DjangoSubscriptionPlanRepository
+from subscription import authentication
+from subscription.adapters.models import IdempotencyKey, Payment
+from subscription.adapters.payment_gateway import HttpPaymentGateway
+from subscription.adapters.repository import (
+    DjangoSubscriptionPlanRepository,
+    DjangoUserSubscriptionRepository,
+)
+from subscription.adapters.stub_gateway import StubGatewayServer
 from subscription.domain.domain_models import PaymentCycle, PlanName, SubscriptionPlan
+from subscription.service_layer import idempotency
+from subscription.service_layer.unit_of_work import DjangoUnitOfWork
+from subscription.views.api import SubscriptionViewSet
 
 
 class SubscriptionViewSetTest(APITestCase):
@@ -173,3 +188,492 @@ class SubscriptionViewSetTest(APITestCase):
 
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.assertTrue(response.data["success"])
+
+    def test_plan_change_can_be_retried_after_a_decline(self):
+        server = StubGatewayServer().start()
+        self.addCleanup(server.stop)
+        gateway = HttpPaymentGateway(server.url)
+        self.addCleanup(gateway.pool.close)
+        data = {
+            "plan_name": self.test_plan.name,
+            "payment_details": {
+                "method_type": "credit_card",
+                "card_number": "4242-4242-4242-4242",
+                "expiration_date": "12/25",
+                "cvc": "123",
+            },
+        }
+        with mock.patch(
+            "subscription.adapters.payment_gateway.get_gateway", return_value=gateway
+        ):
+            subscribed = self.client.post(
+                reverse("subscription-subscribe"),
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            self.assertTrue(subscribed.data["success"])
+
+            url = reverse("subscription-change")
+            data = json.dumps({"plan_name": PlanName.PREMIUM.value})
+            server.decline_rate = 1.0
+            declined = self.client.post(url, data=data, content_type="application/json")
+            # 카드를 고친 뒤 다시 시도하면 이전 거절이 재생되지 않고 새로 결제된다.
+            server.decline_rate = 0.0
+            retried = self.client.post(url, data=data, content_type="application/json")
+
+        self.assertFalse(declined.data["success"])
+        self.assertTrue(retried.data["success"])
+        plan_change_keys = [k for k in server.charges if k.startswith("plan-change:")]
+        self.assertEqual(len(plan_change_keys), 2)
+
+    def test_subscribe_twice_is_rejected(self):
+        url = reverse("subscription-subscribe")
+        data = {
+            "plan_name": self.test_plan.name,
+            "payment_details": {
+                "method_type": "credit_card",
+                "card_number": "4242-4242-4242-4242",
+                "expiration_date": "12/25",
+                "cvc": "123",
+            },
+        }
+        self.client.post(url, data=json.dumps(data), content_type="application/json")
+        response = self.client.post(
+            url, data=json.dumps(data), content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data["success"])
+
+    def test_signed_token_authenticates_without_a_session(self):
+        token = self.client.post(reverse("auth-token")).data["token"]
+        self.client.logout()
+
+        with mock.patch(
+            "subscription.middleware.authentication.get_user_by_username"
+        ) as force_login_lookup:
+            response = self.client.post(
+                reverse("subscription-cancel"), HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+        force_login_lookup.assert_not_called()
+        self.assertEqual(
+            response.data["message"],
+            f"User {self.test_user.id} has no active subscription",
+        )
+
+        response = self.client.post(
+            reverse("subscription-cancel"), HTTP_AUTHORIZATION="Bearer invalid"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_each_request_gets_its_own_unit_of_work(self):
+        created = []
+
+        def uow_factory():
+            created.append(DjangoUnitOfWork())
+            return created[-1]
+
+        with mock.patch.object(
+            SubscriptionViewSet, "uow_factory", staticmethod(uow_factory)
+        ):
+            for _ in range(2):
+                self.client.post(reverse("subscription-cancel"))
+
+        self.assertEqual(len(created), 2)
+        self.assertIsNot(created[0], created[1])
+
+    def test_replayed_subscribe_with_idempotency_key_is_not_applied_twice(self):
+        url = reverse("subscription-subscribe")
+        body = json.dumps(
+            {
+                "plan_name": self.test_plan.name,
+                "payment_details": {
+                    "method_type": "credit_card",
+                    "card_number": "4242-4242-4242-4242",
+                    "expiration_date": "12/25",
+                    "cvc": "123",
+                },
+            }
+        )
+        first = self.client.post(
+            url, data=body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="k1"
+        )
+        replay = self.client.post(
+            url, data=body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="k1"
+        )
+
+        self.assertEqual(replay.status_code, status.HTTP_200_OK)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Payment.objects.count(), 1)
+
+        # 같은 키를 다른 요청에 쓰면 거절한다.
+        other = self.client.post(
+            reverse("subscription-cancel"),
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="k1",
+        )
+        self.assertEqual(other.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_command_is_rolled_back_when_the_response_is_not_recorded(self):
+        url = reverse("subscription-subscribe")
+        body = json.dumps(
+            {
+                "plan_name": self.test_plan.name,
+                "payment_details": {
+                    "method_type": "credit_card",
+                    "card_number": "4242-4242-4242-4242",
+                    "expiration_date": "12/25",
+                    "cvc": "123",
+                },
+            }
+        )
+
+        with mock.patch.object(
+            idempotency.IdempotencyStore, "complete", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.client.post(
+                url,
+                data=body,
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="k1",
+            )
+
+        self.assertFalse(Payment.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        # 키가 풀렸으므로 같은 키로 다시 시도하면 처음부터 처리한다.
+        retried = self.client.post(
+            url, data=body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="k1"
+        )
+        self.assertTrue(retried.data["success"])
+        self.assertNotIn("Idempotent-Replayed", retried)
+
+    def test_concurrent_duplicate_is_rejected_while_in_progress(self):
+        url = reverse("subscription-cancel")
+        IdempotencyKey.objects.create(
+            user=self.test_user,
+            key="k1",
+            request_hash=idempotency.request_hash("POST", url, b""),
+            locked_until=timezone.now() + timedelta(seconds=30),
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY="k1")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("Retry-After", response)
+
+    @override_settings(FORCE_LOGIN_USERNAME="missing")
+    def test_idempotency_key_requires_authentication(self):
+        response = self.client.post(
+            reverse("subscription-cancel"), HTTP_IDEMPOTENCY_KEY="k1"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def subscribe(self):
+        with mock.patch("random.choice", return_value=True):
+            self.client.post(
+                reverse("subscription-subscribe"),
+                data=json.dumps(
+                    {
+                        "plan_name": self.test_plan.name,
+                        "payment_details": {
+                            "method_type": "credit_card",
+                            "card_number": "4242-4242-4242-4242",
+                            "expiration_date": "12/25",
+                            "cvc": "123",
+                        },
+                    }
+                ),
+                content_type="application/json",
+            )
+
+    def bulk_subscribe(self, items):
+        response = self.client.post(
+            reverse("subscription-bulk-subscribe"),
+            data=json.dumps({"items": items}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.getvalue().splitlines()]
+
+    def seat(self, user, card_number="4242-4242-4242-4242"):
+        return {
+            "user_id": user.id,
+            "plan_name": self.test_plan.name.value,
+            "payment_details": {
+                "method_type": "credit_card",
+                "card_number": card_number,
+                "expiration_date": "12/25",
+                "cvc": "123",
+            },
+        }
+
+    def test_bulk_subscribe_reports_each_item(self):
+        self.test_user.is_staff = True
+        self.test_user.save()
+        users = [
+            User.objects.create_user(f"seat{i}", f"seat{i}@example.com", "pw")
+            for i in range(3)
+        ]
+
+        lines = self.bulk_subscribe(
+            [
+                self.seat(users[0]),
+                self.seat(users[1], card_number="1234-1234-1234-1234"),
+                self.seat(users[0]),
+                {**self.seat(users[2]), "user_id": 10**6},
+                self.seat(users[2]),
+            ]
+        )
+
+        self.assertEqual([line["index"] for line in lines], [0, 1, 2, 3, 4])
+        self.assertEqual(
+            [line["success"] for line in lines], [True, False, False, False, True]
+        )
+        self.assertIn("card_number", lines[1]["errors"]["payment_details"])
+        self.assertIn("already has an active subscription", lines[2]["message"])
+        self.assertIn("user_id", lines[3]["errors"])
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_bulk_subscribe_runs_a_fixed_number_of_queries(self):
+        self.test_user.is_staff = True
+        self.test_user.save()
+        users = [
+            User.objects.create_user(f"seat{i}", f"seat{i}@example.com", "pw")
+            for i in range(9)
+        ]
+        # 인증 사용자와 플랜 카탈로그를 캐시에 올려 둔다.
+        self.bulk_subscribe([self.seat(users[0])])
+
+        with CaptureQueriesContext(connection) as few:
+            self.bulk_subscribe([self.seat(user) for user in users[1:3]])
+        with CaptureQueriesContext(connection) as many:
+            self.bulk_subscribe([self.seat(user) for user in users[3:]])
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(Payment.objects.count(), 9)
+
+    @override_settings(BULK_SUBSCRIBE_CHUNK_SIZE=2)
+    def test_bulk_subscribe_streams_results_as_chunks_are_processed(self):
+        self.test_user.is_staff = True
+        self.test_user.save()
+        users = [
+            User.objects.create_user(f"seat{i}", f"seat{i}@example.com", "pw")
+            for i in range(3)
+        ]
+
+        response = self.client.post(
+            reverse("subscription-bulk-subscribe"),
+            data=json.dumps({"items": [self.seat(user) for user in users]}),
+            content_type="application/json",
+        )
+        self.assertFalse(Payment.objects.exists())
+
+        first = json.loads(next(response.streaming_content))
+        self.assertEqual(first["index"], 0)
+        self.assertEqual(Payment.objects.count(), 2)
+        rest = [json.loads(line) for line in response.streaming_content]
+        self.assertEqual([line["index"] for line in rest], [1, 2])
+        self.assertEqual(Payment.objects.count(), 3)
+
+    def test_bulk_subscribe_reports_a_lost_race_on_its_own_item(self):
+        self.test_user.is_staff = True
+        self.test_user.save()
+        users = [
+            User.objects.create_user(f"seat{i}", f"seat{i}@example.com", "pw")
+            for i in range(2)
+        ]
+        self.bulk_subscribe([self.seat(users[0])])
+
+        # 동시에 들어온 요청이 활성 구독 확인과 저장 사이에 먼저 구독시킨 경우.
+        with mock.patch.object(
+            DjangoUserSubscriptionRepository,
+            "list_active_by_user_ids",
+            return_value=[],
+        ):
+            lines = self.bulk_subscribe([self.seat(users[0]), self.seat(users[1])])
+
+        self.assertEqual([line["success"] for line in lines], [False, True])
+        self.assertIn("already has an active subscription", lines[0]["message"])
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_bulk_subscribe_is_staff_only(self):
+        response = self.client.post(
+            reverse("subscription-bulk-subscribe"),
+            data=json.dumps({"items": [self.seat(self.test_user)]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_current_subscription_is_revalidated_with_etag(self):
+        url = reverse("subscription-current")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.subscribe()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["plan_name"], self.test_plan.name.value)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        etag = response["ETag"]
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 쓰기가 있으면 버전이 올라가 같은 ETag 로는 304 가 나오지 않는다.
+        self.client.post(reverse("subscription-cancel"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_payment_history_is_paginated_with_a_cursor(self):
+        self.subscribe()
+        with mock.patch("random.choice", return_value=True):
+            self.client.post(
+                reverse("subscription-change"),
+                data=json.dumps({"plan_name": PlanName.PREMIUM.value}),
+                content_type="application/json",
+            )
+        self.assertEqual(Payment.objects.count(), 2)
+        url = reverse("subscription-payments")
+
+        first = self.client.get(url, {"limit": 1})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data["results"]), 1)
+        self.assertIsNotNone(first.data["next"])
+
+        second = self.client.get(first.data["next"])
+        self.assertEqual(len(second.data["results"]), 1)
+        self.assertIsNone(second.data["next"])
+        self.assertNotEqual(
+            first.data["results"][0]["id"], second.data["results"][0]["id"]
+        )
+        self.assertEqual(
+            self.client.get(url, {"cursor": "invalid"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class AsyncSubscriptionViewTest(TestCase):
+    def setUp(self):
+        self.test_user = User.objects.create_user(
+            "admin", "admin@example.com", "password"
+        )
+        DjangoSubscriptionPlanRepository().add(
+            plan=SubscriptionPlan(
+                name=PlanName.BASIC,
+                price=9.99,
+                duration_days=30,
+                payment_cycle=PaymentCycle.MONTHLY,
+                description="Test Plan",
+            )
+        )
+        self.data = {
+            "plan_name": PlanName.BASIC.value,
+            "payment_details": {
+                "method_type": "credit_card",
+                "card_number": "4242-4242-4242-4242",
+                "expiration_date": "12/25",
+                "cvc": "123",
+            },
+        }
+
+    async def test_subscribe_and_cancel(self):
+        response = await self.async_client.post(
+            reverse("async-subscription-subscribe"),
+            data=json.dumps(self.data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["success"])
+
+        response = await self.async_client.post(
+            reverse("async-subscription-subscribe"),
+            data=json.dumps(self.data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await self.async_client.post(reverse("async-subscription-cancel"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["success"])
+
+    async def test_renew(self):
+        server = StubGatewayServer().start()
+        self.addCleanup(server.stop)
+        gateway = HttpPaymentGateway(server.url)
+        self.addCleanup(gateway.pool.close)
+        response = await self.async_client.post(
+            reverse("async-subscription-subscribe"),
+            data=json.dumps(self.data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with freeze_time(date.today() + timedelta(days=31)), mock.patch(
+            "subscription.adapters.payment_gateway.get_gateway", return_value=gateway
+        ):
+            response = await self.async_client.post(reverse("async-subscription-renew"))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.json()["success"])
+            uow = DjangoUnitOfWork()
+            subscription = await sync_to_async(
+                uow.user_subscriptions.get_active_subscription_by_user_id
+            )(self.test_user.id)
+            self.assertEqual(subscription.end_date, date.today() + timedelta(days=30))
+
+    async def test_subscribe_with_invalid_card(self):
+        self.data["payment_details"]["card_number"] = "1234-1234-1234-1234"
+        response = await self.async_client.post(
+            reverse("async-subscription-subscribe"),
+            data=json.dumps(self.data),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("card_number", response.json()["payment_details"])
+
+    @override_settings(FORCE_LOGIN_USERNAME="missing")
+    async def test_anonymous_request_is_rejected(self):
+        response = await self.async_client.post(
+            reverse("async-subscription-subscribe"),
+            data=json.dumps(self.data),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_bearer_token_without_csrf_token(self):
+        token_user = await sync_to_async(User.objects.create_user)(
+            "token-user", "token@example.com", "password"
+        )
+        client = AsyncClient(enforce_csrf_checks=True)
+        headers = {"Authorization": f"Bearer {authentication.issue_token(token_user)}"}
+
+        response = await client.post(
+            reverse("async-subscription-subscribe"),
+            data=json.dumps(self.data),
+            content_type="application/json",
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # 구독은 강제 로그인 사용자가 아니라 토큰 사용자에게 만들어진다.
+        response = await client.post(
+            reverse("async-subscription-cancel"), headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.post(reverse("async-subscription-cancel"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_invalid_bearer_token_is_rejected(self):
+        response = await self.async_client.post(
+            reverse("async-subscription-cancel"),
+            headers={"Authorization": "Bearer invalid"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,141 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase
+from freezegun import freeze_time
+
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import (
+    CurrentSubscription,
+    Payment,
+    SubscriptionPlan,
+    UserSubscription,
+)
+from subscription.domain import commands
+from subscription.domain.domain_models import PaymentCycle, PlanName, SubscriptionStatus
+from subscription.domain.domain_models import UserSubscription as DomainUserSubscription
+from subscription.service_layer import message_bus
+from subscription.service_layer.unit_of_work import AsyncDjangoUnitOfWork
+
+
+class AsyncUnitOfWorkTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "testuser", "test@example.com", "testpassword"
+        )
+        for name, price in [(PlanName.BASIC, "10.00"), (PlanName.PREMIUM, "20.00")]:
+            SubscriptionPlan.objects.create(
+                name=name.value,
+                price=price,
+                payment_cycle=PaymentCycle.MONTHLY.value,
+                description="Plan",
+                duration=timedelta(days=30),
+            )
+        plan_catalog.warm()
+
+    async def subscribe(self):
+        return await message_bus.ahandle(
+            commands.CreateSubscription(
+                user_id=self.user.id,
+                plan_name=PlanName.BASIC.value,
+                payment_details={"method_type": "point"},
+            ),
+            AsyncDjangoUnitOfWork(),
+        )
+
+    async def test_subscribe(self):
+        [result] = await self.subscribe()
+
+        self.assertTrue(result["success"])
+        self.assertEqual(
+            await UserSubscription.objects.filter(
+                user=self.user, status=SubscriptionStatus.ACTIVE.value
+            ).acount(),
+            1,
+        )
+        self.assertEqual(await Payment.objects.acount(), 1)
+        current = await CurrentSubscription.objects.aget(user=self.user)
+        self.assertEqual(current.plan_name, PlanName.BASIC.value)
+
+    async def test_subscribe_twice_is_rejected(self):
+        await self.subscribe()
+        with self.assertRaises(ValueError):
+            await self.subscribe()
+
+    async def test_renew_and_change_plan(self):
+        await self.subscribe()
+        renew_date = date.today() + timedelta(days=31)
+        with freeze_time(renew_date), mock.patch("random.choice", return_value=True):
+            [renewed] = await message_bus.ahandle(
+                commands.RenewSubscription(user_id=self.user.id),
+                AsyncDjangoUnitOfWork(),
+            )
+            [changed] = await message_bus.ahandle(
+                commands.ChangeSubscriptionPlan(
+                    user_id=self.user.id, new_plan_name=PlanName.PREMIUM.value
+                ),
+                AsyncDjangoUnitOfWork(),
+            )
+
+        self.assertTrue(renewed["success"])
+        self.assertTrue(changed["success"])
+        active = await UserSubscription.objects.select_related("plan").aget(
+            user=self.user, status=SubscriptionStatus.ACTIVE.value
+        )
+        self.assertEqual(active.plan.name, PlanName.PREMIUM.value)
+
+    async def test_writes_are_discarded_when_the_block_fails(self):
+        uow = AsyncDjangoUnitOfWork()
+        with self.assertRaises(RuntimeError):
+            async with uow:
+                plan = await uow.subscription_plans.aget(PlanName.BASIC.value)
+                uow.user_subscriptions.add(
+                    DomainUserSubscription(
+                        user_id=self.user.id,
+                        plan=plan,
+                        start_date=date.today(),
+                        end_date=date.today() + timedelta(days=30),
+                        status=SubscriptionStatus.ACTIVE,
+                    )
+                )
+                raise RuntimeError
+
+        self.assertEqual(await UserSubscription.objects.acount(), 0)
+
+    async def test_lookups_use_the_identity_map(self):
+        await self.subscribe()
+        uow = AsyncDjangoUnitOfWork()
+        async with uow:
+            subscription = (
+                await uow.user_subscriptions.aget_active_subscription_by_user_id(
+                    self.user.id
+                )
+            )
+            self.assertIs(
+                await uow.user_subscriptions.aget(subscription.id), subscription
+            )
+            self.assertIs(
+                await uow.user_subscriptions.aget_active_subscription_by_user_id(
+                    self.user.id
+                ),
+                subscription,
+            )
+
+    async def test_conflicting_write_surfaces_on_flush(self):
+        await self.subscribe()
+        uow = AsyncDjangoUnitOfWork()
+        with self.assertRaises(IntegrityError):
+            async with uow:
+                plan = await uow.subscription_plans.aget(PlanName.BASIC.value)
+                # 다른 요청이 먼저 활성 구독을 만든 상황
+                uow.user_subscriptions.add(
+                    DomainUserSubscription(
+                        user_id=self.user.id,
+                        plan=plan,
+                        start_date=date.today(),
+                        end_date=date.today() + timedelta(days=30),
+                        status=SubscriptionStatus.ACTIVE,
+                    )
+                )
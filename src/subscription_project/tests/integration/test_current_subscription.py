@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import (
+    CurrentSubscription,
+    SubscriptionPlan,
+    UserSubscription,
+)
+from subscription.domain import commands
+from subscription.domain.domain_models import (
+    PaymentCycle,
+    PlanName,
+    SubscriptionStatus,
+)
+from subscription.service_layer import message_bus, queries
+from subscription.service_layer.unit_of_work import DjangoUnitOfWork
+
+
+class CurrentSubscriptionProjectionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "testuser", "test@example.com", "testpassword"
+        )
+        for name, price in [(PlanName.BASIC, "10.00"), (PlanName.PREMIUM, "20.00")]:
+            SubscriptionPlan.objects.create(
+                name=name.value,
+                price=price,
+                payment_cycle=PaymentCycle.MONTHLY.value,
+                description="Plan",
+                duration=timedelta(days=30),
+            )
+        plan_catalog.warm()
+
+    def subscribe(self, plan_name=PlanName.BASIC.value):
+        message_bus.handle(
+            commands.CreateSubscription(
+                user_id=self.user.id,
+                plan_name=plan_name,
+                payment_details={"method_type": "point"},
+            ),
+            DjangoUnitOfWork(),
+        )
+
+    def test_handlers_keep_the_projection_up_to_date(self):
+        self.subscribe()
+        with self.assertNumQueries(1):
+            current = queries.current_subscription(self.user.id)
+        self.assertEqual(current["plan_name"], PlanName.BASIC.value)
+        self.assertEqual(current["status"], SubscriptionStatus.ACTIVE.value)
+
+        with mock.patch("random.choice", return_value=True):
+            message_bus.handle(
+                commands.ChangeSubscriptionPlan(
+                    user_id=self.user.id, new_plan_name=PlanName.PREMIUM.value
+                ),
+                DjangoUnitOfWork(),
+            )
+        current = queries.current_subscription(self.user.id)
+        self.assertEqual(current["plan_name"], PlanName.PREMIUM.value)
+        self.assertEqual(str(current["price"]), "20.00")
+
+        message_bus.handle(
+            commands.CancelSubscription(user_id=self.user.id), DjangoUnitOfWork()
+        )
+        current = queries.current_subscription(self.user.id)
+        self.assertEqual(current["status"], SubscriptionStatus.CANCELED.value)
+
+    def test_projection_is_read_outside_the_unit_of_work_tracking(self):
+        self.subscribe()
+        uow = DjangoUnitOfWork()
+        with uow:
+            subscription = uow.user_subscriptions.get_active_subscription_by_user_id(
+                self.user.id
+            )
+            current = queries.current_subscription(self.user.id)
+
+            self.assertEqual(current["subscription_id"], subscription.id)
+            self.assertEqual(list(uow.current_subscriptions.seen), [])
+
+    def test_rebuild_matches_the_handler_maintained_projection(self):
+        self.subscribe()
+        expected = queries.current_subscription(self.user.id)
+        # 예전 구독 이력이 있어도 활성 구독이 현재 구독이다.
+        UserSubscription.objects.create(
+            user=self.user,
+            plan=SubscriptionPlan.objects.get(name=PlanName.PREMIUM.value),
+            start_date=date.today() + timedelta(days=1),
+            end_date=date.today() + timedelta(days=2),
+            status=SubscriptionStatus.CANCELED.value,
+        )
+        CurrentSubscription.objects.all().delete()
+
+        call_command("rebuild_current_subscriptions", stdout=mock.MagicMock())
+
+        self.assertEqual(queries.current_subscription(self.user.id), expected)
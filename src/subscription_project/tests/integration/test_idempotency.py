@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase
+from freezegun import freeze_time
+
+from subscription.adapters.models import IdempotencyKey
+from subscription.service_layer import idempotency
+from subscription.service_layer.idempotency import (
+    IdempotencyKeyInProgress,
+    IdempotencyStore,
+    StoredResponse,
+)
+
+
+class IdempotencyStoreTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("testuser", "test@example.com", "pw")
+        self.store = IdempotencyStore(ttl=3600, lock_seconds=60, use_cache=False)
+
+    def test_completed_response_is_replayed(self):
+        self.assertIsNone(self.store.begin(self.user.id, "key", "hash"))
+        with self.assertRaises(IdempotencyKeyInProgress):
+            self.store.begin(self.user.id, "key", "hash")
+
+        self.store.complete(self.user.id, "key", "hash", 200, {"success": True})
+
+        self.assertEqual(
+            self.store.begin(self.user.id, "key", "hash"),
+            StoredResponse(200, {"success": True}),
+        )
+
+    def test_abandoned_and_expired_keys_are_taken_over(self):
+        self.store.begin(self.user.id, "key", "hash")
+        with freeze_time(timedelta(seconds=61)):
+            # 처리하던 요청이 응답 없이 사라졌다.
+            self.assertIsNone(self.store.begin(self.user.id, "key", "hash"))
+
+        self.store.complete(self.user.id, "key", "hash", 200, {})
+        with freeze_time(timedelta(hours=2)):
+            self.assertIsNone(self.store.begin(self.user.id, "key", "other"))
+
+    def test_only_a_duplicate_key_counts_as_an_existing_row(self):
+        # NOTE: NOT NULL 위반을 "이미 있는 키" 로 보면 없는 행을 찾아 다시 선점하기를 반복한다.
+        with self.assertRaises(IntegrityError):
+            self.store.begin(None, "key", "hash")
+
+    def test_released_key_can_be_retried(self):
+        self.store.begin(self.user.id, "key", "hash")
+        self.store.release(self.user.id, "key")
+
+        self.assertIsNone(self.store.begin(self.user.id, "key", "hash"))
+
+    def test_cached_replay_skips_the_database(self):
+        store = IdempotencyStore(ttl=3600, lock_seconds=60, use_cache=True)
+        store.begin(self.user.id, "cached-key", "hash")
+        with self.captureOnCommitCallbacks(execute=True):
+            store.complete(self.user.id, "cached-key", "hash", 200, {"success": True})
+
+        with self.assertNumQueries(0):
+            replay = store.begin(self.user.id, "cached-key", "hash")
+        self.assertEqual(replay.status_code, 200)
+
+    def test_purge_expired(self):
+        self.store.begin(self.user.id, "old", "hash")
+        with freeze_time(timedelta(hours=2)):
+            self.store.begin(self.user.id, "new", "hash")
+            self.assertEqual(idempotency.purge_expired(), 1)
+
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"]
+        )
@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from subscription.adapters import subscription_import
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import (
+    AccountVersion,
+    CurrentSubscription,
+    Payment,
+    SubscriptionPlan,
+    UserSubscription,
+)
+from subscription.adapters.repository import DjangoPaymentRepository
+from subscription.domain.domain_models import PaymentCycle, PaymentStatus, PlanName
+
+RECORDS = [
+    {"type": "user", "username": "legacy1", "email": "legacy1@example.com"},
+    {"type": "user", "username": "legacy2"},
+    {
+        "type": "subscription",
+        "external_id": "s1",
+        "username": "legacy1",
+        "plan_name": "basic",
+        "start_date": "2024-05-01",
+        "end_date": "2024-05-31",
+        "status": "expired",
+    },
+    {
+        "type": "subscription",
+        "external_id": "s2",
+        "username": "legacy1",
+        "plan_name": "basic",
+        "start_date": "2024-05-31",
+        "end_date": "2024-06-30",
+        "status": "active",
+    },
+    {
+        "type": "payment",
+        "external_id": "p1",
+        "subscription_id": "s1",
+        "amount": "10.00",
+        "date": "2024-05-01T09:00:00",
+        "status": "succeeded",
+    },
+    {
+        "type": "payment",
+        "external_id": "p2",
+        "subscription_id": "s2",
+        "amount": "10.00",
+        "date": "2024-05-31T09:00:00",
+        "status": "succeeded",
+    },
+    # 거절된다.
+    {"type": "subscription", "external_id": "s3", "username": "legacy2"},
+    {"type": "refund", "external_id": "r1"},
+    # 구독이 없는 결제는 합칠 때 건너뛴다.
+    {
+        "type": "payment",
+        "external_id": "p3",
+        "subscription_id": "missing",
+        "amount": "10.00",
+        "date": "2024-05-31T09:00:00",
+        "status": "succeeded",
+    },
+]
+
+
+class ImportSubscriptionsTest(TestCase):
+    def setUp(self):
+        SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        plan_catalog.warm()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, records):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", newline="") as f:
+            if name.endswith(".csv"):
+                fields = sorted({key for record in records for key in record})
+                writer = csv.DictWriter(f, fields)
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+        return path
+
+    def import_file(self, path, *args):
+        out = StringIO()
+        call_command("import_subscriptions", path, *args, stdout=out)
+        return out.getvalue()
+
+    def assertImported(self):
+        user = User.objects.get(username="legacy1")
+        self.assertFalse(user.has_usable_password())
+        self.assertTrue(User.objects.filter(username="legacy2").exists())
+        self.assertEqual(UserSubscription.objects.filter(user=user).count(), 2)
+        active = UserSubscription.objects.get(user=user, status="active")
+        self.assertIsNotNone(active.next_renewal_at)
+        self.assertEqual(Payment.objects.count(), 2)
+        # 적재한 결제를 리포지토리가 도메인 상태로 읽을 수 있어야 한다.
+        payment = DjangoPaymentRepository().get(subscription_import.payment_id("p1"))
+        self.assertEqual(payment.status, PaymentStatus.SUCCESS)
+        current = CurrentSubscription.objects.get(user=user)
+        self.assertEqual(current.subscription_id, active.id)
+        self.assertEqual(current.end_date, date(2024, 6, 30))
+        self.assertTrue(AccountVersion.objects.filter(user=user).exists())
+
+    def test_csv_and_ndjson_imports_are_merged(self):
+        for name in ("legacy.csv", "legacy.ndjson"):
+            with self.subTest(name=name):
+                path = self.write(name, RECORDS)
+
+                output = self.import_file(path)
+
+                self.assertImported()
+                self.assertIn("skipped 0 subscriptions and 1 payments", output)
+                with open(f"{path}.rejects.ndjson") as f:
+                    rejected = [json.loads(line) for line in f]
+                self.assertEqual([reject["line"] for reject in rejected], [7, 8])
+                self.assertIsNone(subscription_import.checkpoint())
+
+    def test_interrupted_import_resumes_after_the_checkpoint(self):
+        path = self.write("legacy.ndjson", RECORDS[:4])
+        self.import_file(path, "--stage-only", "--chunk-size", "3")
+        self.assertEqual(UserSubscription.objects.count(), 0)
+
+        # 파일 뒷부분이 추가된 뒤 이어서 적재하면 앞의 레코드는 다시 읽지 않는다.
+        path = self.write("legacy.ndjson", RECORDS)
+        output = self.import_file(path, "--chunk-size", "3")
+
+        self.assertIn("Resuming after record 4", output)
+        self.assertImported()
+
+    def test_reimporting_the_same_file_does_not_duplicate(self):
+        path = self.write("legacy.ndjson", RECORDS)
+        self.import_file(path)
+        self.import_file(path)
+
+        self.assertImported()
+
+    def test_unknown_plans_do_not_reload_the_catalog_per_record(self):
+        records = [
+            (line, {**RECORDS[3], "external_id": f"s{line}", "plan_name": "gold"})
+            for line in range(1, 51)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            chunk = subscription_import.validate(records)
+
+        self.assertEqual(len(chunk.rejects), 50)
+        self.assertLessEqual(len(queries), 1)
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from freezegun import freeze_time
+
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import OutboxMessage, SubscriptionPlan
+from subscription.domain import commands
+from subscription.domain.domain_models import PaymentCycle, PlanName
+from subscription.domain.events import PaymentFailed
+from subscription.service_layer import message_bus, outbox
+from subscription.service_layer.unit_of_work import DjangoUnitOfWork
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "testuser", "test@example.com", "testpassword"
+        )
+        SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        plan_catalog.warm()
+        message_bus.handle(
+            commands.CreateSubscription(
+                user_id=self.user.id,
+                plan_name=PlanName.BASIC.value,
+                payment_details={"method_type": "point"},
+            ),
+            DjangoUnitOfWork(),
+        )
+
+    def fail_renewal(self):
+        with freeze_time(date.today() + timedelta(days=31)), mock.patch(
+            "random.choice", return_value=False
+        ):
+            message_bus.handle(
+                commands.RenewSubscription(user_id=self.user.id), DjangoUnitOfWork()
+            )
+
+    @mock.patch("subscription.adapters.email.send")
+    def test_events_are_stored_in_the_outbox_instead_of_handled_inline(self, send):
+        self.fail_renewal()
+
+        send.assert_not_called()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.event_type, "PaymentFailed")
+        self.assertEqual(message.payload["user_id"], self.user.id)
+        self.assertIsNone(message.delivered_at)
+
+    @mock.patch("subscription.adapters.email.send")
+    def test_relay_delivers_pending_events(self, send):
+        self.fail_renewal()
+
+        self.assertEqual(outbox.relay(batch_size=1), 1)
+
+        send.assert_called_once()
+        message = OutboxMessage.objects.get()
+        self.assertIsNotNone(message.delivered_at)
+        self.assertEqual(message.attempts, 1)
+        # 전달된 메시지는 다시 보내지 않는다.
+        self.assertEqual(outbox.relay(), 0)
+        send.assert_called_once()
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    @mock.patch("subscription.adapters.email.send", side_effect=RuntimeError("smtp"))
+    def test_failed_delivery_is_retried_until_max_attempts(self, send):
+        self.fail_renewal()
+
+        self.assertEqual(outbox.relay(), 0)
+        message = OutboxMessage.objects.get()
+        self.assertIsNone(message.delivered_at)
+        self.assertEqual(message.attempts, 1)
+        self.assertIn("smtp", message.last_error)
+
+        outbox.relay()
+        outbox.relay()
+        self.assertEqual(send.call_count, 2)
+
+    def test_purge_delivered(self):
+        OutboxMessage.objects.bulk_create(
+            [
+                OutboxMessage.from_event(
+                    PaymentFailed("p1", self.user.id, 10.0, "reason")
+                ),
+                OutboxMessage.from_event(
+                    PaymentFailed("p2", self.user.id, 10.0, "reason")
+                ),
+            ]
+        )
+        OutboxMessage.objects.filter(payload__payment_id="p1").update(
+            delivered_at=timezone.now() - timedelta(days=30)
+        )
+
+        self.assertEqual(outbox.purge_delivered(older_than_days=7), 1)
+        self.assertEqual(OutboxMessage.objects.get().payload["payment_id"], "p2")
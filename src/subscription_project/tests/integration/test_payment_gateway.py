@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from freezegun import freeze_time
+
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import Payment, SubscriptionPlan, UserSubscription
+from subscription.adapters.payment_gateway import (
+    ChargeRequest,
+    CircuitBreaker,
+    CircuitOpenError,
+    HttpPaymentGateway,
+    PaymentGatewayUnavailable,
+    retry_countdown,
+)
+from subscription.adapters.repository import DjangoUserSubscriptionRepository
+from subscription.adapters.stub_gateway import StubGatewayServer
+from subscription.domain.domain_models import PaymentCycle, PlanName, SubscriptionStatus
+from subscription.tasks import renew_subscription_chunk
+
+
+class HttpPaymentGatewayTest(SimpleTestCase):
+    def setUp(self):
+        self.server = StubGatewayServer().start()
+        self.addCleanup(self.server.stop)
+
+    def gateway(self, **kwargs):
+        gateway = HttpPaymentGateway(self.server.url, **kwargs)
+        self.addCleanup(gateway.pool.close)
+        return gateway
+
+    def test_charges_reuse_a_keep_alive_connection(self):
+        gateway = self.gateway()
+        results = [gateway.charge(1, 10.0, f"key-{i}") for i in range(5)]
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_same_idempotency_key_is_charged_once(self):
+        gateway = self.gateway()
+        first = gateway.charge(1, 10.0, "renewal:1")
+        second = gateway.charge(1, 10.0, "renewal:1")
+
+        self.assertEqual(first.transaction_id, second.transaction_id)
+        self.assertEqual(len(self.server.charges), 1)
+
+    def test_charge_many_sends_batches(self):
+        self.server.decline_rate = 0.0
+        gateway = self.gateway(max_batch_size=3)
+        requests = [ChargeRequest(i, 10.0, f"key-{i}") for i in range(7)]
+
+        results = gateway.charge_many(requests)
+
+        self.assertEqual(len(results), 7)
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(self.server.requests, 3)
+        # 같은 배치를 다시 보내도 새로 결제되지 않는다.
+        self.assertEqual(gateway.charge_many(requests[:3]), results[:3])
+        self.assertEqual(len(self.server.charges), 7)
+
+    def test_declined_charge_is_not_a_gateway_failure(self):
+        self.server.decline_rate = 1.0
+        gateway = self.gateway()
+        result = gateway.charge(1, 10.0, "key")
+
+        self.assertFalse(result.success)
+        self.assertEqual(result.failure_reason, "Card declined")
+        self.assertFalse(gateway.breaker.is_open)
+
+    def test_slow_gateway_times_out(self):
+        self.server.latency = 0.5
+        gateway = self.gateway(timeout=0.05)
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            gateway.charge(1, 10.0, "key")
+
+    def test_breaker_opens_after_repeated_failures(self):
+        self.server.error_rate = 1.0
+        gateway = self.gateway(
+            breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        )
+        for _ in range(2):
+            with self.assertRaises(PaymentGatewayUnavailable):
+                gateway.charge(1, 10.0, "key")
+
+        # 열린 동안에는 게이트웨이를 호출하지 않고 바로 실패한다.
+        with mock.patch.object(gateway.pool, "request") as request:
+            with self.assertRaises(CircuitOpenError):
+                gateway.charge(1, 10.0, "key")
+            request.assert_not_called()
+
+    def test_breaker_closes_after_a_successful_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        gateway = self.gateway(breaker=breaker)
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+
+        self.assertTrue(gateway.charge(1, 10.0, "key").success)
+        self.assertFalse(breaker.is_open)
+
+
+class BatchRenewalTest(TestCase):
+    def setUp(self):
+        self.server = StubGatewayServer().start()
+        self.addCleanup(self.server.stop)
+        self.gateway = HttpPaymentGateway(self.server.url)
+        self.addCleanup(self.gateway.pool.close)
+
+        plan = SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        plan_catalog.warm()
+        repository = DjangoUserSubscriptionRepository()
+        self.chunk = []
+        for i in range(5):
+            user = User.objects.create_user(f"user{i}", f"user{i}@example.com", "pw")
+            subscription = plan.to_domain().create_user_subscription(
+                user.id, date.today() - timedelta(days=30), 30
+            )
+            repository.add(subscription)
+            self.chunk.append((str(subscription.id), user.id))
+
+    def test_chunk_is_charged_in_one_round_trip_and_one_insert(self):
+        with freeze_time(date.today() + timedelta(days=1)), mock.patch(
+            "subscription.adapters.payment_gateway.get_gateway",
+            return_value=self.gateway,
+        ), CaptureQueriesContext(connection) as queries:
+            summary = renew_subscription_chunk.apply(args=[self.chunk]).get()
+
+        self.assertEqual(summary["renewed"], 5)
+        self.assertEqual(self.server.requests, 1)
+        payment_inserts = [
+            q["sql"]
+            for q in queries
+            if q["sql"].startswith('INSERT INTO "subscription_payment"')
+        ]
+        self.assertEqual(len(payment_inserts), 1)
+        self.assertEqual(Payment.objects.count(), 5)
+        self.assertEqual(
+            UserSubscription.objects.filter(
+                status=SubscriptionStatus.ACTIVE.value
+            ).count(),
+            5,
+        )
+
+
+class RetryCountdownTest(SimpleTestCase):
+    @override_settings(PAYMENT_RETRY_BASE_DELAY=4, PAYMENT_RETRY_MAX_DELAY=30)
+    def test_backoff_grows_exponentially_up_to_the_cap(self):
+        self.assertTrue(2 <= retry_countdown(0) <= 4)
+        self.assertTrue(8 <= retry_countdown(2) <= 16)
+        self.assertTrue(15 <= retry_countdown(10) <= 30)
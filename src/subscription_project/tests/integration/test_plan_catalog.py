@@ -0,0 +1,84 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from subscription.adapters.catalog import VERSION_CACHE_KEY, plan_catalog
+from subscription.adapters.models import SubscriptionPlan
+from subscription.adapters.repository import DjangoSubscriptionPlanRepository
+from subscription.domain.domain_models import PaymentCycle, PlanName
+
+
+class PlanCatalogTest(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        plan_catalog.warm()
+        self.repository = DjangoSubscriptionPlanRepository()
+
+    def test_plan_lookups_do_not_hit_the_database(self):
+        with self.assertNumQueries(0):
+            by_name = self.repository.get(PlanName.BASIC.value)
+            by_id = self.repository.get_by_id(self.plan.id)
+            plans = self.repository.list()
+
+        self.assertIs(by_name, by_id)
+        self.assertEqual(by_name.id, self.plan.id)
+        self.assertEqual(len(plans), 1)
+
+    def test_unknown_plan_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.repository.get("unknown")
+
+    def test_saving_a_plan_invalidates_the_catalog(self):
+        self.plan.price = Decimal("20.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.save()
+
+        self.assertEqual(self.repository.get(PlanName.BASIC.value).price, 20.0)
+
+    def test_uncommitted_plan_is_loaded_but_not_cached(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            premium = SubscriptionPlan.objects.create(
+                name=PlanName.PREMIUM.value,
+                price="20.00",
+                payment_cycle=PaymentCycle.MONTHLY.value,
+                description="Premium Plan",
+                duration=timedelta(days=30),
+            )
+            # 카탈로그에 없는 플랜은 그 행만 읽고, 커밋 전이므로 카탈로그에는 넣지 않는다.
+            with self.assertNumQueries(1):
+                self.assertEqual(plan_catalog.get(PlanName.PREMIUM).id, premium.id)
+            self.assertEqual(plan_catalog.get_by_id(premium.id).price, 20.0)
+            self.assertEqual(len(plan_catalog.list()), 2)
+            self.assertNotIn(premium.id, plan_catalog._by_id)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(plan_catalog.list()), 2)
+
+    def test_unknown_plan_reloads_at_most_once_per_check_interval(self):
+        # 카탈로그 전체를 다시 읽지 않고 이름으로 한 행만 찾는다.
+        with self.assertNumQueries(3):
+            for _ in range(3):
+                self.assertIsNone(plan_catalog.get("unknown"))
+
+        with override_settings(PLAN_CATALOG_VERSION_CHECK_INTERVAL=0):
+            with self.assertNumQueries(2):
+                self.assertIsNone(plan_catalog.get("unknown"))
+
+    @override_settings(PLAN_CATALOG_VERSION_CHECK_INTERVAL=0)
+    def test_version_bump_from_another_process_reloads_the_catalog(self):
+        # 다른 프로세스에서 플랜을 바꾸고 버전을 올린 상황을 흉내낸다.
+        SubscriptionPlan.objects.filter(id=self.plan.id).update(price="30.00")
+        self.assertEqual(self.repository.get(PlanName.BASIC.value).price, 10.0)
+
+        cache.incr(VERSION_CACHE_KEY)
+
+        self.assertEqual(self.repository.get(PlanName.BASIC.value).price, 30.0)
@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from subscription.adapters import fragment_cache
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import SubscriptionPlan
+from subscription.domain.domain_models import PaymentCycle, PlanName
+
+
+class PricingCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        fragment_cache.clear()
+        self.plan = SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="6500.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        plan_catalog.warm()
+
+    def test_pricing_page_is_rendered_once_per_catalog_version(self):
+        response = self.client.get(reverse("pricing"))
+        self.assertContains(response, "6500원")
+        self.assertIn("public", response["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse("pricing"))
+        self.assertEqual(cached.content, response.content)
+
+        not_modified = self.client.get(
+            reverse("pricing"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        self.plan.price = Decimal("7000.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.save()
+        changed = self.client.get(
+            reverse("pricing"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertContains(changed, "7000원")
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+    def test_plan_list_is_public(self):
+        self.client.logout()
+        response = self.client.get(reverse("plan-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(plan["name"], plan["price"]) for plan in response.json()],
+            [(PlanName.BASIC.value, 6500.0)],
+        )
+        self.assertIn("ETag", response)
+
+    def test_concurrent_misses_build_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return b"fragment"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    fragment_cache.get_or_build("test", 1, build).body
+                )
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [b"fragment"] * 5)
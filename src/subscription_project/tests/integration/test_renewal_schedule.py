@@ -0,0 +1,176 @@
+import uuid
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from freezegun import freeze_time
+
+from subscription.adapters import renewal_schedule
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import Payment, SubscriptionPlan, UserSubscription
+from subscription.adapters.payment_gateway import HttpPaymentGateway
+from subscription.adapters.repository import DjangoUserSubscriptionRepository
+from subscription.adapters.stub_gateway import StubGatewayServer
+from subscription.domain.domain_models import PaymentCycle, PlanName, SubscriptionStatus
+from subscription.tasks import renew_expired_subscriptions
+
+
+class RenewalScheduleTest(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        plan_catalog.warm()
+        self.repository = DjangoUserSubscriptionRepository()
+        self.today = date(2024, 6, 1)
+
+    def add_subscription(self, end_date, username="testuser"):
+        user = User.objects.create_user(username, f"{username}@example.com", "pw")
+        subscription = self.plan.to_domain().create_user_subscription(
+            user.id, end_date - timedelta(days=30), 30
+        )
+        subscription.end_date = end_date
+        self.repository.add(subscription)
+        return subscription
+
+    @override_settings(RENEWAL_DEFAULT_JITTER_SECONDS=0)
+    def test_active_subscription_is_due_the_day_after_it_ends(self):
+        subscription = self.add_subscription(self.today)
+
+        self.assertEqual(
+            UserSubscription.objects.get(id=subscription.id).next_renewal_at,
+            timezone.make_aware(datetime(2024, 6, 2)),
+        )
+
+        subscription.status = SubscriptionStatus.CANCELED
+        self.repository.add_many([subscription])
+        self.assertIsNone(
+            UserSubscription.objects.get(id=subscription.id).next_renewal_at
+        )
+
+    @override_settings(
+        RENEWAL_DEFAULT_JITTER_SECONDS=0,
+        RENEWAL_JITTER_SECONDS={PlanName.BASIC.value: 6 * 3600},
+    )
+    def test_jitter_is_per_plan_and_stable(self):
+        ids = [uuid.uuid4() for _ in range(50)]
+        jitters = [renewal_schedule.jitter_seconds(PlanName.BASIC, id) for id in ids]
+
+        self.assertTrue(all(0 <= jitter < 6 * 3600 for jitter in jitters))
+        self.assertGreater(len(set(jitters)), 1)
+        self.assertEqual(
+            jitters[0], renewal_schedule.jitter_seconds(PlanName.BASIC, ids[0])
+        )
+        self.assertEqual(renewal_schedule.jitter_seconds(PlanName.PREMIUM, ids[0]), 0)
+
+    def test_claimed_subscriptions_are_leased(self):
+        self.add_subscription(self.today - timedelta(days=3), "overdue")
+        self.add_subscription(self.today, "due")
+        self.add_subscription(self.today + timedelta(days=10), "later")
+        now = timezone.make_aware(datetime(2024, 6, 2, 1))
+        lease_until = now + timedelta(hours=1)
+
+        self.assertEqual(self.repository.renewal_backlog(now)["due"], 2)
+        self.assertEqual(len(self.repository.claim_due(now, lease_until, 10)), 2)
+        self.assertEqual(self.repository.claim_due(now, lease_until, 10), [])
+        self.assertEqual(self.repository.renewal_backlog(now)["due"], 0)
+        # 리스가 끝나면 다시 대상이 된다.
+        self.assertEqual(self.repository.renewal_backlog(lease_until)["due"], 2)
+
+    def test_backlog_reports_the_oldest_overdue_subscription(self):
+        self.add_subscription(self.today - timedelta(days=1), "overdue")
+        now = timezone.make_aware(datetime(2024, 6, 2))
+
+        backlog = self.repository.renewal_backlog(now)
+
+        self.assertEqual(backlog["due"], 1)
+        self.assertEqual(backlog["lag_seconds"], 24 * 3600)
+
+    def use_stub_gateway(self, decline_rate):
+        server = StubGatewayServer(decline_rate=decline_rate).start()
+        self.addCleanup(server.stop)
+        gateway = HttpPaymentGateway(server.url)
+        self.addCleanup(gateway.pool.close)
+        patcher = mock.patch(
+            "subscription.adapters.payment_gateway.get_gateway", return_value=gateway
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return server
+
+    @override_settings(
+        RENEWAL_DEFAULT_JITTER_SECONDS=0, RENEWAL_RETRY_DELAY_SECONDS=6 * 3600
+    )
+    def test_declined_renewal_is_retried_later_with_a_new_key(self):
+        server = self.use_stub_gateway(decline_rate=1.0)
+        subscription = self.add_subscription(self.today)
+
+        with freeze_time("2024-06-02 00:30:00"):
+            renew_expired_subscriptions.apply().get()
+
+        declined = UserSubscription.objects.get(id=subscription.id)
+        self.assertEqual(declined.status, SubscriptionStatus.ACTIVE.value)
+        self.assertEqual(declined.renewal_attempts, 1)
+        self.assertEqual(
+            declined.next_renewal_at, timezone.make_aware(datetime(2024, 6, 2, 6))
+        )
+
+        # 리스가 끝나도 재시도 시각 전에는 다시 가져가지 않는다.
+        server.decline_rate = 0.0
+        with freeze_time("2024-06-02 02:00:00"):
+            renew_expired_subscriptions.apply().get()
+        self.assertEqual(Payment.objects.count(), 1)
+
+        with freeze_time("2024-06-02 06:30:00"):
+            renew_expired_subscriptions.apply().get()
+
+        self.assertEqual(
+            UserSubscription.objects.get(id=subscription.id).status,
+            SubscriptionStatus.EXPIRED.value,
+        )
+        self.assertEqual(
+            set(server.charges),
+            {f"renewal:{subscription.id}", f"renewal:{subscription.id}:1"},
+        )
+
+    @override_settings(
+        RENEWAL_DEFAULT_JITTER_SECONDS=0,
+        RENEWAL_RETRY_DELAY_SECONDS=3600,
+        RENEWAL_MAX_ATTEMPTS=2,
+    )
+    def test_subscription_expires_after_max_declined_attempts(self):
+        self.use_stub_gateway(decline_rate=1.0)
+        subscription = self.add_subscription(self.today)
+
+        for now in ("2024-06-02 00:30:00", "2024-06-02 03:00:00"):
+            with freeze_time(now):
+                renew_expired_subscriptions.apply().get()
+
+        expired = UserSubscription.objects.get(id=subscription.id)
+        self.assertEqual(expired.status, SubscriptionStatus.EXPIRED.value)
+        self.assertEqual(expired.renewal_attempts, 2)
+        self.assertIsNone(expired.next_renewal_at)
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertFalse(
+            UserSubscription.objects.filter(
+                user_id=subscription.user_id, status=SubscriptionStatus.ACTIVE.value
+            ).exists()
+        )
+
+    def test_backlog_endpoint_is_staff_only(self):
+        admin = User.objects.create_user("admin", "admin@example.com", "password")
+        self.assertEqual(self.client.get(reverse("renewal-backlog")).status_code, 403)
+
+        admin.is_staff = True
+        admin.save()
+        response = self.client.get(reverse("renewal-backlog"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["due"], 0)
@@ -3,6 +3,7 @@ from datetime import date, timedelta
 from django.contrib.auth.models import User
 from django.test import TestCase
 
+from subscription.adapters.catalog import plan_catalog
 from subscription.adapters.models import (
     Payment,
     PaymentMethod,
@@ -22,6 +23,7 @@ from subscription.domain.domain_models import (
     SubscriptionStatus,
 )
 from subscription.domain.domain_models import UserSubscription as DomainUserSubscription
+from subscription.service_layer.unit_of_work import DjangoUnitOfWork
 
 
 class DjangoUserSubscriptionRepositoryTest(TestCase):
@@ -50,6 +52,10 @@ class DjangoUserSubscriptionRepositoryTest(TestCase):
 
     def test_add_subscription(self):
         # Test adding a new subscription
+        # NOTE: 사용자당 활성 구독은 하나뿐이므로 기존 구독을 먼저 만료시킨다.
+        UserSubscription.objects.filter(id=self.user_subscription.id).update(
+            status=SubscriptionStatus.EXPIRED.value
+        )
         new_plan = SubscriptionPlan.objects.create(
             name=PlanName.STANDARD.value,
             price="20.00",
@@ -173,3 +179,164 @@ class DjangoPaymentRepositoryTest(TestCase):
         self.assertEqual(
             updated_payment_method.details, {"card_number": "1234-1234-1234-1234"}
         )
+
+
+class RepositoryQueryBudgetTest(TestCase):
+    # NOTE: 읽기 메서드별 쿼리 예산. 조회되는 row 수와 관계없이 고정되어야 한다.
+    QUERY_BUDGETS = {
+        "user_subscriptions.get": 1,
+        "user_subscriptions.get_by_user_id": 1,
+        "user_subscriptions.get_active_subscription_by_user_id": 1,
+        "user_subscriptions.get_subscriptions_expiring_on": 1,
+        "user_subscriptions.list": 1,
+        "payments.get": 1,
+        "payments.get_list_by_user_id": 1,
+        "payments.list": 1,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "testuser", "test@example.com", "testpassword"
+        )
+        self.plan = SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        self.users = [self.user] + [
+            User.objects.create_user(f"testuser{i}", f"test{i}@example.com", "pw")
+            for i in range(4)
+        ]
+        self.subscriptions = [
+            UserSubscription.objects.create(
+                user=user,
+                plan=self.plan,
+                start_date=date.today(),
+                end_date=date.today(),
+                status=SubscriptionStatus.ACTIVE.value,
+            )
+            for user in self.users
+        ]
+        self.payments = [
+            Payment.objects.create(
+                subscription=self.subscriptions[0],
+                payment_method=PaymentMethod.objects.create(
+                    method_type=PaymentMethodType.CREDIT_CARD.value,
+                    details={"card_number": "1234-1234-1234-1234"},
+                ),
+                amount="10.00",
+                date=date.today(),
+                status=PaymentStatus.SUCCESS.value,
+            )
+            for _ in range(5)
+        ]
+        plan_catalog.warm()
+
+        self.repositories = {
+            "user_subscriptions": DjangoUserSubscriptionRepository(),
+            "payments": DjangoPaymentRepository(),
+        }
+
+    def assertWithinBudget(self, method, *args):
+        repository_name, method_name = method.split(".")
+        repository = self.repositories[repository_name]
+        with self.assertNumQueries(self.QUERY_BUDGETS[method]):
+            result = getattr(repository, method_name)(*args)
+            # 결과를 끝까지 읽어도 추가 쿼리가 발생하지 않아야 한다.
+            for item in result if isinstance(result, list) else [result]:
+                if hasattr(item, "subscription"):
+                    item = item.subscription
+                item.plan.name
+        return result
+
+    def test_user_subscription_reads_stay_within_budget(self):
+        self.assertWithinBudget("user_subscriptions.get", self.subscriptions[0].id)
+        self.assertWithinBudget("user_subscriptions.get_by_user_id", self.user.id)
+        self.assertWithinBudget(
+            "user_subscriptions.get_active_subscription_by_user_id", self.user.id
+        )
+        expiring = self.assertWithinBudget(
+            "user_subscriptions.get_subscriptions_expiring_on", date.today()
+        )
+        self.assertEqual(len(expiring), 5)
+        subscriptions = self.assertWithinBudget("user_subscriptions.list")
+        self.assertEqual(len(subscriptions), 5)
+
+    def test_payment_reads_stay_within_budget(self):
+        self.assertWithinBudget("payments.get", self.payments[0].id)
+        payments = self.assertWithinBudget("payments.get_list_by_user_id", self.user.id)
+        self.assertEqual(len(payments), 5)
+        self.assertWithinBudget("payments.list")
+
+
+class RepositoryStreamingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "testuser", "test@example.com", "testpassword"
+        )
+        self.plan = SubscriptionPlan.objects.create(
+            name=PlanName.BASIC.value,
+            price="10.00",
+            payment_cycle=PaymentCycle.MONTHLY.value,
+            description="Basic Plan",
+            duration=timedelta(days=30),
+        )
+        # 같은 end_date 가 여러 개 있어도 (end_date, id) 로 빠짐없이 순회해야 한다.
+        self.subscriptions = [
+            UserSubscription.objects.create(
+                user=User.objects.create_user(f"streamuser{i}", password="pw"),
+                plan=self.plan,
+                start_date=date.today(),
+                end_date=date.today() + timedelta(days=i % 2),
+                status=SubscriptionStatus.ACTIVE.value,
+            )
+            for i in range(5)
+        ]
+        plan_catalog.warm()
+        self.repository = DjangoUserSubscriptionRepository()
+
+    def test_iter_list_streams_every_row_in_keyset_order(self):
+        with self.assertNumQueries(3):
+            subscriptions = list(self.repository.iter_list(chunk_size=2))
+
+        expected = sorted(self.subscriptions, key=lambda s: (s.end_date, s.id))
+        self.assertEqual([s.id for s in subscriptions], [s.id for s in expected])
+
+    def test_iter_subscriptions_expiring_on(self):
+        subscriptions = list(
+            self.repository.iter_subscriptions_expiring_on(date.today(), chunk_size=1)
+        )
+        self.assertEqual(len(subscriptions), 3)
+        self.assertTrue(all(s.end_date == date.today() for s in subscriptions))
+
+    def test_payment_stream_shares_objects_only_within_a_page(self):
+        payment_method = PaymentMethod.objects.create(
+            method_type=PaymentMethodType.CREDIT_CARD.value,
+            details={"card_number": "1234-1234-1234-1234"},
+        )
+        for i in range(3):
+            Payment.objects.create(
+                subscription=self.subscriptions[0],
+                payment_method=payment_method,
+                amount="10.00",
+                date=date.today() + timedelta(days=i),
+                status=PaymentStatus.SUCCESS.value,
+            )
+
+        first, second, third = DjangoPaymentRepository().iter_list(chunk_size=2)
+
+        self.assertIs(first.subscription, second.subscription)
+        self.assertIs(first.payment_method, second.payment_method)
+        # 다음 페이지는 공유 캐시를 새로 시작하므로 메모리가 페이지 크기로 제한된다.
+        self.assertIsNot(second.subscription, third.subscription)
+        self.assertEqual(second.subscription.id, third.subscription.id)
+
+    def test_iterators_pass_through_unit_of_work_lazily(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            with self.assertNumQueries(0):
+                iterator = uow.user_subscriptions.iter_list(chunk_size=2)
+            self.assertEqual(len(list(iterator)), 5)
+            self.assertEqual(len(list(uow.user_subscriptions.seen)), 0)
@@ -1,13 +1,26 @@
+import threading
 from datetime import date, timedelta
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from subscription.adapters.models import SubscriptionPlan, UserSubscription
+from subscription.adapters.catalog import plan_catalog
+from subscription.adapters.models import (
+    OutboxMessage,
+    Payment,
+    PaymentMethod,
+    SubscriptionPlan,
+    UserSubscription,
+)
+from subscription.domain import commands
 from subscription.domain.domain_models import PaymentCycle, PlanName
 from subscription.domain.domain_models import SubscriptionPlan as DomainSubscriptionPlan
 from subscription.domain.domain_models import SubscriptionStatus
 from subscription.domain.domain_models import UserSubscription as DomainUserSubscription
+from subscription.domain.events import PaymentFailed
+from subscription.service_layer import message_bus
 from subscription.service_layer.unit_of_work import DjangoUnitOfWork
 
 
@@ -31,12 +44,15 @@ class TestDjangoUnitOfWork(TestCase):
             end_date=date.today(),
             status=SubscriptionStatus.ACTIVE.value,
         )
+        plan_catalog.warm()
 
     def test_adding_user_subscription(self):
+        # NOTE: 사용자당 활성 구독은 하나뿐이므로 구독이 없는 사용자로 검증한다.
+        user = User.objects.create_user("newuser", "new@example.com", "testpassword")
         uow = DjangoUnitOfWork()
         with uow:
             subscription = DomainUserSubscription(
-                user_id=self.user.id,
+                user_id=user.id,
                 plan=self.plan,
                 start_date=date.today(),
                 end_date=date.today() + timedelta(days=self.plan.duration.days),
@@ -79,3 +95,225 @@ class TestDjangoUnitOfWork(TestCase):
                 subscription.user_id
             )
             self.assertIsNone(saved_subscription)
+
+    def test_writes_are_flushed_as_one_statement_per_table(self):
+        user = User.objects.create_user("newuser", "new@example.com", "testpassword")
+        uow = DjangoUnitOfWork()
+        with CaptureQueriesContext(connection) as queries:
+            message_bus.handle(
+                commands.CreateSubscription(
+                    user_id=user.id,
+                    plan_name=PlanName.BASIC.value,
+                    payment_details={"method_type": "point"},
+                ),
+                uow,
+            )
+
+        # 구독, 현재 구독 읽기 모델, 결제 수단, 결제, 계정 버전 테이블마다 한 번씩
+        inserts = [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 5)
+        self.assertEqual(UserSubscription.objects.filter(user=user).count(), 1)
+        self.assertEqual(PaymentMethod.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_batch_of_entities_is_flushed_in_one_statement(self):
+        users = [
+            User.objects.create_user(f"batchuser{i}", f"batch{i}@example.com", "pw")
+            for i in range(10)
+        ]
+        uow = DjangoUnitOfWork()
+        with CaptureQueriesContext(connection) as queries:
+            with uow:
+                for user in users:
+                    uow.user_subscriptions.add(
+                        DomainUserSubscription(
+                            user_id=user.id,
+                            plan=self.plan,
+                            start_date=date.today(),
+                            end_date=date.today() + timedelta(days=30),
+                            status=SubscriptionStatus.ACTIVE,
+                        )
+                    )
+
+        # 구독 10개와 사용자 10명의 계정 버전을 각각 한 번에 쓴다.
+        inserts = [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(UserSubscription.objects.count(), 11)
+
+    def test_failed_nested_block_discards_its_pending_writes(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            self.user_subscription.status = SubscriptionStatus.EXPIRED.value
+            uow.user_subscriptions.update(self.user_subscription.to_domain())
+            with self.assertRaises(Exception):
+                with uow:
+                    uow.user_subscriptions.add(
+                        DomainUserSubscription(
+                            user_id=self.user.id,
+                            plan=self.plan,
+                            start_date=date.today(),
+                            end_date=date.today(),
+                            status=SubscriptionStatus.ACTIVE,
+                        )
+                    )
+                    raise Exception("Force rollback")
+
+        self.assertEqual(UserSubscription.objects.count(), 1)
+        self.user_subscription.refresh_from_db()
+        self.assertEqual(
+            self.user_subscription.status, SubscriptionStatus.EXPIRED.value
+        )
+
+    def test_repeated_lookups_return_the_same_object_without_a_query(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            with self.assertNumQueries(1):
+                subscription = (
+                    uow.user_subscriptions.get_active_subscription_by_user_id(
+                        self.user.id
+                    )
+                )
+                self.assertIs(
+                    uow.user_subscriptions.get_active_subscription_by_user_id(
+                        self.user.id
+                    ),
+                    subscription,
+                )
+                self.assertIs(uow.user_subscriptions.get(subscription.id), subscription)
+
+            # 플랜은 플랜 카탈로그에서 가져오므로 쿼리가 없다.
+            with self.assertNumQueries(0):
+                plan = uow.subscription_plans.get(PlanName.BASIC.value)
+                self.assertIs(uow.subscription_plans.get(PlanName.BASIC), plan)
+                self.assertIs(uow.subscription_plans.get_by_id(plan.id), plan)
+
+            # 다른 경로로 다시 읽어도 이미 로드된 객체가 돌아온다.
+            self.assertIs(uow.user_subscriptions.list()[0], subscription)
+            self.assertEqual(len(list(uow.user_subscriptions.seen)), 1)
+
+    def test_natural_key_lookup_is_refreshed_when_entity_changes(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            subscription = uow.user_subscriptions.get_active_subscription_by_user_id(
+                self.user.id
+            )
+            subscription.status = SubscriptionStatus.CANCELED
+            uow.user_subscriptions.update(subscription)
+
+            new_subscription = DomainUserSubscription(
+                user_id=self.user.id,
+                plan=subscription.plan,
+                start_date=date.today(),
+                end_date=date.today() + timedelta(days=30),
+                status=SubscriptionStatus.ACTIVE,
+            )
+            uow.user_subscriptions.add(new_subscription)
+
+            with self.assertNumQueries(0):
+                self.assertIs(
+                    uow.user_subscriptions.get_active_subscription_by_user_id(
+                        self.user.id
+                    ),
+                    new_subscription,
+                )
+
+    def test_only_entities_that_raised_events_are_collected(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            subscriptions = uow.user_subscriptions.list()
+            subscriptions[0].record_event(self.payment_failed())
+            self.assertEqual(len(uow._dirty_entities), 1)
+
+        # flush 때 아웃박스로 저장되므로 프로세스 안에서 처리할 이벤트는 남지 않는다.
+        self.assertEqual(list(uow.collect_new_events()), [])
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list("event_type", flat=True)),
+            ["PaymentFailed"],
+        )
+
+    def test_events_of_a_rolled_back_block_are_dropped(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            with self.assertRaises(RuntimeError):
+                with uow:
+                    uow.user_subscriptions.list()[0].record_event(self.payment_failed())
+                    raise RuntimeError
+
+        self.assertEqual(list(uow.collect_new_events()), [])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_rolled_back_block_keeps_events_raised_before_it(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            subscription = uow.user_subscriptions.list()[0]
+            subscription.record_event(self.payment_failed())
+            with self.assertRaises(RuntimeError):
+                with uow:
+                    subscription.record_event(self.payment_failed())
+                    raise RuntimeError
+
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_events_are_not_collected_inside_a_block(self):
+        uow = DjangoUnitOfWork()
+        with uow:
+            uow.user_subscriptions.list()[0].record_event(self.payment_failed())
+            self.assertEqual(list(uow.collect_new_events()), [])
+
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def payment_failed(self):
+        return PaymentFailed(
+            payment_id="payment", user_id=self.user.id, amount=10.0, failure_reason=""
+        )
+
+    def test_repository_method_wrappers_are_cached(self):
+        uow = DjangoUnitOfWork()
+        self.assertIs(
+            uow.user_subscriptions.get_by_user_id,
+            uow.user_subscriptions.get_by_user_id,
+        )
+
+    def test_handle_many_runs_a_batch_in_one_transaction(self):
+        users = [
+            User.objects.create_user(f"batchuser{i}", f"batch{i}@example.com", "pw")
+            for i in range(3)
+        ]
+        batch = [
+            commands.CreateSubscription(
+                user_id=user.id,
+                plan_name=PlanName.BASIC.value,
+                payment_details={"method_type": "point"},
+            )
+            for user in users
+        ]
+        # 활성 구독이 없는 사용자의 취소는 실패하지만 나머지 커맨드에는 영향이 없다.
+        batch.insert(1, commands.CancelSubscription(user_id=users[2].id))
+
+        with CaptureQueriesContext(connection) as queries:
+            outcomes = message_bus.handle_many(batch, DjangoUnitOfWork())
+
+        self.assertEqual([o.ok for o in outcomes], [True, False, True, True])
+        self.assertIsInstance(outcomes[1].error, ValueError)
+        self.assertTrue(outcomes[0].result["success"])
+        inserts = [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 5)
+        self.assertEqual(UserSubscription.objects.filter(user__in=users).count(), 3)
+
+    def test_unit_of_work_in_use_cannot_be_entered_from_another_thread(self):
+        uow = DjangoUnitOfWork()
+        errors = []
+
+        def enter_from_other_thread():
+            try:
+                with uow:
+                    pass
+            except RuntimeError as e:
+                errors.append(e)
+
+        with uow:
+            thread = threading.Thread(target=enter_from_other_thread)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(errors), 1)
@@ -21,19 +21,19 @@ class FakeRepository:
         return list(self._items)
 
     def matches(self, item, fields, identifier):
-        return item.__dict__[fields] == identifier
+        return getattr(item, fields) == identifier
 
 
 class FakeUserSubscriptionRepository(FakeRepository):
     def get_active_subscription_by_user_id(self, user_id: int):
-        try:
-            return next(
+        return next(
+            (
                 item
                 for item in self._items
                 if item.user_id == user_id and item.status == "active"
-            )
-        except StopIteration:
-            raise ValueError(f"Active subscription for user {user_id} not found")
+            ),
+            None,
+        )
 
     def update(self, item):
         pass
@@ -56,19 +56,32 @@ class FakePaymentMethodRepository(FakeRepository):
     pass
 
 
+class FakeCurrentSubscriptionRepository(FakeRepository):
+    def update(self, item):
+        pass
+
+
 class FakeUnitOfWork(DjangoUnitOfWork):
     def __init__(self):
         self.user_subscriptions = TrackingRepository(FakeUserSubscriptionRepository([]))
         self.subscription_plans = TrackingRepository(FakeSubscriptionPlanRepository([]))
         self.payments = TrackingRepository(FakePaymentRepository([]))
         self.payment_methods = TrackingRepository(FakePaymentMethodRepository([]))
+        self.current_subscriptions = TrackingRepository(
+            FakeCurrentSubscriptionRepository([])
+        )
         self.committed = False
         self.rolled_back = False
+        self._transactions = []
+        self._dirty_entities = {}
+        self._registry_token = None
 
     def __enter__(self):
+        self._start_recording_events()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self._stop_recording_events()
         if exc_type:
             self.rollback()
             return False
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.test import TestCase, override_settings
+from freezegun import freeze_time
+
+from subscription import authentication
+from subscription.authentication import PrincipalCache
+
+
+class PrincipalCacheTest(TestCase):
+    def test_entries_expire_and_least_recently_used_is_evicted(self):
+        cache = PrincipalCache(maxsize=2, ttl=60)
+        loader = mock.Mock(side_effect=lambda: object())
+
+        first = cache.get_or_load("a", loader)
+        self.assertIs(cache.get_or_load("a", loader), first)
+        cache.get_or_load("b", loader)
+        cache.get_or_load("a", loader)
+        cache.get_or_load("c", loader)  # b 가 밀려난다.
+        self.assertEqual(loader.call_count, 3)
+
+        cache.get_or_load("b", loader)
+        self.assertEqual(loader.call_count, 4)
+        self.assertEqual(len(cache), 2)
+
+        with freeze_time(auto_tick_seconds=0) as frozen:
+            cache = PrincipalCache(maxsize=2, ttl=60)
+            cache.get_or_load("a", loader)
+            frozen.tick(61)
+            cache.get_or_load("a", loader)
+        self.assertEqual(loader.call_count, 6)
+
+    def test_saving_a_user_invalidates_the_cached_principal(self):
+        user = User.objects.create_user("cached", "cached@example.com", "pw")
+        self.assertEqual(authentication.get_user(user.id).is_staff, False)
+
+        user.is_staff = True
+        user.save()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(authentication.get_user(user.id).is_staff)
+            self.assertTrue(authentication.get_user(user.id).is_staff)
+
+    def test_each_lookup_gets_its_own_user(self):
+        user = User.objects.create_user("cached", "cached@example.com", "pw")
+        first = authentication.get_user(user.id)
+        first.is_staff = True
+
+        with self.assertNumQueries(0):
+            second = authentication.get_user(user.id)
+        self.assertIsNot(second, first)
+        self.assertFalse(second.is_staff)
+        self.assertEqual(second.email, "cached@example.com")
+        self.assertTrue(second.check_password("pw"))
+
+
+class SignedTokenTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "tokenuser", "token@example.com", "pw", is_staff=True
+        )
+
+    def test_token_is_verified_without_a_query(self):
+        token = authentication.issue_token(self.user)
+
+        with self.assertNumQueries(0):
+            principal = authentication.verify_token(token)
+        self.assertEqual(principal.id, self.user.id)
+        self.assertTrue(principal.is_staff)
+        self.assertTrue(principal.is_authenticated)
+
+    def test_tampered_and_expired_tokens_are_rejected(self):
+        token = authentication.issue_token(self.user)
+        with self.assertRaises(signing.BadSignature):
+            authentication.verify_token(token[:-2] + "xx")
+
+        with override_settings(AUTH_TOKEN_MAX_AGE=-1):
+            with self.assertRaises(signing.SignatureExpired):
+                authentication.verify_token(token)
@@ -0,0 +1,92 @@
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+from subscription.adapters import mappers
+from subscription.domain.domain_models import (
+    PaymentCycle,
+    PaymentMethodType,
+    PaymentStatus,
+    PlanName,
+    SubscriptionPlan,
+    SubscriptionStatus,
+)
+
+
+class RowMapperTest(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan(
+            name=PlanName.BASIC,
+            price=10.0,
+            payment_cycle=PaymentCycle.MONTHLY,
+            description="Basic Plan",
+            duration_days=30,
+        )
+        self.plans = {self.plan.id: self.plan}
+
+    def test_map_subscriptions(self):
+        subscription_id = uuid.uuid4()
+        rows = [
+            (
+                subscription_id,
+                1,
+                self.plan.id,
+                date(2024, 1, 1),
+                date(2024, 1, 31),
+                "active",
+                0,
+            )
+        ]
+
+        [subscription] = mappers.map_subscriptions(rows, self.plans.get)
+
+        self.assertEqual(subscription.id, subscription_id)
+        self.assertEqual(subscription.user_id, 1)
+        self.assertIs(subscription.plan, self.plan)
+        self.assertEqual(subscription.status, SubscriptionStatus.ACTIVE)
+        self.assertFalse(hasattr(subscription, "__dict__"))
+
+    def test_map_payments_shares_subscription_and_payment_method(self):
+        subscription_id, payment_method_id = uuid.uuid4(), uuid.uuid4()
+        row = (
+            subscription_id,
+            1,
+            self.plan.id,
+            date(2024, 1, 1),
+            date(2024, 1, 31),
+            "active",
+            payment_method_id,
+            "credit_card",
+            {"card_number": "4242-4242-4242-4242"},
+            0,
+        )
+        rows = [
+            (uuid.uuid4(), Decimal("10.00"), datetime(2024, 1, 1), "Succeeded", *row),
+            (uuid.uuid4(), Decimal("10.00"), datetime(2024, 1, 2), "failed", *row),
+        ]
+
+        first, second = mappers.map_payments(rows, self.plans.get)
+
+        self.assertEqual(first.amount, 10.0)
+        self.assertEqual(first.status, PaymentStatus.SUCCESS)
+        self.assertEqual(second.status, PaymentStatus.FAILED)
+        self.assertIs(first.subscription, second.subscription)
+        self.assertIs(first.payment_method, second.payment_method)
+        self.assertEqual(
+            first.payment_method.method_type, PaymentMethodType.CREDIT_CARD
+        )
+
+    def test_events_are_allocated_lazily(self):
+        subscription = next(
+            mappers.map_subscriptions(
+                [(uuid.uuid4(), 1, self.plan.id, None, None, "active", 0)],
+                self.plans.get,
+            )
+        )
+
+        self.assertEqual(subscription.pop_events(), [])
+        subscription.events.append("event")
+        self.assertEqual(subscription.pop_events(), ["event"])
+        self.assertEqual(subscription.events, [])
@@ -2,9 +2,17 @@ from datetime import date, timedelta
 from unittest import mock
 
 from django.contrib.auth.models import User
+from django.db import IntegrityError
 from django.test import TestCase
 from freezegun import freeze_time
 
+from subscription.adapters.models import Payment
+from subscription.adapters.payment_gateway import (
+    ChargeResult,
+    PaymentGatewayUnavailable,
+)
+from subscription.adapters.models import UserSubscription as DjangoUserSubscription
+from subscription.adapters.repository import DjangoUserSubscriptionRepository
 from subscription.domain.domain_models import (
     PaymentCycle,
     PaymentMethodType,
@@ -15,7 +23,7 @@ from subscription.domain.domain_models import (
 )
 from subscription.service_layer.services import SubscriptionService
 from subscription.service_layer.unit_of_work import DjangoUnitOfWork
-from subscription.tasks import renew_expired_subscriptions
+from subscription.tasks import renew_expired_subscriptions, renew_subscription_chunk
 
 
 class TaskTestCase(TestCase):
@@ -93,3 +101,116 @@ class TaskTestCase(TestCase):
             task_result.get()
             subscription_list = self.uow.user_subscriptions.list()
             self.assertEqual(len(subscription_list), 4)
+
+    def add_expiring_subscriptions(self, *users):
+        self.uow.subscription_plans.add(self.plan)
+        subscriptions = []
+        for user in users:
+            subscription = UserSubscription(
+                user_id=user.id,
+                plan=self.plan,
+                start_date=date.today(),
+                end_date=date.today() + timedelta(days=self.plan.duration_days),
+                status=SubscriptionStatus.ACTIVE,
+            )
+            self.uow.user_subscriptions.add(subscription)
+            subscriptions.append(subscription)
+        return subscriptions
+
+    @mock.patch("random.choice", return_value=True)
+    def test_renewals_are_fanned_out_in_chunks(self, mock_random_choice):
+        self.add_expiring_subscriptions(self.user, self.user2)
+
+        with freeze_time(date.today() + timedelta(days=31)):
+            chunk_count = renew_expired_subscriptions.apply(
+                kwargs={"chunk_size": 1}
+            ).get()
+
+            self.assertEqual(chunk_count, 2)
+            self.assertEqual(len(self.uow.user_subscriptions.list()), 4)
+
+    @mock.patch("random.choice", return_value=True)
+    def test_rerunning_a_chunk_does_not_charge_twice(self, mock_random_choice):
+        subscriptions = self.add_expiring_subscriptions(self.user, self.user2)
+        chunk = [(str(s.id), s.user_id) for s in subscriptions]
+
+        with freeze_time(date.today() + timedelta(days=31)):
+            first = renew_subscription_chunk.apply(args=[chunk]).get()
+            second = renew_subscription_chunk.apply(args=[chunk]).get()
+
+        self.assertEqual(first["renewed"], 2)
+        self.assertEqual(second, {**first, "renewed": 0, "skipped": 2})
+        self.assertEqual(Payment.objects.count(), 2)
+
+    @mock.patch("random.choice", return_value=True)
+    def test_failed_item_does_not_roll_back_the_chunk(self, mock_random_choice):
+        subscriptions = self.add_expiring_subscriptions(self.user, self.user2)
+        chunk = [(str(s.id), s.user_id) for s in subscriptions]
+        # 아직 만료일이 지나지 않은 구독은 갱신할 수 없다.
+        first = subscriptions[0]
+        first.end_date = date.today() + timedelta(days=60)
+        DjangoUserSubscription.objects.filter(id=first.id).update(
+            end_date=first.end_date
+        )
+
+        with freeze_time(date.today() + timedelta(days=31)):
+            summary = renew_subscription_chunk.apply(args=[chunk]).get()
+
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["renewed"], 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    @mock.patch("random.choice", return_value=True)
+    def test_item_failing_at_flush_does_not_roll_back_charged_payments(
+        self, mock_random_choice
+    ):
+        subscriptions = self.add_expiring_subscriptions(self.user, self.user2)
+        chunk = [(str(s.id), s.user_id) for s in subscriptions]
+        add_many = DjangoUserSubscriptionRepository.add_many
+
+        def fail_for_user2(repository, objs):
+            if any(obj.user_id == self.user2.id for obj in objs):
+                raise IntegrityError("unique_active_subscription_per_user")
+            return add_many(repository, objs)
+
+        with freeze_time(date.today() + timedelta(days=31)), mock.patch.object(
+            DjangoUserSubscriptionRepository, "add_many", fail_for_user2
+        ):
+            summary = renew_subscription_chunk.apply(args=[chunk]).get()
+
+        self.assertEqual(summary["renewed"], 1)
+        self.assertEqual(summary["failed"], 1)
+        # 두 구독 모두 결제됐으므로 결제 기록은 남는다.
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertEqual(
+            DjangoUserSubscription.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(
+            DjangoUserSubscription.objects.get(user=self.user2).status,
+            SubscriptionStatus.ACTIVE.value,
+        )
+
+    def test_gateway_outage_is_rescheduled_instead_of_failed(self):
+        subscriptions = self.add_expiring_subscriptions(self.user, self.user2)
+        chunk = [(str(s.id), s.user_id) for s in subscriptions]
+        gateway = mock.Mock()
+        gateway.charge_many.side_effect = [
+            PaymentGatewayUnavailable("timeout"),
+            [ChargeResult(success=True, transaction_id="tx")] * 2,
+        ]
+
+        with freeze_time(date.today() + timedelta(days=31)), mock.patch(
+            "subscription.adapters.payment_gateway.get_gateway", return_value=gateway
+        ):
+            summary = renew_subscription_chunk.apply(args=[chunk]).get()
+
+        self.assertEqual(summary["retried"], 2)
+        self.assertEqual(summary["failed"], 0)
+        # 재시도는 같은 멱등 키로 한 번 더 결제를 요청한다.
+        first, second = [call.args[0] for call in gateway.charge_many.call_args_list]
+        self.assertEqual(first, second)
+        self.assertEqual(
+            [request.idempotency_key for request in first],
+            [f"renewal:{s.id}" for s in subscriptions],
+        )
+        self.assertEqual(Payment.objects.count(), 2)
@@ -0,0 +1,88 @@
+from datetime import date
+
+from django.http import QueryDict
+from django.test import SimpleTestCase
+from rest_framework import serializers
+
+from subscription import validators
+from subscription.serializers import SubscriptionRequestSerializer
+
+
+def valid_body(**payment_details):
+    return {
+        "plan_name": "basic",
+        "payment_details": {
+            "method_type": "credit_card",
+            "card_number": "4242-4242-4242-4242",
+            "expiration_date": "12/25",
+            "cvc": "123",
+            **payment_details,
+        },
+    }
+
+
+class SubscriptionRequestValidatorTest(SimpleTestCase):
+    def assertSameAsSerializer(self, body):
+        serializer = SubscriptionRequestSerializer(data=body)
+        if serializer.is_valid():
+            self.assertEqual(
+                validators.validate_subscription_request(body),
+                serializer.validated_data,
+            )
+            return
+        with self.assertRaises(serializers.ValidationError) as raised:
+            validators.validate_subscription_request(body)
+        self.assertEqual(raised.exception.detail, serializer.errors)
+
+    def test_results_match_the_serializer(self):
+        bodies = [
+            valid_body(),
+            valid_body(card_number=" 4242 4242 4242 4242 "),
+            valid_body(method_type="point"),
+            {"plan_name": "basic", "payment_details": {"card_number": "x"}},
+            valid_body(card_number="1234-1234-1234-1234"),
+            valid_body(card_number="4242-4242"),
+            valid_body(card_number=4242424242424242),
+            valid_body(card_number=["4242"]),
+            valid_body(card_number=True),
+            valid_body(method_type=None),
+            valid_body(method_type=""),
+            valid_body(expiration_date="13/25"),
+            valid_body(expiration_date="1/25"),
+            valid_body(expiration_date="01/23"),
+            valid_body(expiration_date=" 12/25"),
+            valid_body(expiration_date=1225),
+            valid_body(expiration_date=None),
+            valid_body(cvc="12a"),
+            valid_body(cvc="12"),
+            valid_body(cvc="   "),
+            {"plan_name": "gold", "payment_details": "card"},
+            {"plan_name": "premium", "payment_details": None},
+            {"plan_name": None},
+            {},
+            ["basic"],
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertSameAsSerializer(body)
+
+    def test_builds_a_typed_command(self):
+        command = validators.create_subscription_command(1, valid_body())
+
+        self.assertEqual(command.user_id, 1)
+        self.assertEqual(command.plan_name, "basic")
+        self.assertEqual(command.payment_details["expiration_date"], date(2025, 12, 1))
+
+    def test_form_input_falls_back_to_the_serializer(self):
+        body = QueryDict(
+            "plan_name=basic&payment_details.card_number=4242-4242-4242-4242"
+            "&payment_details.expiration_date=12/25&payment_details.cvc=123"
+        )
+
+        valid_data = validators.validate_subscription_request(body)
+
+        self.assertEqual(valid_data["payment_details"]["cvc"], "123")
+
+    def test_luhn_checksum(self):
+        self.assertEqual(validators.luhn_checksum("4242 4242 4242 4242"), 0)
+        self.assertNotEqual(validators.luhn_checksum("4242 4242 4242 4241"), 0)